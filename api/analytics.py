@@ -0,0 +1,278 @@
+# api/analytics.py
+#
+# Learning analytics for instructors: GET /api/courses/{id}/analytics/ and
+# /api/videos/{id}/analytics/.
+#
+# Completion rates, watched percentages, drop-off points and rating
+# distributions are aggregates over video_progress and ratings. A dashboard
+# must not scan those rows, so `python manage.py refresh_analytics` (run
+# every few minutes) keeps rollups of them (migration 0009):
+#
+#   video_analytics    per video: viewers, completions, watched fraction,
+#                      drop-off histogram, rating histogram
+#   course_students    per (course, student): videos started and completed
+#   course_analytics   per course: students, students who completed it all
+#
+# A refresh only recomputes the videos whose progress or ratings changed
+# since the last one, and the (course, student) pairs whose progress
+# changed, each from its own rows through an index. Everything is recomputed
+# with --full, which also catches deleted progress rows and videos that
+# moved to another course. The endpoints read a handful of rollup rows.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from rest_framework import permissions
+
+from .models import Course, CourseAnalytics, Video, VideoAnalytics
+
+# Rows changed since `since` make their video and (course, student) dirty.
+# Rating edits and deletes don't touch the rating's row, but they do bump
+# its video's video_stats.
+DIRTY_SQL = """
+CREATE TEMPORARY TABLE analytics_videos ON COMMIT DROP AS
+SELECT video_id FROM video_progress WHERE updated_at > %(since)s
+UNION
+SELECT video_id FROM ratings WHERE created_at > %(since)s
+UNION
+SELECT video_id FROM video_stats WHERE updated_at > %(since)s;
+
+CREATE TEMPORARY TABLE analytics_students ON COMMIT DROP AS
+SELECT DISTINCT v.course_id, p.user_id
+FROM video_progress p JOIN videos v ON v.video_id = p.video_id
+WHERE p.updated_at > %(since)s AND v.course_id IS NOT NULL;
+
+ANALYZE analytics_videos;
+ANALYZE analytics_students;
+"""
+
+VIDEO_ROLLUP_SQL = """
+WITH slices AS (
+    -- one pass over the progress rows, grouped by video and by the slice
+    -- where an unfinished viewer stopped (NULL for the others)
+    SELECT p.video_id,
+           CASE WHEN NOT p.completed AND v.duration > 0 THEN
+               least(width_bucket(greatest(p.watched_seconds, 0)::float / v.duration, 0, 1, %(buckets)s),
+                     %(buckets)s)
+           END AS bucket,
+           count(*) AS viewers,
+           count(*) FILTER (WHERE p.completed) AS completed,
+           sum(least(greatest(p.watched_seconds, 0)::float / v.duration, 1)) FILTER (WHERE v.duration > 0)
+               AS watched_sum,
+           count(*) FILTER (WHERE v.duration > 0) AS watched_count
+    FROM analytics_videos d
+    JOIN videos v ON v.video_id = d.video_id
+    JOIN video_progress p ON p.video_id = d.video_id
+    GROUP BY 1, 2
+),
+viewers AS (
+    SELECT video_id, sum(viewers) AS viewers, sum(completed) AS completed,
+           coalesce(sum(watched_sum), 0) AS watched_sum, sum(watched_count) AS watched_count
+    FROM slices
+    GROUP BY video_id
+),
+dropoff AS (
+    SELECT d.video_id, array_agg(coalesce(s.viewers, 0)::int ORDER BY b) AS counts
+    FROM analytics_videos d
+    CROSS JOIN generate_series(1, %(buckets)s) AS b
+    LEFT JOIN slices s ON s.video_id = d.video_id AND s.bucket = b
+    GROUP BY d.video_id
+),
+rated AS (
+    SELECT r.video_id, r.rating, count(*) AS n
+    FROM analytics_videos d JOIN ratings r ON r.video_id = d.video_id
+    GROUP BY 1, 2
+),
+rating_counts AS (
+    SELECT d.video_id, array_agg(coalesce(r.n, 0)::int ORDER BY value) AS counts
+    FROM analytics_videos d
+    CROSS JOIN generate_series(1, 5) AS value
+    LEFT JOIN rated r ON r.video_id = d.video_id AND r.rating = value
+    GROUP BY d.video_id
+)
+INSERT INTO video_analytics
+    (video_id, viewers, completed, watched_sum, watched_count, dropoff, rating_counts, refreshed_at)
+SELECT d.video_id,
+       coalesce(w.viewers, 0), coalesce(w.completed, 0),
+       coalesce(w.watched_sum, 0), coalesce(w.watched_count, 0),
+       o.counts, r.counts, now()
+FROM analytics_videos d
+-- skips videos deleted meanwhile
+JOIN videos v ON v.video_id = d.video_id
+LEFT JOIN viewers w ON w.video_id = d.video_id
+JOIN dropoff o ON o.video_id = d.video_id
+JOIN rating_counts r ON r.video_id = d.video_id
+ON CONFLICT (video_id) DO UPDATE SET
+    viewers = EXCLUDED.viewers,
+    completed = EXCLUDED.completed,
+    watched_sum = EXCLUDED.watched_sum,
+    watched_count = EXCLUDED.watched_count,
+    dropoff = EXCLUDED.dropoff,
+    rating_counts = EXCLUDED.rating_counts,
+    refreshed_at = now()
+"""
+
+# {students} is STUDENTS_CHANGED, or every student of every course on a full
+# refresh, which is one pass over video_progress
+STUDENT_ROLLUP_SQL = """
+INSERT INTO course_students (course_id, user_id, videos_started, videos_completed)
+SELECT v.course_id, p.user_id, count(*), count(*) FILTER (WHERE p.completed)
+FROM video_progress p
+JOIN videos v ON v.video_id = p.video_id
+WHERE {students}
+GROUP BY v.course_id, p.user_id
+ON CONFLICT (course_id, user_id) DO UPDATE SET
+    videos_started = EXCLUDED.videos_started,
+    videos_completed = EXCLUDED.videos_completed
+"""
+
+# a few students' rows are found through the (user_id, video_id) index
+STUDENTS_CHANGED = "(v.course_id, p.user_id) IN (SELECT course_id, user_id FROM analytics_students)"
+ALL_STUDENTS = "v.course_id IS NOT NULL"
+
+COURSE_ROLLUP_SQL = """
+WITH dirty AS (
+    SELECT course_id FROM analytics_students
+    UNION
+    SELECT v.course_id FROM analytics_videos d JOIN videos v ON v.video_id = d.video_id
+    WHERE v.course_id IS NOT NULL
+),
+sizes AS (
+    -- skips courses deleted meanwhile
+    SELECT c.course_id, count(v.video_id) AS videos
+    FROM dirty d
+    JOIN courses c ON c.course_id = d.course_id
+    LEFT JOIN videos v ON v.course_id = c.course_id
+    GROUP BY c.course_id
+)
+INSERT INTO course_analytics (course_id, students, completed_students, refreshed_at)
+SELECT z.course_id,
+       count(s.user_id),
+       count(*) FILTER (WHERE z.videos > 0 AND s.videos_completed >= z.videos),
+       now()
+FROM sizes z
+LEFT JOIN course_students s ON s.course_id = z.course_id
+GROUP BY z.course_id, z.videos
+ON CONFLICT (course_id) DO UPDATE SET
+    students = EXCLUDED.students,
+    completed_students = EXCLUDED.completed_students,
+    refreshed_at = now()
+"""
+
+
+def refresh(full=False):
+    """
+    Bring the rollups up to date. Incremental unless `full`; returns
+    {"videos": n, "students": n, "courses": n} rows rewritten.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # one refresh at a time; readers aren't blocked
+        cursor.execute(
+            "LOCK TABLE video_analytics, course_students, course_analytics IN SHARE ROW EXCLUSIVE MODE"
+        )
+        since, students = None, STUDENTS_CHANGED
+        if not full:
+            since = VideoAnalytics.objects.aggregate(last=Max("refreshed_at"))["last"]
+        if since is None:
+            for table in ("video_analytics", "course_students", "course_analytics"):
+                cursor.execute(f"DELETE FROM {table}")
+            since, students = "-infinity", ALL_STUDENTS
+        else:
+            # rows are committed a little after their timestamp
+            since -= timedelta(seconds=settings.ANALYTICS_REFRESH_OVERLAP)
+
+        cursor.execute(DIRTY_SQL, {"since": since})
+        cursor.execute(VIDEO_ROLLUP_SQL, {"buckets": settings.ANALYTICS_DROPOFF_BUCKETS})
+        videos = cursor.rowcount
+        cursor.execute(STUDENT_ROLLUP_SQL.format(students=students))
+        students = cursor.rowcount
+        cursor.execute(COURSE_ROLLUP_SQL)
+        courses = cursor.rowcount
+    return {"videos": videos, "students": students, "courses": courses}
+
+
+class CanViewAnalytics(permissions.BasePermission):
+    """Staff, or the instructor or creator of the course (of the video)."""
+
+    def has_object_permission(self, request, view, obj):
+        user = request.user
+        if user.is_staff:
+            return True
+        if isinstance(obj, Video):
+            if obj.uploaded_by_id == user.pk:
+                return True
+            obj = obj.course
+        return isinstance(obj, Course) and user.pk in (obj.instructor_id, obj.created_by_id)
+
+
+def _ratio(part, whole, digits=4):
+    return round(part / whole, digits) if whole else None
+
+
+def _ratings(counts):
+    rated = sum(counts)
+    return {
+        "count": rated,
+        "average": _ratio(sum(value * n for value, n in enumerate(counts, 1)), rated, 2),
+        "distribution": {str(value): n for value, n in enumerate(counts, 1)},
+    }
+
+
+def _video_numbers(rollup):
+    """The dashboard numbers of a VideoAnalytics row (None: no activity yet)."""
+    if rollup is None:
+        rollup = VideoAnalytics(
+            viewers=0, completed=0, watched_sum=0, watched_count=0,
+            dropoff=[0] * settings.ANALYTICS_DROPOFF_BUCKETS, rating_counts=[0] * 5,
+        )
+    # the slices of the last refresh, whatever the setting says now
+    slices = len(rollup.dropoff)
+    return {
+        "viewers": rollup.viewers,
+        "completed": rollup.completed,
+        "completion_rate": _ratio(rollup.completed, rollup.viewers),
+        "average_watched_percent": _ratio(100 * rollup.watched_sum, rollup.watched_count, 1),
+        "dropoff": [
+            {"from_percent": round(100 * i / slices, 1), "to_percent": round(100 * (i + 1) / slices, 1),
+             "viewers": count}
+            for i, count in enumerate(rollup.dropoff)
+        ],
+        "ratings": _ratings(rollup.rating_counts),
+    }
+
+
+def video_report(video):
+    rollup = VideoAnalytics.objects.filter(video_id=video.pk).first()
+    return {
+        "video_id": video.pk,
+        **_video_numbers(rollup),
+        "refreshed_at": rollup.refreshed_at if rollup else None,
+    }
+
+
+def course_report(course):
+    """The course's student numbers, its videos' numbers and their totals."""
+    rollup = CourseAnalytics.objects.filter(course_id=course.pk).first()
+    students = rollup.students if rollup else 0
+    completed = rollup.completed_students if rollup else 0
+
+    videos = Video.objects.filter(course_id=course.pk).order_by("pk").only("video_id", "title")
+    rollups = VideoAnalytics.objects.in_bulk([video.pk for video in videos])
+    watched_sum = sum(r.watched_sum for r in rollups.values())
+    watched_count = sum(r.watched_count for r in rollups.values())
+    rating_counts = [sum(column) for column in zip([0] * 5, *(r.rating_counts for r in rollups.values()))]
+
+    return {
+        "course_id": course.pk,
+        "students": students,
+        "completed_students": completed,
+        "completion_rate": _ratio(completed, students),
+        "average_watched_percent": _ratio(100 * watched_sum, watched_count, 1),
+        "ratings": _ratings(rating_counts),
+        "videos": [
+            {"video_id": video.pk, "title": video.title, **_video_numbers(rollups.get(video.pk))}
+            for video in videos
+        ],
+        "refreshed_at": rollup.refreshed_at if rollup else None,
+    }
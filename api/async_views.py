@@ -0,0 +1,183 @@
+# api/async_views.py
+#
+# Async versions of the I/O-bound endpoints, served instead of the DRF
+# actions when ASYNC_API is on and the app runs under an ASGI server
+# (gunicorn.conf.py then starts uvicorn workers):
+#
+#   GET  /api/videos/{id}/play/
+#   GET  /api/videos/play-batch/
+#   GET  /api/courses/{id}/play-urls/
+#   GET  /api/videos/search/
+#   POST /api/progress/heartbeat/
+#
+# Under ASGI a sync view holds a thread for the whole request, while these
+# only leave the event loop for their queries (the async ORM) and a worker
+# process can keep many more requests in flight. DRF 3.16 has no async
+# views, so they are plain Django views that authenticate the JWT themselves
+# and return the same JSON as the DRF actions.
+#
+# Presigning a play URL is local computation (no request to S3) and most of
+# the time a cache hit, so it runs on the event loop. Uploads stay on the
+# DRF views: S3UploadHandler streams the body to S3 while Django parses it,
+# which is sync code in either server.
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import acached_user
+from .hls import manifest_url
+from .models import Course, Video
+from .playback import PLAY_FIELDS, batch_response, parse_ids, play_urls
+from .progress import arecord_heartbeat
+from .search import acached_search, normalize_query, passage_search
+from .search_log import arecord_search
+from .serializers import ProgressHeartbeatSerializer, TranscriptPassageSerializer, VideoSerializer
+from .storage import object_key, presigned_get_url
+
+_jwt = JWTAuthentication()
+
+
+def _error(detail, status_code, **extra):
+    response = JsonResponse({"detail": detail, **extra}, status=status_code)
+    if status_code == status.HTTP_401_UNAUTHORIZED:
+        response["WWW-Authenticate"] = _jwt.authenticate_header(None)
+    return response
+
+
+async def authenticate(request, claims_only=False):
+    """
+    The active user of the request's Bearer token, or a 401 response, as
+    CachedJWTAuthentication + IsAuthenticated would answer. With
+    `claims_only`, a TokenUser of the token's claims, like
+    JWTStatelessUserAuthentication.
+    """
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None, _error("Authentication credentials were not provided.", status.HTTP_401_UNAUTHORIZED)
+    try:
+        token = _jwt.get_validated_token(raw_token)
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None, _error("Given token not valid for any token type", status.HTTP_401_UNAUTHORIZED,
+                            code="token_not_valid")
+
+    if claims_only:
+        return jwt_settings.TOKEN_USER_CLASS(token), None
+    user = await acached_user(user_id)
+    if user is None:
+        return None, _error("User not found", status.HTTP_401_UNAUTHORIZED, code="user_not_found")
+    if not user.is_active:
+        return None, _error("User is inactive", status.HTTP_401_UNAUTHORIZED, code="user_inactive")
+    return user, None
+
+
+@require_GET
+async def play(request, pk):
+    """VideoViewSet.play: a presigned URL for the video's file, and its HLS playlist's."""
+    user, denied = await authenticate(request, claims_only=True)
+    if denied:
+        return denied
+
+    video = await Video.objects.only("video_id", "file_url", "hls_manifest").filter(pk=pk).afirst()
+    if video is None:
+        return _error("No Video matches the given query.", status.HTTP_404_NOT_FOUND)
+    try:
+        url, expires_at = presigned_get_url(object_key(video.file_url))
+    except Exception as e:
+        return JsonResponse({"detail": "Unable to get video URL", "error": str(e)}, status=500)
+    return JsonResponse({
+        "url": url,
+        "expires_in": int(expires_at - time.time()),
+        "manifest_url": manifest_url(request, video.pk, video.hls_manifest),
+    })
+
+
+@require_GET
+async def play_batch(request):
+    """VideoViewSet.play_batch: play URLs of the ?ids= videos, signed together."""
+    user, denied = await authenticate(request, claims_only=True)
+    if denied:
+        return denied
+
+    ids, error = parse_ids(request.GET.get("ids"))
+    if error:
+        return _error(error, status.HTTP_400_BAD_REQUEST)
+    videos = [video async for video in Video.objects.only(*PLAY_FIELDS).filter(pk__in=ids)]
+    return JsonResponse(batch_response(request, ids, videos))
+
+
+@require_GET
+async def course_play_urls(request, pk):
+    """CourseViewSet.play_urls: play URLs of every video in the course."""
+    user, denied = await authenticate(request, claims_only=True)
+    if denied:
+        return denied
+
+    videos = [video async for video in Video.objects.only(*PLAY_FIELDS).filter(course_id=pk).order_by("pk")]
+    if not videos and not await Course.objects.filter(pk=pk).aexists():
+        return _error("No Course matches the given query.", status.HTTP_404_NOT_FOUND)
+    return JsonResponse({"course_id": pk, "videos": play_urls(request, videos)})
+
+
+@require_GET
+async def search(request):
+    """VideoViewSet.search: keyword search over videos or transcript passages."""
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    raw_q = (request.GET.get("q") or "").strip()
+    course_id = request.GET.get("course_id")
+    level = request.GET.get("level")
+    mode = request.GET.get("mode", "videos")
+    if mode not in ("videos", "passages"):
+        return _error("mode must be 'videos' or 'passages'", status.HTTP_400_BAD_REQUEST)
+
+    tokens = normalize_query(raw_q)
+    if mode == "passages":
+        passages, total = await sync_to_async(passage_search)(tokens, course_id, level)
+        await arecord_search(user.pk, raw_q)
+        return JsonResponse({
+            "query": raw_q, "normalized_tokens": tokens, "mode": mode, "total": total,
+            "results": TranscriptPassageSerializer(passages, many=True).data,
+        })
+
+    videos, total = await acached_search(tokens, course_id, level)
+    await arecord_search(user.pk, raw_q)
+    return JsonResponse({
+        "query": raw_q, "normalized_tokens": tokens, "total": total,
+        "results": VideoSerializer(videos, many=True).data,
+    })
+
+
+@csrf_exempt
+@require_POST
+async def heartbeat(request):
+    """VideoProgressViewSet.heartbeat: {video, watched_seconds}, buffered, 202."""
+    user, denied = await authenticate(request, claims_only=True)
+    if denied:
+        return denied
+
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError as e:
+            return _error(f"JSON parse error - {e}", status.HTTP_400_BAD_REQUEST)
+    else:
+        data = request.POST
+    serializer = ProgressHeartbeatSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    await arecord_heartbeat(user.pk, serializer.validated_data["video"],
+                            serializer.validated_data["watched_seconds"])
+    return HttpResponse(status=status.HTTP_202_ACCEPTED)
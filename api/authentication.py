@@ -0,0 +1,105 @@
+# api/authentication.py
+#
+# JWT authentication without a users query on every request.
+#
+# CachedJWTAuthentication (the default in REST_FRAMEWORK) is simplejwt's
+# JWTAuthentication reading the token's user through the Django cache: the
+# columns permission checks look at are kept for AUTH_USER_CACHE_TTL seconds
+# and dropped as soon as the PortalUser is saved or deleted (PortalUserViewSet,
+# the admin, set_password). Writes that skip signals (queryset.update()) show
+# up when the entry expires. Other columns (password, created_at) are
+# deferred and load on access.
+#
+# Endpoints that only need the user's id (play, progress heartbeats) use
+# JWTStatelessUserAuthentication instead: request.user is a PortalTokenUser
+# (SIMPLE_JWT's TOKEN_USER_CLASS) built from the token's claims with no lookup
+# at all, so a deactivated user keeps that access until their access token
+# expires.
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import PortalUser
+
+CACHED_FIELDS = ("user_id", "name", "email", "role", "profile_picture", "is_active", "is_staff", "is_superuser")
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _from_row(row):
+    # from_db() wants the values in the model's field order
+    names = [f.attname for f in PortalUser._meta.concrete_fields if f.attname in row]
+    return PortalUser.from_db("default", names, [row[name] for name in names])
+
+
+def cached_user(user_id):
+    """The PortalUser with this id (only CACHED_FIELDS loaded), or None."""
+    key = _user_key(user_id)
+    row = cache.get(key) if settings.AUTH_USER_CACHE_TTL > 0 else None
+    if row is None:
+        row = PortalUser.objects.filter(user_id=user_id).values(*CACHED_FIELDS).first()
+        if row is None:
+            return None
+        if settings.AUTH_USER_CACHE_TTL > 0:
+            cache.set(key, row, settings.AUTH_USER_CACHE_TTL)
+    return _from_row(row)
+
+
+async def acached_user(user_id):
+    key = _user_key(user_id)
+    row = await cache.aget(key) if settings.AUTH_USER_CACHE_TTL > 0 else None
+    if row is None:
+        row = await PortalUser.objects.filter(user_id=user_id).values(*CACHED_FIELDS).afirst()
+        if row is None:
+            return None
+        if settings.AUTH_USER_CACHE_TTL > 0:
+            await cache.aset(key, row, settings.AUTH_USER_CACHE_TTL)
+    return _from_row(row)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the user from cached_user()."""
+
+    def get_user(self, validated_token):
+        if jwt_settings.CHECK_REVOKE_TOKEN or jwt_settings.USER_ID_FIELD != "user_id":
+            # revocation compares the password hash, which isn't cached
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class PortalTokenUser(TokenUser):
+    """TokenUser whose id is an int like PortalUser's (tokens carry it as a string)."""
+
+    @cached_property
+    def id(self):
+        return PortalUser._meta.pk.to_python(self.token[jwt_settings.USER_ID_CLAIM])
+
+
+def _invalidate_user(sender, instance, **kwargs):
+    # after commit, or a request could cache the old row again meanwhile
+    transaction.on_commit(partial(cache.delete, _user_key(instance.pk)))
+
+
+post_save.connect(_invalidate_user, sender=PortalUser, dispatch_uid="auth_user_save")
+post_delete.connect(_invalidate_user, sender=PortalUser, dispatch_uid="auth_user_delete")
@@ -0,0 +1,119 @@
+# api/buffering.py
+#
+# In-process write buffers. Request handlers hand rows to a buffer and return
+# immediately; a background thread writes them in one batch when enough have
+# piled up or the flush interval has passed, and whatever is left is written
+# when the worker process exits.
+import atexit
+import logging
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """
+    Base class for a write-behind buffer. Subclasses implement:
+
+      new_pending()         -> an empty container (list, dict, ...)
+      add_to(pending, item)    put one item in the container
+      write(pending)           persist a full container
+
+    flush_size() and flush_interval() are looked up on every call so they
+    can come from settings. A flush interval of 0 writes synchronously.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = self.new_pending()
+        self._pid = None
+        self._thread = None
+        atexit.register(self.flush)
+
+    # -- to override ------------------------------------------------------
+
+    def new_pending(self):
+        return []
+
+    def add_to(self, pending, item):
+        pending.append(item)
+
+    def write(self, pending):
+        raise NotImplementedError
+
+    def flush_size(self):
+        return 500
+
+    def flush_interval(self):
+        return 5.0
+
+    # -- public -----------------------------------------------------------
+
+    def add(self, item):
+        if self.flush_interval() <= 0:
+            pending = self.new_pending()
+            self.add_to(pending, item)
+            self.write(pending)
+            return
+
+        self._ensure_thread()
+        with self._lock:
+            self.add_to(self._pending, item)
+            full = len(self._pending) >= self.flush_size()
+        if full:
+            self._wakeup.set()
+
+    async def aadd(self, item):
+        """add() for async views: only a synchronous write leaves the event loop."""
+        if self.flush_interval() <= 0:
+            await sync_to_async(self.add)(item)
+        else:
+            self.add(item)
+
+    def flush(self):
+        """Write everything pending now. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, self.new_pending()
+            if not pending:
+                return
+            try:
+                close_old_connections()
+                self.write(pending)
+            except Exception:
+                logger.exception("%s: failed to write %d buffered rows",
+                                 type(self).__name__, len(pending))
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    # -- internals --------------------------------------------------------
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # first use in this process (or we were forked): anything pending
+            # belongs to the parent
+            self._pending = self.new_pending()
+            self._thread = threading.Thread(
+                target=self._run, name=f"{type(self).__name__}-flusher", daemon=True
+            )
+            self._thread.start()
+            self._pid = pid
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(max(self.flush_interval(), 0.1))
+            self._wakeup.clear()
+            self.flush()
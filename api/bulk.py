@@ -0,0 +1,261 @@
+# api/bulk.py
+#
+# Bulk import and export of the catalog (courses and videos), used by
+# POST/GET /api/courses/import|export/ and /api/videos/import|export/ and by
+# the import_catalog / export_catalog management commands.
+#
+# Imports read NDJSON or CSV records one at a time (api/streaming.py) and
+# work in batches of BULK_IMPORT_BATCH_SIZE: every record is validated with
+# the import serializer, user/course references of the whole batch are
+# checked with one query, and the valid rows are written with bulk_create in
+# one transaction per batch. Invalid records are skipped and reported by line
+# number; they never roll back their batch.
+#
+# A course record may carry its videos in a "videos" list (NDJSON only), so a
+# whole course is onboarded in one go. A course is skipped with all its
+# videos if any of them is invalid.
+#
+# Exports stream the table in primary key order through a server-side cursor.
+import itertools
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .caching import invalidate
+from .models import Course, PortalUser, Video
+from .search import search_results
+from .serializers import CourseImportSerializer, VideoImportSerializer
+from .streaming import (
+    CSVRenderer, NDJSONRenderer, RecordStreamError, format_for_content_type, read_records,
+    stream_response,
+)
+from .tasks import enqueue_many
+from . import suggest
+
+# errors reported back per import; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+COURSE_EXPORT_FIELDS = [
+    "course_id", "title", "description", "category", "level", "created_by", "instructor", "created_at",
+]
+VIDEO_EXPORT_FIELDS = [
+    "video_id", "course", "title", "description", "file_url", "thumbnail_url", "duration",
+    "difficulty_level", "tags", "transcript", "uploaded_by", "uploaded_at",
+]
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = Counter()
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, detail):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self):
+        return {
+            "created": dict(self.created),
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+def _validate(serializer, record):
+    """(validated data, None) or (None, error detail)."""
+    try:
+        return serializer.run_validation(record), None
+    except ValidationError as exc:
+        return None, exc.detail
+
+
+def _missing(model, ids):
+    """The ids in `ids` that have no `model` row."""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return set()
+    return ids - set(model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+
+class CourseImporter:
+    kind = "courses"
+
+    def __init__(self, user=None):
+        self.user = user
+        # one serializer per import: its fields are built once, not per row
+        self.serializer = CourseImportSerializer()
+        self.videos = VideoImporter(user)
+
+    def import_batch(self, batch, result):
+        rows = []
+        for line, record in batch:
+            nested = record.pop("videos", None) or []
+            data, detail = _validate(self.serializer, record)
+            if detail is None and not isinstance(nested, list):
+                detail = {"videos": ["Expected a list of videos."]}
+            videos = []
+            if detail is None:
+                for index, video in enumerate(nested):
+                    video_data, video_detail = (
+                        _validate(self.videos.serializer, video) if isinstance(video, dict)
+                        else (None, ["Expected a JSON object."])
+                    )
+                    if video_detail is not None:
+                        detail = {"videos": {index: video_detail}}
+                        break
+                    videos.append(video_data)
+            if detail is not None:
+                result.error(line, detail)
+                continue
+            if data.get("created_by_id") is None and self.user is not None:
+                data["created_by_id"] = self.user.pk
+            rows.append((line, data, videos))
+
+        missing = _missing(
+            PortalUser,
+            [data.get(key) for _, data, _ in rows for key in ("created_by_id", "instructor_id")],
+        )
+        valid = []
+        for line, data, videos in rows:
+            bad = {
+                field: [f"User {data[key]} does not exist."]
+                for field, key in (("created_by", "created_by_id"), ("instructor", "instructor_id"))
+                if data.get(key) in missing
+            }
+            if bad:
+                result.error(line, bad)
+            else:
+                valid.append((data, videos))
+        if not valid:
+            return
+
+        with transaction.atomic():
+            courses = Course.objects.bulk_create([Course(**data) for data, _ in valid])
+            # Postgres returns the new ids, so nested videos can point at them
+            videos = [
+                self.videos.build(dict(video, course_id=course.pk))
+                for course, (_, nested) in zip(courses, valid)
+                for video in nested
+            ]
+            self.videos.create(videos)
+            invalidate("course")
+            transaction.on_commit(lambda: suggest.index_created(courses=courses))
+        result.created["courses"] += len(courses)
+        result.created["videos"] += len(videos)
+
+
+class VideoImporter:
+    kind = "videos"
+
+    def __init__(self, user=None):
+        self.user = user
+        self.serializer = VideoImportSerializer()
+
+    def build(self, data):
+        if self.user is not None:
+            data.setdefault("uploaded_by", self.user)
+        return Video(**data)
+
+    def create(self, videos):
+        """bulk_create, plus what creating a video through the API or Video.save() triggers."""
+        if not videos:
+            return
+        Video.objects.bulk_create(videos)
+        enqueue_many("process_video", [{"video_id": video.pk} for video in videos])
+        invalidate("video")
+        transaction.on_commit(search_results.clear)
+        transaction.on_commit(lambda: suggest.index_created(videos=videos))
+
+    def import_batch(self, batch, result):
+        rows = []
+        for line, record in batch:
+            data, detail = _validate(self.serializer, record)
+            if detail is not None:
+                result.error(line, detail)
+            else:
+                rows.append((line, data))
+
+        missing = _missing(Course, [data.get("course_id") for _, data in rows])
+        valid = []
+        for line, data in rows:
+            if data.get("course_id") in missing:
+                result.error(line, {"course": [f"Course {data['course_id']} does not exist."]})
+            else:
+                valid.append(self.build(data))
+
+        with transaction.atomic():
+            self.create(valid)
+        result.created["videos"] += len(valid)
+
+
+IMPORTERS = {importer.kind: importer for importer in (CourseImporter, VideoImporter)}
+
+
+def import_records(kind, records, user=None, batch_size=None):
+    """
+    Import an iterable of (line number, record) as `kind` ("courses" or
+    "videos"). Batches before an unreadable line are kept; reading stops
+    there. Returns an ImportResult.
+    """
+    importer = IMPORTERS[kind](user)
+    batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+    result = ImportResult()
+    records = _readable(records, result)
+    while batch := list(itertools.islice(records, batch_size)):
+        importer.import_batch(batch, result)
+    return result
+
+
+def _readable(records, result):
+    """The records up to the first unreadable line, which is reported."""
+    try:
+        yield from records
+    except RecordStreamError as exc:
+        result.error(exc.line, [f"Stopped reading here: {exc.message}."])
+
+
+def export_rows(kind):
+    """
+    (field names, iterator of dicts) over every course or video in pk order.
+    The fields are the import fields plus read-only ones, so an export can be
+    imported again.
+    """
+    model, fields = (Course, COURSE_EXPORT_FIELDS) if kind == "courses" else (Video, VIDEO_EXPORT_FIELDS)
+    # values() of a foreign key is its id, under the field's name
+    rows = model.objects.order_by("pk").values(*fields)
+    return fields, rows.iterator(chunk_size=settings.BULK_EXPORT_CHUNK_SIZE)
+
+
+class BulkCatalogMixin:
+    """
+    import/ and export/ actions for a catalog viewset, admins only. Set
+    `bulk_kind` to "courses" or "videos".
+
+    POST import/ takes an NDJSON (default) or CSV body (Content-Type
+    text/csv); GET export/ streams NDJSON, or CSV with ?format=csv.
+    """
+
+    bulk_kind = None
+
+    @action(detail=False, methods=["post"], url_path="import",
+            permission_classes=[permissions.IsAdminUser])
+    def bulk_import(self, request):
+        # read the body as it arrives instead of parsing request.data
+        stream = request.stream
+        records = read_records(stream, format_for_content_type(request.content_type)) if stream else ()
+        result = import_records(self.bulk_kind, records, user=request.user)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export",
+            permission_classes=[permissions.IsAdminUser],
+            renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        fields, rows = export_rows(self.bulk_kind)
+        return stream_response(rows, fields, request.accepted_renderer.format, self.bulk_kind)
@@ -0,0 +1,136 @@
+# api/caching.py
+#
+# Cached catalog reads. CourseViewSet and VideoViewSet keep the serialized
+# data of their list and retrieve responses in the Django cache, so a hit
+# costs no queries and no serializer work.
+#
+# Invalidation uses version keys instead of deleting entries: every cache key
+# embeds the current version of what it depends on (one version per object,
+# one per list), and a write bumps the versions it touches, so the old entries
+# are simply never read again and expire on their own. Each response also
+# carries an ETag over its data; a matching If-None-Match gets a 304.
+import hashlib
+import json
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+KEY_PREFIX = "catalog"
+
+
+def _version_key(namespace, scope):
+    return f"{KEY_PREFIX}:{namespace}:{scope}:version"
+
+
+def get_version(namespace, scope):
+    key = _version_key(namespace, scope)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock rather than 1 so a version key that was
+        # evicted can't come back with a number stale entries still use
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace, scope):
+    key = _version_key(namespace, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate(namespace, *pks):
+    """
+    Drop cached responses for the given objects of `namespace` and every
+    list of it (just the lists when no pk is given). Runs after the current
+    transaction commits, so a concurrent read can't cache the old rows under
+    the new version.
+    """
+    def bump():
+        for pk in pks:
+            bump_version(namespace, pk)
+        bump_version(namespace, "list")
+
+    transaction.on_commit(bump)
+
+
+def compute_etag(data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return quote_etag(hashlib.sha1(payload).hexdigest())
+
+
+def enabled():
+    return settings.CATALOG_CACHE_TIMEOUT > 0
+
+
+class CatalogCacheMixin:
+    """
+    Caches list/retrieve responses of a ModelViewSet and invalidates them on
+    create/update/destroy. Set `cache_namespace`; actions that write outside
+    perform_* must call invalidate() themselves.
+    """
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.cache_namespace, "list")
+        # the full URL: query string (cursor, page_size) and host both show
+        # up in the response's pagination links
+        url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+        key = f"{KEY_PREFIX}:{self.cache_namespace}:list:{version}:{url}"
+        return self._cached_response(request, key, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        render = partial(super().retrieve, request, *args, **kwargs)
+        try:
+            # "05" and "5" are the same row, and writes bump the version of 5
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            return render()
+        version = get_version(self.cache_namespace, pk)
+        key = f"{KEY_PREFIX}:{self.cache_namespace}:{pk}:{version}"
+        return self._cached_response(request, key, render)
+
+    def _cached_response(self, request, key, render):
+        if not enabled():
+            return render()
+
+        entry = cache.get(key)
+        if entry is None:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (compute_etag(response.data), response.data)
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+        else:
+            response = None
+
+        etag, data = entry
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif response is None:
+            response = Response(data)
+        response["ETag"] = etag
+        return response
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate(self.cache_namespace)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate(self.cache_namespace, serializer.instance.pk)
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        super().perform_destroy(instance)
+        invalidate(self.cache_namespace, pk)
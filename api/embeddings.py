@@ -0,0 +1,97 @@
+# api/embeddings.py
+#
+# Text embedders for semantic video search. Which one is used is controlled by
+# settings.VIDEO_EMBEDDER (a dotted path); anything with an `embed(texts)`
+# method returning an (n, dimensions) float32 array will do.
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .models import Video
+
+# Only the start of very long transcripts is embedded
+MAX_DOCUMENT_CHARS = 8000
+
+
+def embedding_dimensions() -> int:
+    return Video._meta.get_field("embedding_vector").dimensions
+
+
+def video_document(title, description, transcript, tags=None) -> str:
+    """
+    The text we embed for a video. Title goes first (and twice) so it
+    dominates over a long transcript.
+    """
+    parts = [title or "", title or "", description or ""]
+    if tags:
+        parts.append(" ".join(str(t) for t in tags))
+    parts.append(transcript or "")
+    return "\n".join(parts)[:MAX_DOCUMENT_CHARS]
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder (unigrams + bigrams, signed
+    buckets, L2-normalized). Needs no model download, so it is the default
+    and what the benchmark uses.
+    """
+
+    def __init__(self, dimensions=None):
+        self.dimensions = dimensions or embedding_dimensions()
+
+    def _features(self, text):
+        tokens = re.findall(r"\w+", text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little")
+                 for f in features),
+                dtype=np.uint64,
+                count=len(features),
+            )
+            buckets = (hashes % np.uint64(self.dimensions)).astype(np.int64)
+            signs = np.where((hashes >> np.uint64(63)) == 0, 1.0, -1.0).astype(np.float32)
+            np.add.at(out[row], buckets, signs)
+
+        # sublinear term frequency, then unit length for cosine distance
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class SentenceTransformerEmbedder:
+    """
+    Local sentence-transformers model. The model's output size has to match
+    the videos.embedding_vector column (768 by default).
+    """
+
+    def __init__(self, dimensions=None):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImproperlyConfigured(
+                "SentenceTransformerEmbedder needs the sentence-transformers package"
+            )
+        self.dimensions = dimensions or embedding_dimensions()
+        self.model = SentenceTransformer(settings.VIDEO_EMBEDDING_MODEL)
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    return import_string(settings.VIDEO_EMBEDDER)()
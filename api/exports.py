@@ -0,0 +1,205 @@
+# api/exports.py
+#
+# Incremental exports of the interaction tables for the data team:
+#
+#   GET /api/exports/<table>/?since=...&since_id=...&until=...&format=...
+#
+# for likes, ratings, comments, bookmarks, video_progress and search_logs.
+# Rows come in (timestamp, id) order from a server-side cursor and are
+# streamed as NDJSON (default), CSV or Parquet, so an export of any size
+# runs in constant memory on both ends.
+#
+# The timestamp is the row's created_at (updated_at for video_progress,
+# searched_at for search_logs). An export returns the rows with
+#
+#     (since, since_id) < (timestamp, id)  and  timestamp <= until
+#
+# and says which `until` it used in the X-Export-Until header; the next
+# incremental export passes it back as `since`. An interrupted download is
+# resumed with the timestamp and id of the last row received as `since` and
+# `since_id`. `until` defaults to ANALYTICS_EXPORT_LAG seconds ago, because
+# rows can be committed a little after their timestamp (search logs and
+# progress are buffered, see api/buffering.py) and must not land behind a
+# position that was already exported. Deletes are not exported.
+#
+# Parquet needs the optional pyarrow package.
+from collections import namedtuple
+from datetime import timedelta, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import permissions, viewsets
+from rest_framework.exceptions import NotAcceptable, NotFound, ValidationError
+
+from .models import Bookmark, Comment, Like, Rating, SearchLog, VideoProgress
+from .streaming import CSVRenderer, NDJSONRenderer, RecordEncoder, stream_response
+
+PARQUET = "parquet"
+
+ExportTable = namedtuple("ExportTable", "model timestamp fields")
+
+EXPORT_TABLES = {
+    "likes": ExportTable(Like, "created_at", ["id", "user_id", "video_id", "created_at"]),
+    "ratings": ExportTable(Rating, "created_at", ["id", "user_id", "video_id", "rating", "created_at"]),
+    "comments": ExportTable(Comment, "created_at", ["id", "user_id", "video_id", "text", "created_at"]),
+    "bookmarks": ExportTable(Bookmark, "created_at", ["id", "user_id", "video_id", "created_at"]),
+    "video_progress": ExportTable(
+        VideoProgress, "updated_at",
+        ["id", "user_id", "video_id", "watched_seconds", "completed", "updated_at"],
+    ),
+    "search_logs": ExportTable(SearchLog, "searched_at", ["id", "user_id", "query", "searched_at"]),
+}
+
+
+def export_rows(table, since=None, since_id=None, until=None):
+    """
+    Iterator of dicts over the rows of an EXPORT_TABLES table after
+    (since, since_id) and up to `until`, in (timestamp, id) order.
+    """
+    model, timestamp, fields = EXPORT_TABLES[table]
+    rows = model.objects.order_by(timestamp, "pk")
+    if until is not None:
+        rows = rows.filter(**{f"{timestamp}__lte": until})
+    if since is not None:
+        if since_id is None:
+            rows = rows.filter(**{f"{timestamp}__gt": since})
+        else:
+            # (timestamp, id) > (since, since_id), written so that
+            # `timestamp >= since` bounds the (timestamp, id) index scan
+            rows = rows.filter(
+                Q(**{f"{timestamp}__gte": since})
+                & (Q(**{f"{timestamp}__gt": since}) | Q(pk__gt=since_id))
+            )
+    return rows.values(*fields).iterator(chunk_size=settings.ANALYTICS_EXPORT_CHUNK_SIZE)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise NotAcceptable("Parquet exports need the pyarrow package.")
+    return pyarrow
+
+
+def _arrow_type(pa, field):
+    if field.is_relation:
+        field = field.target_field
+    internal_type = field.get_internal_type()
+    if internal_type == "BooleanField":
+        return pa.bool_()
+    if internal_type == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if internal_type.endswith(("AutoField", "IntegerField")):
+        return pa.int64()
+    return pa.string()
+
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter whose contents are taken in chunks."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def write_parquet(records, table):
+    """
+    Encode an export as Parquet, yielding bytes after every row group of
+    ANALYTICS_EXPORT_CHUNK_SIZE rows.
+    """
+    pa = _pyarrow()
+    model, _, fields = EXPORT_TABLES[table]
+    schema = pa.schema([(name, _arrow_type(pa, model._meta.get_field(name))) for name in fields])
+    sink = _ChunkSink()
+    records = iter(records)
+    with pa.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        while batch := list(islice(records, settings.ANALYTICS_EXPORT_CHUNK_SIZE)):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.take()
+    # the footer
+    yield sink.take()
+
+
+class ParquetRenderer(NDJSONRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = PARQUET
+
+
+def _datetime_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ["Expected an ISO 8601 date and time, e.g. 2025-01-31T12:00:00Z."]})
+    if django_timezone.is_naive(parsed):
+        parsed = django_timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    GET /api/exports/<table>/ streams one interaction table, admins only.
+    See the module comment for `since`, `since_id` and `until`; ?format=
+    picks ndjson (default), csv or parquet.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [NDJSONRenderer, CSVRenderer, ParquetRenderer]
+    lookup_field = "table"
+    lookup_value_regex = "[a-z_]+"
+
+    def retrieve(self, request, table=None):
+        if table not in EXPORT_TABLES:
+            raise NotFound(f"No export for {table!r}; tables: {', '.join(EXPORT_TABLES)}.")
+
+        since = _datetime_param(request, "since")
+        since_id = request.query_params.get("since_id")
+        if since_id is not None:
+            if since is None or not since_id.isdigit():
+                raise ValidationError({"since_id": ["Expected a row id, together with since."]})
+            since_id = int(since_id)
+        until = _datetime_param(request, "until") or (
+            django_timezone.now() - timedelta(seconds=settings.ANALYTICS_EXPORT_LAG)
+        )
+
+        fmt = request.accepted_renderer.format
+        rows = export_rows(table, since, since_id, until)
+        if fmt == PARQUET:
+            # fail with a 406 now rather than halfway into a 200
+            _pyarrow()
+            response = StreamingHttpResponse(write_parquet(rows, table), content_type=ParquetRenderer.media_type)
+            response["Content-Disposition"] = f'attachment; filename="{table}.parquet"'
+        else:
+            response = stream_response(rows, EXPORT_TABLES[table].fields, fmt, table)
+        response["X-Export-Until"] = RecordEncoder().default(until)
+        return response
@@ -0,0 +1,258 @@
+# api/hls.py
+#
+# Adaptive streaming (HLS) of uploaded videos.
+#
+# Packaging (the package_hls job, api/processing.py) runs one ffmpeg per
+# video: it decodes the original once, scales it to every rung of
+# HLS_RENDITIONS no taller than the source and encodes them side by side with
+# libx264 (whose threads use every core, HLS_FFMPEG_THREADS), cutting all of
+# them at the same HLS_SEGMENT_SECONDS keyframes so players can switch
+# between them at any segment. Segments and playlists are uploaded next to
+# the original, under "<original key without extension>/hls/":
+#
+#   master.m3u8               one line per rendition
+#   720p/index.m3u8           that rendition's segments
+#   720p/seg_00000.ts ...
+#
+# The bucket stays private. `play` adds a manifest_url with a signed token to
+# its response, and GET /api/videos/{id}/hls/<playlist>?token=... serves the
+# playlists from the bucket, rewritten on the way out: the master playlist's
+# renditions carry the token along, and a rendition's segments become
+# presigned URLs. Players can't send an Authorization header with every
+# playlist and segment request; the token is what lets them in, for
+# HLS_URL_EXPIRES seconds.
+#
+# A rendition playlist is fetched once per playback, so its segment URLs have
+# to last the whole video. They're presigned for HLS_URL_EXPIRES and the
+# rendered playlist is cached and shared until less than
+# HLS_URL_MIN_REMAINING is left, instead of presigning a few hundred URLs per
+# viewer (presign_many signs them in one pass when it does).
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from .storage import ensure_bucket, get_s3_client, object_key, presign_many
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "api.hls"
+MASTER_PLAYLIST = "master.m3u8"
+PLAYLIST_TYPE = "application/vnd.apple.mpegurl"
+# master.m3u8 or <rendition>/index.m3u8
+PLAYLIST_RE = re.compile(r"(?:master|[\w-]+/index)\.m3u8")
+
+CONTENT_TYPES = {".m3u8": PLAYLIST_TYPE, ".ts": "video/mp2t"}
+
+
+class PackagingError(Exception):
+    pass
+
+
+def renditions():
+    """HLS_RENDITIONS as [(height, video kbps)], tallest first."""
+    rungs = [tuple(int(n) for n in rung.split(":")) for rung in settings.HLS_RENDITIONS]
+    return sorted(rungs, reverse=True)
+
+
+def ladder(source_height):
+    """The rungs to encode for a source this tall; never upscales."""
+    rungs = renditions()
+    fitting = [(height, kbps) for height, kbps in rungs if height <= source_height]
+    # a source below the smallest rung gets that rung's bitrate at its own size
+    return fitting or [(source_height - source_height % 2, rungs[-1][1])]
+
+
+def hls_prefix(file_url):
+    return f"{os.path.splitext(object_key(file_url))[0]}/hls/"
+
+
+def probe(ffprobe, url):
+    """(height of the first video stream, whether there's an audio stream)."""
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-show_entries", "stream=codec_type,height", "-of", "json", url],
+        capture_output=True, timeout=settings.FFMPEG_TIMEOUT,
+    )
+    if result.returncode != 0:
+        raise PackagingError(result.stderr.decode(errors="replace").strip()[-2000:])
+    streams = json.loads(result.stdout).get("streams", [])
+    heights = [s["height"] for s in streams if s.get("codec_type") == "video" and s.get("height")]
+    if not heights:
+        raise PackagingError("No video stream")
+    return heights[0], any(s.get("codec_type") == "audio" for s in streams)
+
+
+def ffmpeg_command(ffmpeg, url, out_dir, rungs, has_audio):
+    """One ffmpeg writing every rendition and the master playlist into out_dir."""
+    n = len(rungs)
+    graph = [f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n))]
+    graph += [f"[v{i}]scale=-2:{height}[out{i}]" for i, (height, _) in enumerate(rungs)]
+    command = [ffmpeg, "-v", "error", "-y", "-i", url, "-filter_complex", ";".join(graph)]
+    streams = []
+    for i, (height, kbps) in enumerate(rungs):
+        command += [
+            "-map", f"[out{i}]",
+            f"-b:v:{i}", f"{kbps}k", f"-maxrate:v:{i}", f"{kbps * 107 // 100}k", f"-bufsize:v:{i}", f"{kbps * 3 // 2}k",
+        ]
+        if has_audio:
+            command += ["-map", "0:a:0"]
+        streams.append(f"v:{i},a:{i},name:{height}p" if has_audio else f"v:{i},name:{height}p")
+
+    segment = settings.HLS_SEGMENT_SECONDS
+    command += [
+        "-c:v", "libx264", "-preset", settings.HLS_X264_PRESET, "-pix_fmt", "yuv420p",
+        # keyframes exactly at segment boundaries, in every rendition
+        "-sc_threshold", "0", "-force_key_frames", f"expr:gte(t,n_forced*{segment})",
+        "-threads", str(settings.HLS_FFMPEG_THREADS),
+    ]
+    if has_audio:
+        command += ["-c:a", "aac", "-b:a", f"{settings.HLS_AUDIO_KBPS}k", "-ac", "2"]
+    command += [
+        "-f", "hls", "-hls_time", str(segment), "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(out_dir, "%v", "seg_%05d.ts"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(streams),
+        os.path.join(out_dir, "%v", "index.m3u8"),
+    ]
+    return command
+
+
+def upload_dir(out_dir, prefix):
+    """Upload everything under out_dir to prefix; the master playlist last."""
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    ensure_bucket(bucket)
+    client = get_s3_client()
+    files = [
+        os.path.relpath(os.path.join(root, name), out_dir)
+        for root, _, names in os.walk(out_dir) for name in names
+    ]
+
+    def upload(name):
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1]) or mimetypes.guess_type(name)[0]
+        client.upload_file(
+            os.path.join(out_dir, name), bucket, prefix + name,
+            ExtraArgs={"ContentType": content_type or "application/octet-stream"},
+        )
+
+    with ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_THREADS) as pool:
+        list(pool.map(upload, [name for name in files if name != MASTER_PLAYLIST]))
+    upload(MASTER_PLAYLIST)
+    return len(files)
+
+
+def package(ffmpeg, ffprobe, file_url):
+    """Encode and upload the video's renditions. Returns the object key of its master playlist."""
+    # ffmpeg streams the original over HTTP for as long as the encode takes
+    source_url = get_s3_client().generate_presigned_url(
+        "get_object", Params={"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": object_key(file_url)},
+        ExpiresIn=settings.HLS_TIMEOUT,
+    )
+    height, has_audio = probe(ffprobe, source_url)
+    rungs = ladder(height)
+    prefix = hls_prefix(file_url)
+    with tempfile.TemporaryDirectory(prefix="hls-") as out_dir:
+        command = ffmpeg_command(ffmpeg, source_url, out_dir, rungs, has_audio)
+        result = subprocess.run(command, capture_output=True, timeout=settings.HLS_TIMEOUT)
+        if result.returncode != 0:
+            raise PackagingError(result.stderr.decode(errors="replace").strip()[-2000:])
+        uploaded = upload_dir(out_dir, prefix)
+    logger.info("Packaged %s into %d HLS files (%s)", file_url, uploaded, ", ".join(f"{h}p" for h, _ in rungs))
+    return prefix + MASTER_PLAYLIST
+
+
+def make_token(video_id, manifest_key):
+    return signing.dumps({"video": video_id, "prefix": manifest_key.rsplit("/", 1)[0] + "/"}, salt=TOKEN_SALT)
+
+
+def read_token(token, video_id):
+    """The HLS prefix a token grants, or None if it's invalid, expired or for another video."""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.HLS_URL_EXPIRES)
+    except signing.BadSignature:
+        return None
+    return data["prefix"] if data.get("video") == video_id else None
+
+
+def manifest_url(request, video_id, manifest_key):
+    """Where a player gets the video's master playlist, or None if it isn't packaged."""
+    if not manifest_key:
+        return None
+    query = urlencode({"token": make_token(video_id, manifest_key)})
+    return request.build_absolute_uri(f"/api/videos/{video_id}/hls/{MASTER_PLAYLIST}?{query}")
+
+
+def _cache_key(prefix, name):
+    return f"hls:{hashlib.md5(prefix.encode()).hexdigest()}:{name}"
+
+
+def _read(key):
+    try:
+        body = get_s3_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)["Body"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            raise Http404("No such playlist")
+        raise
+    return body.read().decode()
+
+
+def _uris(text):
+    """Yield (line, is_uri) for a playlist; URIs are the lines not starting with #."""
+    for line in text.splitlines():
+        yield line, bool(line) and not line.startswith("#")
+
+
+def master_playlist(prefix, token):
+    """The master playlist, its rendition URIs carrying `token`."""
+    key = _cache_key(prefix, MASTER_PLAYLIST)
+    text = cache.get(key)
+    if text is None:
+        # never changes once written
+        text = _read(prefix + MASTER_PLAYLIST)
+        cache.set(key, text, None)
+    query = "?" + urlencode({"token": token})
+    return "\n".join(line + query if is_uri else line for line, is_uri in _uris(text)) + "\n"
+
+
+def media_playlist(prefix, name):
+    """A rendition's playlist with presigned segment URLs, shared by every viewer."""
+    key = _cache_key(prefix, name)
+    text = cache.get(key)
+    if text is None:
+        directory = prefix + name.rsplit("/", 1)[0] + "/"
+        lines = list(_uris(_read(prefix + name)))
+        urls = iter(presign_many([directory + line for line, is_uri in lines if is_uri], settings.HLS_URL_EXPIRES))
+        text = "\n".join(next(urls) if is_uri else line for line, is_uri in lines) + "\n"
+        cache.set(key, text, settings.HLS_URL_EXPIRES - settings.HLS_URL_MIN_REMAINING)
+    return text
+
+
+@require_GET
+def playlist(request, pk, name):
+    """GET /api/videos/{pk}/hls/<name>?token=...: a playlist of a packaged video."""
+    if not PLAYLIST_RE.fullmatch(name):
+        raise Http404("No such playlist")
+    token = request.GET.get("token", "")
+    prefix = read_token(token, pk)
+    if prefix is None:
+        return JsonResponse({"detail": "Invalid or expired playlist token"}, status=status.HTTP_403_FORBIDDEN)
+
+    text = master_playlist(prefix, token) if name == MASTER_PLAYLIST else media_playlist(prefix, name)
+    response = HttpResponse(text, content_type=PLAYLIST_TYPE)
+    # the token and the segment URLs expire; let the player come back here
+    response["Cache-Control"] = "no-store"
+    return response
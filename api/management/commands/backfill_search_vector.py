@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Video
+from api.search import VIDEO_SEARCH_VECTOR
+
+
+class Command(BaseCommand):
+    help = "Fill videos.search_vector for existing rows, in primary-key batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row, not just rows where search_vector is NULL.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        qs = Video.objects.order_by("pk")
+        if not options["all"]:
+            qs = qs.filter(search_vector__isnull=True)
+
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(qs.filter(pk__gt=last_id).values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+
+            # one short transaction per batch keeps row locks brief
+            with transaction.atomic():
+                updated += Video.objects.filter(pk__in=ids).update(
+                    search_vector=VIDEO_SEARCH_VECTOR
+                )
+
+            last_id = ids[-1]
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  ... {updated} videos (last id {last_id})")
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Backfilled search_vector for {updated} videos"))
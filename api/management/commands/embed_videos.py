@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.embeddings import get_embedder, video_document
+from api.models import Video
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute videos.embedding_vector in batches. Rows are read in "
+        "primary-key order, one batch at a time, so the whole table is never "
+        "loaded at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=256)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-embed every row, not just rows without an embedding.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        embedder = get_embedder()
+
+        qs = Video.objects.order_by("pk")
+        if not options["all"]:
+            qs = qs.filter(embedding_vector__isnull=True)
+
+        last_id = 0
+        embedded = 0
+        while True:
+            rows = list(
+                qs.filter(pk__gt=last_id).values_list(
+                    "pk", "title", "description", "transcript", "tags"
+                )[:batch_size]
+            )
+            if not rows:
+                break
+
+            vectors = embedder.embed([video_document(*row[1:]) for row in rows])
+            videos = [
+                Video(pk=row[0], embedding_vector=vector)
+                for row, vector in zip(rows, vectors)
+            ]
+            with transaction.atomic():
+                Video.objects.bulk_update(videos, ["embedding_vector"])
+
+            embedded += len(rows)
+            last_id = rows[-1][0]
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  ... {embedded} videos (last id {last_id})")
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Embedded {embedded} videos"))
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api import bulk
+from api.streaming import CSV, NDJSON, write_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every course or video to an NDJSON or CSV file ('-' for stdout) "
+        "in a form import_catalog reads back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(bulk.IMPORTERS))
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--format", choices=[NDJSON, CSV],
+                            help="default: from the file extension, else ndjson")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or (CSV if path.lower().endswith(".csv") else NDJSON)
+        fields, rows = bulk.export_rows(options["kind"])
+        out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+        try:
+            for chunk in write_records(rows, fields, fmt):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,60 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import bulk
+from api.models import PortalUser
+from api.streaming import CSV, NDJSON, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import courses or videos from an NDJSON or CSV file ('-' for stdin). "
+        "Invalid records are skipped and reported; everything else is inserted in "
+        "batches of --batch-size, one transaction each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(bulk.IMPORTERS))
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=[NDJSON, CSV],
+                            help="default: from the file extension, else ndjson")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--user", help="email of the user recorded as creator/uploader")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            user = PortalUser.objects.filter(email=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        path = options["path"]
+        fmt = options["format"] or (CSV if path.lower().endswith(".csv") else NDJSON)
+        started = time.perf_counter()
+        try:
+            stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        except OSError as exc:
+            raise CommandError(str(exc))
+        try:
+            result = bulk.import_records(
+                options["kind"], read_records(stream, fmt), user=user, batch_size=options["batch_size"],
+            )
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        elapsed = max(time.perf_counter() - started, 1e-9)
+
+        for error in result.as_dict()["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... and {result.failed - len(result.errors)} more invalid records")
+        if options["verbosity"]:
+            created = sum(result.created.values())
+            summary = ", ".join(f"{count} {kind}" for kind, count in sorted(result.created.items()) if count)
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported {summary or 'nothing'} in {elapsed:.1f}s ({created / elapsed:.0f} rows/s), "
+                f"{result.failed} records skipped"
+            ))
@@ -0,0 +1,96 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import MD5
+
+from api.models import TranscriptIndexState, TranscriptPassage, Video
+from api.transcripts import MAX_PASSAGE_WORDS, PASSAGE_WORDS, split_batch, write_passages
+
+class Command(BaseCommand):
+    help = (
+        "Split video transcripts into timestamped passages for passage search. "
+        "Resumable: only videos whose transcript changed since it was last "
+        "indexed are processed, unless --all is given. Passages of videos "
+        "whose transcript was removed are deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch-size", type=int, default=100, help="videos per worker task")
+        parser.add_argument("--passage-words", type=int, default=PASSAGE_WORDS)
+        parser.add_argument("--max-words", type=int, default=MAX_PASSAGE_WORDS)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-index every transcript, not just new or edited ones.",
+        )
+
+    def handle(self, *args, **options):
+        # transcripts that were cleared leave nothing to re-index; drop their
+        # passages and state so passage search stops returning them (edited
+        # ones are replaced below)
+        cleared = Q(video__transcript__isnull=True) | Q(video__transcript="")
+        with transaction.atomic():
+            TranscriptPassage.objects.filter(cleared).delete()
+            pruned, _ = TranscriptIndexState.objects.filter(cleared).delete()
+        if pruned and options["verbosity"]:
+            self.stdout.write(f"Removed the passages of {pruned} videos without a transcript")
+
+        qs = Video.objects.exclude(transcript__isnull=True).exclude(transcript="")
+        if not options["all"]:
+            qs = qs.filter(
+                Q(transcript_index__isnull=True)
+                | ~Q(transcript_index__transcript_md5=MD5(F("transcript")))
+            )
+        rows = qs.order_by("pk").values_list("pk", "transcript", "duration").iterator(chunk_size=2000)
+
+        split = partial(
+            split_batch, passage_words=options["passage_words"], max_words=options["max_words"]
+        )
+        workers = max(1, options["workers"])
+        videos = passages = chars = 0
+        started = time.perf_counter()
+
+        # keep a bounded number of batches in flight so the rows are
+        # streamed through instead of all being read up front
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+
+            def drain(limit):
+                nonlocal videos, passages
+                while len(in_flight) > limit:
+                    results = in_flight.popleft().result()
+                    passages += write_passages(results)
+                    videos += len(results)
+                    if options["verbosity"] > 1:
+                        elapsed = time.perf_counter() - started
+                        self.stdout.write(
+                            f"  ... {videos} videos, {passages} passages "
+                            f"({videos / elapsed:.1f} videos/s)"
+                        )
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                chars += len(row[1])
+                if len(batch) >= options["batch_size"]:
+                    in_flight.append(pool.submit(split, batch))
+                    batch = []
+                    drain(workers * 2)
+            if batch:
+                in_flight.append(pool.submit(split, batch))
+            drain(0)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {videos} transcripts into {passages} passages in {elapsed:.1f}s "
+                f"({videos / elapsed:.1f} videos/s, {passages / elapsed:.0f} passages/s, "
+                f"{chars / elapsed / 1e6:.2f} M chars/s) with {workers} workers"
+            ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import Video
+from api.processing import package_hls
+from api.tasks import enqueue_many
+
+
+class Command(BaseCommand):
+    help = (
+        "Package videos for HLS streaming (api/hls.py): queue a package_hls "
+        "job for every video without an HLS manifest, or only the --video ids. "
+        "--now packages them in this process instead, e.g. to try it locally "
+        "without a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video", type=int, action="append", help="video id (repeatable)")
+        parser.add_argument("--now", action="store_true", help="package here instead of queueing jobs")
+
+    def handle(self, *args, **options):
+        qs = Video.objects.filter(hls_manifest__isnull=True).exclude(file_url="")
+        if options["video"]:
+            qs = qs.filter(pk__in=options["video"])
+        video_ids = list(qs.order_by("pk").values_list("pk", flat=True))
+
+        if not options["now"]:
+            enqueue_many("package_hls", [{"video_id": video_id} for video_id in video_ids])
+            if options["verbosity"]:
+                self.stdout.write(self.style.SUCCESS(f"Queued {len(video_ids)} videos for HLS packaging"))
+            return
+
+        for video_id in video_ids:
+            started = time.perf_counter()
+            package_hls(video_id)
+            if options["verbosity"]:
+                manifest = Video.objects.filter(pk=video_id).values_list("hls_manifest", flat=True).first()
+                self.stdout.write(
+                    f"Video {video_id}: {manifest or 'not packaged'} ({time.perf_counter() - started:.1f}s)"
+                )
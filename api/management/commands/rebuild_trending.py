@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the trending leaderboards from the interaction tables. "
+        "Takes back deleted likes/ratings and drops entries that have decayed away."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = trending.rebuild()
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt trending_scores: {rows} leaderboard entries"))
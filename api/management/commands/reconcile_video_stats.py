@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute video_stats (likes, bookmarks, comments, ratings) from the interaction tables."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = stats.reconcile()
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled video_stats: {changed} videos changed"))
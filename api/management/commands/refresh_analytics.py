@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the rollups behind the course and video analytics endpoints "
+        "with the progress and ratings changed since the last refresh. Run "
+        "every few minutes; --full recomputes everything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="recompute every rollup (picks up deleted progress rows and moved videos)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = analytics.refresh(full=options["full"])
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Refreshed analytics of {result['videos']} videos, {result['students']} course "
+                f"students and {result['courses']} courses in {time.perf_counter() - started:.1f}s"
+            ))
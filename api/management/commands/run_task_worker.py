@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import tasks
+# registers the jobs
+import api.processing  # noqa: F401
+
+
+def _worker(stop, batch_size, burst, done):
+    # the parent turns SIGTERM/SIGINT into `stop`; the current job finishes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    count = tasks.work(stop, batch_size=batch_size, burst=burst)
+    with done.get_lock():
+        done.value += count
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (api/tasks.py) in --workers processes "
+        "until SIGTERM or SIGINT; a job that is running then finishes first. "
+        "--burst exits once the queue has nothing due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch-size", type=int, default=1, help="jobs claimed at a time per worker")
+        parser.add_argument("--burst", action="store_true", help="exit when no job is due")
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context("fork")
+        stop, done = context.Event(), context.Value("q", 0)
+        workers = max(1, options["workers"])
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        def start():
+            process = context.Process(target=_worker, args=(stop, options["batch_size"], options["burst"], done))
+            process.start()
+            return process
+
+        # children must not share the parent's database connection
+        connections.close_all()
+        started = time.perf_counter()
+        processes = [start() for _ in range(workers)]
+        if options["verbosity"]:
+            self.stdout.write(f"Running jobs in {workers} workers")
+
+        while processes:
+            for process in list(processes):
+                process.join(timeout=1 / workers)
+                if process.is_alive():
+                    continue
+                processes.remove(process)
+                if process.exitcode != 0 and not stop.is_set() and not options["burst"]:
+                    # a crashed worker's claimed jobs come back after TASK_LEASE
+                    self.stderr.write(f"Worker exited with {process.exitcode}, restarting")
+                    processes.append(start())
+
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Ran {done.value} jobs in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,54 @@
+# Adds a weighted full-text search column to the (unmanaged) videos table.
+#
+# The column is maintained by a trigger on INSERT/UPDATE. Existing rows are
+# filled in afterwards with `python manage.py backfill_search_vector` so the
+# migration doesn't rewrite the whole table in a single transaction.
+
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION videos_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.transcript, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.difficulty_level, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS videos_search_vector_trigger ON videos;
+CREATE TRIGGER videos_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, transcript, difficulty_level
+    ON videos
+    FOR EACH ROW EXECUTE FUNCTION videos_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS videos_search_vector_trigger ON videos;
+DROP FUNCTION IF EXISTS videos_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_vector tsvector;",
+            "ALTER TABLE videos DROP COLUMN IF EXISTS search_vector;",
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.RunSQL(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_search_vector_gin "
+            "ON videos USING gin (search_vector);",
+            "DROP INDEX CONCURRENTLY IF EXISTS videos_search_vector_gin;",
+        ),
+    ]
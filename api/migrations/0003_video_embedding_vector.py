@@ -0,0 +1,31 @@
+# Adds the pgvector embedding column to the (unmanaged) videos table and an
+# HNSW index for cosine-distance nearest-neighbour search. Rows are embedded
+# afterwards with `python manage.py embed_videos`.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("api", "0002_video_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE EXTENSION IF NOT EXISTS vector;",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            "ALTER TABLE videos ADD COLUMN IF NOT EXISTS embedding_vector vector(768);",
+            "ALTER TABLE videos DROP COLUMN IF EXISTS embedding_vector;",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_embedding_vector_hnsw "
+            "ON videos USING hnsw (embedding_vector vector_cosine_ops);",
+            "DROP INDEX CONCURRENTLY IF EXISTS videos_embedding_vector_hnsw;",
+        ),
+    ]
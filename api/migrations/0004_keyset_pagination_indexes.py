@@ -0,0 +1,34 @@
+# Composite (timestamp, pk) indexes backing KeysetCursorPagination, so every
+# page of a list endpoint is an index range scan.
+
+from django.db import migrations
+
+INDEXES = [
+    ("users_created_at_pk", "users", "created_at, user_id"),
+    ("courses_created_at_pk", "courses", "created_at, course_id"),
+    ("videos_uploaded_at_pk", "videos", "uploaded_at, video_id"),
+    ("video_progress_updated_at_pk", "video_progress", "updated_at, id"),
+    ("likes_created_at_pk", "likes", "created_at, id"),
+    ("comments_created_at_pk", "comments", "created_at, id"),
+    ("bookmarks_created_at_pk", "bookmarks", "created_at, id"),
+    ("ratings_created_at_pk", "ratings", "created_at, id"),
+    ("search_logs_searched_at_pk", "search_logs", "searched_at, id"),
+]
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("api", "0003_video_embedding_vector"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns});",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {name};",
+        )
+        for name, table, columns in INDEXES
+    ]
@@ -0,0 +1,46 @@
+# Per-video engagement counters (likes, bookmarks, comments, ratings).
+#
+# Rows are created lazily by the interaction viewsets (api/stats.py). Existing
+# data is counted afterwards with `python manage.py reconcile_video_stats`.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS video_stats (
+    video_id integer PRIMARY KEY REFERENCES videos(video_id) ON DELETE CASCADE,
+    like_count integer NOT NULL DEFAULT 0,
+    bookmark_count integer NOT NULL DEFAULT 0,
+    comment_count integer NOT NULL DEFAULT 0,
+    rating_sum bigint NOT NULL DEFAULT 0,
+    rating_count integer NOT NULL DEFAULT 0,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLE, "DROP TABLE IF EXISTS video_stats;"),
+        migrations.CreateModel(
+            name="VideoStats",
+            fields=[
+                ("video", models.OneToOneField(db_column="video_id", on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="stats", serialize=False, to="api.video")),
+                ("like_count", models.IntegerField(default=0)),
+                ("bookmark_count", models.IntegerField(default=0)),
+                ("comment_count", models.IntegerField(default=0)),
+                ("rating_sum", models.BigIntegerField(default=0)),
+                ("rating_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "video_stats",
+                "managed": False,
+            },
+        ),
+    ]
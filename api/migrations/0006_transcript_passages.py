@@ -0,0 +1,85 @@
+# Timestamped transcript passages for passage-level search (?mode=passages).
+#
+# Rows are written by `python manage.py index_transcripts`, which records the
+# md5 of the transcript each video was indexed from in transcript_index_state
+# so re-runs only touch new or edited transcripts.
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS transcript_passages (
+    id bigserial PRIMARY KEY,
+    video_id integer NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    position integer NOT NULL,
+    start_seconds double precision NOT NULL,
+    end_seconds double precision,
+    char_start integer NOT NULL,
+    char_end integer NOT NULL,
+    text text NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', text)) STORED,
+    UNIQUE (video_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS transcript_index_state (
+    video_id integer PRIMARY KEY REFERENCES videos(video_id) ON DELETE CASCADE,
+    transcript_md5 varchar(32) NOT NULL,
+    passage_count integer NOT NULL DEFAULT 0,
+    indexed_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+DROP_TABLES = """
+DROP TABLE IF EXISTS transcript_index_state;
+DROP TABLE IF EXISTS transcript_passages;
+"""
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("api", "0005_video_stats"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLES, DROP_TABLES),
+        migrations.RunSQL(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS transcript_passages_search_vector_gin "
+            "ON transcript_passages USING gin (search_vector);",
+            "DROP INDEX CONCURRENTLY IF EXISTS transcript_passages_search_vector_gin;",
+        ),
+        migrations.CreateModel(
+            name="TranscriptIndexState",
+            fields=[
+                ("video", models.OneToOneField(db_column="video_id", on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name="transcript_index", serialize=False, to="api.video")),
+                ("transcript_md5", models.CharField(max_length=32)),
+                ("passage_count", models.IntegerField(default=0)),
+                ("indexed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "transcript_index_state",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="TranscriptPassage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("position", models.IntegerField()),
+                ("start_seconds", models.FloatField()),
+                ("end_seconds", models.FloatField(null=True)),
+                ("char_start", models.IntegerField()),
+                ("char_end", models.IntegerField()),
+                ("text", models.TextField()),
+                ("search_vector", django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+            ],
+            options={
+                "db_table": "transcript_passages",
+                "managed": False,
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Precomputed item-item neighbours for GET /api/videos/recommended/.
+#
+# Rebuilt wholesale by `python manage.py build_recommendations`; each video
+# keeps its top RECOMMENDATION_NEIGHBORS most similar videos, ranked from 0.
+# The primary key (video_id, rank) is the only index the serving query needs;
+# video_stats_popularity orders the fallback for users without a history.
+
+from django.db import migrations, models
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS video_neighbors (
+    video_id integer NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    rank smallint NOT NULL,
+    neighbor_id integer NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    score real NOT NULL,
+    PRIMARY KEY (video_id, rank)
+);
+
+-- for the ON DELETE CASCADE from the neighbour side
+CREATE INDEX IF NOT EXISTS video_neighbors_neighbor_id ON video_neighbors (neighbor_id);
+
+-- most engaged-with videos, for users with no history to recommend from
+CREATE INDEX IF NOT EXISTS video_stats_popularity
+    ON video_stats ((like_count + bookmark_count) DESC, video_id DESC);
+"""
+
+DROP_TABLE = """
+DROP INDEX IF EXISTS video_stats_popularity;
+DROP TABLE IF EXISTS video_neighbors;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_transcript_passages"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+        migrations.CreateModel(
+            name="VideoNeighbor",
+            fields=[
+                ("pk", models.CompositePrimaryKey("video", "rank", blank=True, editable=False, primary_key=True, serialize=False)),
+                ("rank", models.SmallIntegerField()),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "db_table": "video_neighbors",
+                "managed": False,
+            },
+        ),
+    ]
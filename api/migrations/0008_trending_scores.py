@@ -0,0 +1,48 @@
+# Time-decayed popularity leaderboards (api/trending.py).
+#
+# One row per (board, entity): board is "videos", "videos:course:<id>",
+# "courses" or "courses:category:<name>" and entity_id a video or course id.
+# score is a log-space weight relative to a fixed epoch, so the
+# (board, score DESC) index lists each board in trending order.
+
+from django.db import migrations, models
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS trending_scores (
+    board text NOT NULL,
+    entity_id integer NOT NULL,
+    score double precision NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (board, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS trending_scores_board_score
+    ON trending_scores (board, score DESC, entity_id DESC);
+"""
+
+DROP_TABLE = "DROP TABLE IF EXISTS trending_scores;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_video_neighbors"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+        migrations.CreateModel(
+            name="TrendingScore",
+            fields=[
+                ("pk", models.CompositePrimaryKey("board", "entity_id", blank=True, editable=False, primary_key=True, serialize=False)),
+                ("board", models.TextField()),
+                ("entity_id", models.IntegerField()),
+                ("score", models.FloatField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "trending_scores",
+                "managed": False,
+            },
+        ),
+    ]
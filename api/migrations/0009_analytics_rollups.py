@@ -0,0 +1,126 @@
+# Rollups behind GET /api/courses/{id}/analytics/ and /api/videos/{id}/analytics/
+# (api/analytics.py), refreshed by `python manage.py refresh_analytics`.
+#
+# video_analytics    one row per video: viewers, completions, the summed
+#                    watched fraction, where unfinished viewers stopped
+#                    (dropoff, one count per slice of the video) and how
+#                    many ratings of each value (rating_counts[1..5])
+# course_students    one row per (course, student): how many of the course's
+#                    videos they started and completed
+# course_analytics   one row per course: students, and those who completed
+#                    every video
+#
+# A refresh only recomputes what changed, which needs progress and ratings
+# by video, videos by course, and progress by (user, video) (the existing
+# unique index).
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS video_analytics (
+    video_id integer PRIMARY KEY REFERENCES videos(video_id) ON DELETE CASCADE,
+    viewers integer NOT NULL DEFAULT 0,
+    completed integer NOT NULL DEFAULT 0,
+    watched_sum double precision NOT NULL DEFAULT 0,
+    watched_count integer NOT NULL DEFAULT 0,
+    dropoff integer[] NOT NULL,
+    rating_counts integer[] NOT NULL,
+    refreshed_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS course_students (
+    course_id integer NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    videos_started integer NOT NULL,
+    videos_completed integer NOT NULL,
+    PRIMARY KEY (course_id, user_id)
+);
+
+-- for the ON DELETE CASCADE from users
+CREATE INDEX IF NOT EXISTS course_students_user_id ON course_students (user_id);
+
+CREATE TABLE IF NOT EXISTS course_analytics (
+    course_id integer PRIMARY KEY REFERENCES courses(course_id) ON DELETE CASCADE,
+    students integer NOT NULL DEFAULT 0,
+    completed_students integer NOT NULL DEFAULT 0,
+    refreshed_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+DROP_TABLES = """
+DROP TABLE IF EXISTS course_analytics;
+DROP TABLE IF EXISTS course_students;
+DROP TABLE IF EXISTS video_analytics;
+"""
+
+INDEXES = [
+    # covers the per-video aggregate, which then needn't visit the table
+    ("video_progress_video_id", "video_progress", "(video_id) INCLUDE (watched_seconds, completed)"),
+    ("ratings_video_id", "ratings", "(video_id)"),
+    ("videos_course_id", "videos", "(course_id)"),
+]
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("api", "0008_trending_scores"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLES, DROP_TABLES),
+        *[
+            migrations.RunSQL(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns};",
+                f"DROP INDEX CONCURRENTLY IF EXISTS {name};",
+            )
+            for name, table, columns in INDEXES
+        ],
+        migrations.CreateModel(
+            name="VideoAnalytics",
+            fields=[
+                ("video", models.OneToOneField(db_column="video_id", on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name="analytics", serialize=False, to="api.video")),
+                ("viewers", models.IntegerField(default=0)),
+                ("completed", models.IntegerField(default=0)),
+                ("watched_sum", models.FloatField(default=0)),
+                ("watched_count", models.IntegerField(default=0)),
+                ("dropoff", django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ("rating_counts", django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "video_analytics",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="CourseStudent",
+            fields=[
+                ("pk", models.CompositePrimaryKey("course", "user", blank=True, editable=False, primary_key=True, serialize=False)),
+                ("videos_started", models.IntegerField()),
+                ("videos_completed", models.IntegerField()),
+            ],
+            options={
+                "db_table": "course_students",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="CourseAnalytics",
+            fields=[
+                ("course", models.OneToOneField(db_column="course_id", on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name="analytics", serialize=False, to="api.course")),
+                ("students", models.IntegerField(default=0)),
+                ("completed_students", models.IntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "course_analytics",
+                "managed": False,
+            },
+        ),
+    ]
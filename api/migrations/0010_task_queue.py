@@ -0,0 +1,58 @@
+# Background jobs (api/tasks.py), run by `python manage.py run_task_worker`.
+#
+# One row per pending job. run_at is when it may run next: a worker claims due
+# rows with FOR UPDATE SKIP LOCKED and pushes run_at out by a lease, so the job
+# comes back by itself if the worker dies. Done jobs are deleted; a job out of
+# attempts keeps its row with failed_at set. The partial index covers exactly
+# the rows a worker looks for, and the table is vacuumed early because every
+# job is an insert, an update or more, and a delete.
+
+import django.utils.timezone
+from django.db import migrations, models
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS task_queue (
+    id bigserial PRIMARY KEY,
+    task text NOT NULL,
+    args jsonb NOT NULL DEFAULT '{}',
+    run_at timestamptz NOT NULL DEFAULT now(),
+    attempts integer NOT NULL DEFAULT 0,
+    max_attempts integer NOT NULL DEFAULT 5,
+    last_error text,
+    failed_at timestamptz,
+    created_at timestamptz NOT NULL DEFAULT now()
+) WITH (autovacuum_vacuum_scale_factor = 0.01, autovacuum_vacuum_cost_delay = 0);
+
+CREATE INDEX IF NOT EXISTS task_queue_due ON task_queue (run_at, id) WHERE failed_at IS NULL;
+"""
+
+DROP_TABLE = "DROP TABLE IF EXISTS task_queue;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_analytics_rollups"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+        migrations.CreateModel(
+            name="Task",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("task", models.TextField()),
+                ("args", models.JSONField(default=dict)),
+                ("run_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("attempts", models.IntegerField(default=0)),
+                ("max_attempts", models.IntegerField(default=5)),
+                ("last_error", models.TextField(blank=True, null=True)),
+                ("failed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "task_queue",
+                "managed": False,
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Object key of a video's HLS master playlist (api/hls.py), set by the
+# package_hls job once its renditions are uploaded. NULL until then, and
+# `play` only offers the original file.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_task_queue"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "ALTER TABLE videos ADD COLUMN IF NOT EXISTS hls_manifest varchar(500);",
+            "ALTER TABLE videos DROP COLUMN IF EXISTS hls_manifest;",
+        ),
+    ]
@@ -3,8 +3,11 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password
 from django.conf import settings
+from django.utils import timezone
 
 #from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
 from pgvector.django import VectorField  # requires pgvector extension
 
 class PortalUserManager(BaseUserManager):
@@ -66,11 +69,6 @@ class PortalUser(AbstractBaseUser):
         db_table = "users"          # ✅ map to existing table
         managed = False
 
-    def set_password(self, raw_password):
-        super().set_password(raw_password)
-        self.password = self.password  # Django stores hash in .password
-        self.password = None  # avoid confusion
-    
     def check_password(self, raw_password):
         return super().check_password(raw_password)    
         
@@ -160,7 +158,13 @@ class Video(models.Model):
         blank=True
     )
     tags = models.JSONField(null=True, blank=True)
-    #embedding_vector = VectorField(dimensions=768, null=True, blank=True)
+    # object key of the HLS master playlist, set by the package_hls job
+    # (api/hls.py, migration 0011)
+    hls_manifest = models.CharField(max_length=500, null=True, blank=True, editable=False)
+    # filled in offline by `python manage.py embed_videos` (see migration 0003)
+    embedding_vector = VectorField(dimensions=768, null=True, blank=True, editable=False)
+    # weighted tsvector kept up to date by a trigger (see migration 0002)
+    search_vector = SearchVectorField(null=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -168,6 +172,200 @@ class Video(models.Model):
         managed = False  # Django won’t try to recreate/alter the table
 
 
+class VideoStats(models.Model):
+    """
+    Denormalized engagement counters for a video. Kept up to date by the
+    like/bookmark/comment/rating viewsets (api/stats.py) and recomputed by
+    `python manage.py reconcile_video_stats`.
+    """
+    video = models.OneToOneField(
+        Video,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column="video_id",
+        related_name="stats",
+    )
+    like_count = models.IntegerField(default=0)
+    bookmark_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    rating_sum = models.BigIntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "video_stats"
+        managed = False
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+
+
+class TranscriptPassage(models.Model):
+    """
+    A timestamped slice of a video's transcript, written by
+    `python manage.py index_transcripts` (api/transcripts.py). char_start and
+    char_end are offsets into Video.transcript.
+    """
+    # DO_NOTHING: the foreign key cascades in the database (migration 0006),
+    # so deleting a video doesn't load its passages first
+    video = models.ForeignKey(
+        Video,
+        on_delete=models.DO_NOTHING,
+        db_column="video_id",
+        related_name="passages",
+    )
+    position = models.IntegerField()
+    start_seconds = models.FloatField()
+    end_seconds = models.FloatField(null=True)
+    char_start = models.IntegerField()
+    char_end = models.IntegerField()
+    text = models.TextField()
+    # generated column: to_tsvector('english', text)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        db_table = "transcript_passages"
+        managed = False
+        unique_together = ("video", "position")
+
+
+class TranscriptIndexState(models.Model):
+    """Which transcript (by md5) a video's passages were built from."""
+    video = models.OneToOneField(
+        Video,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="video_id",
+        related_name="transcript_index",
+    )
+    transcript_md5 = models.CharField(max_length=32)
+    passage_count = models.IntegerField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "transcript_index_state"
+        managed = False
+
+
+class VideoNeighbor(models.Model):
+    """
+    One of a video's most similar videos by who engaged with both, written
+    by `python manage.py build_recommendations` (api/recommendations.py).
+    """
+    pk = models.CompositePrimaryKey("video", "rank")
+    # DO_NOTHING: both foreign keys cascade in the database (migration 0007)
+    video = models.ForeignKey(
+        Video,
+        on_delete=models.DO_NOTHING,
+        db_column="video_id",
+        related_name="neighbors",
+    )
+    rank = models.SmallIntegerField()
+    neighbor = models.ForeignKey(
+        Video,
+        on_delete=models.DO_NOTHING,
+        db_column="neighbor_id",
+        related_name="+",
+    )
+    score = models.FloatField()
+
+    class Meta:
+        db_table = "video_neighbors"
+        managed = False
+
+
+class TrendingScore(models.Model):
+    """
+    A video's or course's place on a trending leaderboard (api/trending.py).
+    score is log-space and only meaningful relative to other scores.
+    """
+    pk = models.CompositePrimaryKey("board", "entity_id")
+    board = models.TextField()
+    entity_id = models.IntegerField()
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "trending_scores"
+        managed = False
+
+
+class VideoAnalytics(models.Model):
+    """
+    Rolled-up watch and rating numbers of a video, written by
+    `python manage.py refresh_analytics` (api/analytics.py).
+    """
+    # DO_NOTHING: the foreign keys of the rollup tables cascade in the
+    # database (migration 0009)
+    video = models.OneToOneField(
+        Video,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="video_id",
+        related_name="analytics",
+    )
+    viewers = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    # sum and count of watched_seconds / duration, for videos with a duration
+    watched_sum = models.FloatField(default=0)
+    watched_count = models.IntegerField(default=0)
+    # unfinished viewers by where they stopped, in ANALYTICS_DROPOFF_BUCKETS
+    # equal slices of the video
+    dropoff = ArrayField(models.IntegerField())
+    # number of 1..5 star ratings
+    rating_counts = ArrayField(models.IntegerField())
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "video_analytics"
+        managed = False
+
+
+class CourseStudent(models.Model):
+    """How far one student got through a course (api/analytics.py)."""
+    pk = models.CompositePrimaryKey("course", "user")
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.DO_NOTHING,
+        db_column="course_id",
+        related_name="students",
+    )
+    user = models.ForeignKey(
+        PortalUser,
+        on_delete=models.DO_NOTHING,
+        db_column="user_id",
+        related_name="+",
+    )
+    videos_started = models.IntegerField()
+    videos_completed = models.IntegerField()
+
+    class Meta:
+        db_table = "course_students"
+        managed = False
+
+
+class CourseAnalytics(models.Model):
+    """Rolled-up student numbers of a course (api/analytics.py)."""
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="course_id",
+        related_name="analytics",
+    )
+    students = models.IntegerField(default=0)
+    # students who completed every video of the course
+    completed_students = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "course_analytics"
+        managed = False
+
+
 class VideoProgress(models.Model):
     user = models.ForeignKey(PortalUser, on_delete=models.CASCADE, related_name="video_progress")
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="progress")
@@ -224,10 +422,34 @@ class Rating(models.Model):
 class SearchLog(models.Model):
     user = models.ForeignKey(PortalUser, on_delete=models.SET_NULL, null=True, blank=True)
     query = models.CharField(max_length=255)
-    searched_at = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add: buffered rows (api/search_log.py) keep the time of
+    # the search rather than the time they were flushed
+    searched_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         db_table = "search_logs"
         managed = False
 
 
+
+
+class Task(models.Model):
+    """
+    A pending background job (api/tasks.py): `task` names a registered
+    function and `args` are its keyword arguments.
+    """
+    id = models.BigAutoField(primary_key=True)
+    task = models.TextField()
+    args = models.JSONField(default=dict)
+    # when it may run next; pushed out while a worker has it and between retries
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(null=True, blank=True)
+    # set when it ran out of attempts; done jobs are deleted
+    failed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "task_queue"
+        managed = False
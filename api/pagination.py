@@ -0,0 +1,138 @@
+# api/pagination.py
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Default pagination for list endpoints: a cursor over (timestamp, pk).
+
+    DRF's CursorPagination only keys on the first ordering field and falls
+    back to OFFSET for rows sharing a timestamp. Here the cursor position
+    holds both values, so every position is unique and a page is always a
+    plain index range scan: no OFFSET and no COUNT(*), however deep the page.
+
+    Views pick their ordering with a `pagination_ordering` attribute, e.g.
+    ("-created_at", "-pk"). All fields must sort in the same direction.
+
+    The cursor's offset is never a row count here: 1 means the page starts
+    at the row at the position rather than after it, which is how the links
+    of an empty page lead back to the row the cursor pointed at.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-created_at", "-pk")
+
+    # separates the values inside a cursor position
+    separator = "|"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(getattr(view, "pagination_ordering", self.ordering))
+        assert len({field.startswith("-") for field in ordering}) == 1, (
+            "KeysetCursorPagination needs all ordering fields in one direction"
+        )
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(instance, field.lstrip("-"))
+            values.append(value.isoformat() if hasattr(value, "isoformat") else str(value))
+        return self.separator.join(values)
+
+    def _filter_by_position(self, queryset, position, reverse, inclusive=False):
+        """Rows after `position` in (reversed) ordering, strictly unless `inclusive`."""
+        fields = [field.lstrip("-") for field in self.ordering]
+        values = position.split(self.separator)
+        if len(values) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+
+        descending = self.ordering[0].startswith("-") != reverse
+        op, bound = ("lt", "lte") if descending else ("gt", "gte")
+        last_op = bound if inclusive else op
+
+        first, first_value = fields[0], values[0]
+        if len(fields) == 1:
+            condition = Q(**{f"{first}__{last_op}": first_value})
+        else:
+            # (a, b) < (x, y) written so the planner can use `a <= x` as the
+            # index range bound and only tie-break on b for equal timestamps
+            condition = Q(**{f"{first}__{bound}": first_value}) & (
+                Q(**{f"{first}__{op}": first_value}) | Q(**{f"{fields[1]}__{last_op}": values[1]})
+            )
+
+        try:
+            return queryset.filter(condition)
+        except (ValidationError, ValueError, TypeError):
+            # a tampered cursor with values of the wrong type
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.cursor = Cursor(offset=0, reverse=False, position=None)
+        reverse, current_position = self.cursor.reverse, self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = self._filter_by_position(
+                queryset, current_position, reverse, inclusive=bool(self.cursor.offset)
+            )
+
+        # fetch one extra row to find out whether there is another page
+        # further along in the direction we're reading
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # a position means "strictly after this row" going forward and
+        # "strictly before this row" going back, so links point at the
+        # first/last row actually shown
+        if reverse:
+            self.has_next = current_position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = current_position is not None
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+            self.link_offset = 0
+        else:
+            # an empty page: step back from the cursor itself, including the
+            # row it points at (the last one shown before this page)
+            self.next_position = self.previous_position = current_position
+            self.link_offset = 1
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=self.link_offset, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=self.link_offset, reverse=True, position=self.previous_position))
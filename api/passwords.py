@@ -0,0 +1,79 @@
+# api/passwords.py
+#
+# Password hashers (PASSWORD_HASHERS) for login storms.
+#
+# Argon2 is preferred, with the cost in settings (PASSWORD_ARGON2_*): about a
+# twentieth of the CPU of Django's PBKDF2 at its 1,000,000 iterations, and
+# memory-hard, so a GPU doesn't get the advantage PBKDF2 gives it. A PBKDF2 hash still
+# verifies and is replaced by an Argon2 one on that user's next login
+# (Django's check_password does this for any hash that isn't from the first
+# hasher or has other parameters).
+#
+# Every hash and verification of these hashers runs on a small per-process
+# pool of PASSWORD_HASH_WORKERS threads. argon2 and hashlib release the GIL,
+# so the request's thread just waits and a process serving several requests
+# at once (ASYNC_API, or gunicorn --threads) keeps serving the others while
+# at most that many logins use its CPU. A login that can't get a slot within
+# PASSWORD_HASH_WAIT seconds gets a 503 with Retry-After instead of queueing
+# behind the storm.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_on_pool = threading.local()
+
+
+def _mark_pool_thread():
+    _on_pool.active = True
+
+
+_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash", initializer=_mark_pool_thread,
+)
+_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS)
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins at once, try again in a moment."
+    default_code = "password_hashing_busy"
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        # DRF turns this into Retry-After
+        self.wait = max(1, round(settings.PASSWORD_HASH_WAIT))
+
+
+def offload(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on the hashing pool; PasswordHashingBusy if it's full."""
+    if getattr(_on_pool, "active", False):
+        # already there: verify() calls encode()
+        return fn(*args, **kwargs)
+    if not _slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise PasswordHashingBusy()
+    try:
+        return _pool.submit(fn, *args, **kwargs).result()
+    finally:
+        _slots.release()
+
+
+class OffloadedHasherMixin:
+    def encode(self, password, salt, *args, **kwargs):
+        return offload(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return offload(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(OffloadedHasherMixin, hashers.Argon2PasswordHasher):
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(OffloadedHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
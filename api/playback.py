@@ -0,0 +1,71 @@
+# api/playback.py
+#
+# Play URLs for many videos in one request, for pages that list videos:
+#
+#   GET /api/videos/play-batch/?ids=3,5,8
+#   GET /api/courses/{id}/play-urls/
+#
+# Instead of one /play/ request per video (a request, a query and a
+# signature each), the videos are loaded with one query and every URL
+# missing from the presigned URL cache is signed in one pass
+# (storage.presigned_get_urls). Each video gets what /play/ returns plus
+# its thumbnail, which is presigned too when it's in the bucket.
+import time
+
+from django.conf import settings
+
+from .hls import manifest_url
+from .storage import object_key, presigned_get_urls, public_url
+
+# the Video fields play_urls() reads
+PLAY_FIELDS = ("video_id", "file_url", "hls_manifest", "thumbnail_url")
+
+
+def parse_ids(value):
+    """
+    ?ids=3,5,8 as a list of distinct ids, or (None, error detail) if it's
+    not a list of at most PLAY_BATCH_MAX_IDS integers.
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in (value or "").split(",") if part.strip()))
+    except ValueError:
+        return None, "ids must be a comma-separated list of video ids"
+    if not ids:
+        return None, "ids is required"
+    if len(ids) > settings.PLAY_BATCH_MAX_IDS:
+        return None, f"At most {settings.PLAY_BATCH_MAX_IDS} ids per request"
+    return ids, None
+
+
+def bucket_key(url):
+    """The object key of a URL into our bucket (see public_url), else None."""
+    prefix = public_url("")
+    return url[len(prefix):] if url and url.startswith(prefix) else None
+
+
+def play_urls(request, videos):
+    """{video_id: play URLs} for videos loaded with PLAY_FIELDS, signed together."""
+    file_keys = {video.pk: object_key(video.file_url) for video in videos if video.file_url}
+    thumbnail_keys = {video.pk: bucket_key(video.thumbnail_url) for video in videos}
+    signed = presigned_get_urls(
+        list(file_keys.values()) + [key for key in thumbnail_keys.values() if key]
+    )
+
+    now = time.time()
+    result = {}
+    for video in videos:
+        url, expires_at = signed.get(file_keys.get(video.pk), (None, None))
+        thumbnail_key = thumbnail_keys[video.pk]
+        result[video.pk] = {
+            "url": url,
+            "expires_in": int(expires_at - now) if url else None,
+            "manifest_url": manifest_url(request, video.pk, video.hls_manifest),
+            "thumbnail_url": signed[thumbnail_key][0] if thumbnail_key else video.thumbnail_url,
+        }
+    return result
+
+
+def batch_response(request, ids, videos):
+    """The play-batch body: play URLs by video id, and the ids that don't exist."""
+    urls = play_urls(request, videos)
+    return {"videos": urls, "missing": [pk for pk in ids if pk not in urls]}
@@ -0,0 +1,148 @@
+# api/processing.py
+#
+# Post-upload processing of videos, run by the task queue (api/tasks.py) so
+# it stays off the request path:
+#
+#   process_video       queued for every new video (VideoSerializer.create,
+#                       bulk imports): fills in whichever of duration (ffprobe),
+#                       thumbnail_url (a JPEG frame, stored next to the video)
+#                       and transcript (the file's first subtitle track) are
+#                       missing, then indexes the transcript's passages,
+#                       with a lease covering its three ffmpeg/ffprobe runs
+#   ingest_transcript   queued when a video's transcript is edited
+#   package_hls         queued by process_video: encodes the HLS renditions
+#                       (api/hls.py), with a lease as long as HLS_TIMEOUT
+#
+# ffmpeg reads the object through a presigned URL with range requests, so
+# probing and grabbing a frame don't download the whole file. Without the
+# ffmpeg binaries (FFMPEG_BINARY, FFPROBE_BINARY) the media steps are skipped
+# and only the transcript is indexed. Both jobs only fill in what's missing
+# or stale, so running one twice is harmless.
+import json
+import logging
+import shutil
+import subprocess
+
+from django.conf import settings
+
+from . import hls
+from .caching import invalidate
+from .models import TranscriptIndexState, TranscriptPassage, Video
+from .storage import ensure_bucket, get_s3_client, object_key, presigned_get_url
+from .storage import public_url
+from .tasks import enqueue, task
+from .transcripts import split_batch, transcript_md5, write_passages
+
+logger = logging.getLogger(__name__)
+
+
+class MediaError(Exception):
+    pass
+
+
+def _binary(name):
+    path = shutil.which(name)
+    if path is None:
+        logger.warning("%s not found, skipping media processing", name)
+    return path
+
+
+def _run(command):
+    result = subprocess.run(command, capture_output=True, timeout=settings.FFMPEG_TIMEOUT)
+    if result.returncode != 0:
+        raise MediaError(result.stderr.decode(errors="replace").strip()[-2000:])
+    return result.stdout
+
+
+def probe_duration(ffprobe, url):
+    """The media's duration in whole seconds, or None if it has none."""
+    output = _run([ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", url])
+    duration = json.loads(output).get("format", {}).get("duration")
+    return round(float(duration)) if duration not in (None, "N/A") else None
+
+
+def extract_thumbnail(ffmpeg, url, duration):
+    """A JPEG of the frame THUMBNAIL_POSITION of the way in."""
+    at = duration * settings.THUMBNAIL_POSITION if duration else 0
+    return _run([
+        ffmpeg, "-v", "error", "-ss", f"{at:.2f}", "-i", url, "-frames:v", "1",
+        "-vf", f"scale={settings.THUMBNAIL_WIDTH}:-2", "-f", "image2", "-c:v", "mjpeg", "pipe:1",
+    ])
+
+
+def extract_subtitles(ffmpeg, url):
+    """The first subtitle track as WebVTT, or None if there's no such track."""
+    try:
+        text = _run([ffmpeg, "-v", "error", "-i", url, "-map", "0:s:0", "-f", "webvtt", "pipe:1"])
+    except MediaError:
+        # most videos have no subtitle track, which ffmpeg reports as an error
+        return None
+    return text.decode(errors="replace").strip() or None
+
+
+def store_thumbnail(video_id, image):
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    ensure_bucket(bucket)
+    key = f"{settings.AWS_LOCATION}/thumbnails/{video_id}.jpg"
+    get_s3_client().put_object(Bucket=bucket, Key=key, Body=image, ContentType="image/jpeg")
+    return public_url(key)
+
+
+def index_transcript(video_id, transcript, duration):
+    """Rebuild the video's passages unless they're from this very transcript."""
+    if not transcript:
+        TranscriptPassage.objects.filter(video_id=video_id).delete()
+        TranscriptIndexState.objects.filter(video_id=video_id).delete()
+        return
+    indexed = TranscriptIndexState.objects.filter(video_id=video_id).values_list("transcript_md5", flat=True).first()
+    if indexed != transcript_md5(transcript):
+        write_passages(split_batch([(video_id, transcript, duration)]))
+
+
+# ffprobe and up to two ffmpeg runs of FFMPEG_TIMEOUT each
+@task(lease=3 * settings.FFMPEG_TIMEOUT + settings.TASK_LEASE)
+def process_video(video_id):
+    video = Video.objects.filter(pk=video_id).only(
+        "video_id", "file_url", "duration", "thumbnail_url", "transcript",
+    ).first()
+    if video is None:
+        return
+
+    updates = {}
+    if video.file_url and (video.duration is None or not video.thumbnail_url or not video.transcript):
+        url, _ = presigned_get_url(object_key(video.file_url))
+        ffprobe, ffmpeg = _binary(settings.FFPROBE_BINARY), _binary(settings.FFMPEG_BINARY)
+        if video.duration is None and ffprobe:
+            updates["duration"] = video.duration = probe_duration(ffprobe, url)
+        if not video.thumbnail_url and ffmpeg:
+            updates["thumbnail_url"] = store_thumbnail(video.pk, extract_thumbnail(ffmpeg, url, video.duration))
+        if not video.transcript and ffmpeg:
+            video.transcript = extract_subtitles(ffmpeg, url)
+            if video.transcript:
+                updates["transcript"] = video.transcript
+    if updates:
+        Video.objects.filter(pk=video_id).update(**updates)
+        invalidate("video", video_id)
+
+    index_transcript(video_id, video.transcript, video.duration)
+    if video.file_url:
+        enqueue("package_hls", video_id=video_id)
+
+
+@task()
+def ingest_transcript(video_id):
+    video = Video.objects.filter(pk=video_id).only("video_id", "transcript", "duration").first()
+    if video is not None:
+        index_transcript(video_id, video.transcript, video.duration)
+
+
+@task(max_attempts=3, lease=settings.HLS_TIMEOUT + settings.TASK_LEASE)
+def package_hls(video_id):
+    video = Video.objects.filter(pk=video_id).only("video_id", "file_url", "hls_manifest").first()
+    if video is None or not video.file_url or video.hls_manifest:
+        return
+    ffprobe, ffmpeg = _binary(settings.FFPROBE_BINARY), _binary(settings.FFMPEG_BINARY)
+    if not (ffprobe and ffmpeg):
+        return
+    manifest = hls.package(ffmpeg, ffprobe, video.file_url)
+    Video.objects.filter(pk=video_id).update(hls_manifest=manifest)
@@ -0,0 +1,100 @@
+# api/progress.py
+#
+# Playback heartbeats (POST /api/progress/heartbeat/). Players report the
+# current position every few seconds; instead of a read-modify-write UPDATE
+# per heartbeat, heartbeats are coalesced in memory per (user, video), keeping
+# only the furthest position, and written with one upsert per flush. Each
+# pair therefore hits the database at most once per PROGRESS_FLUSH_INTERVAL.
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from .buffering import BufferedWriter
+from .trending import record_event
+
+# rows per INSERT statement
+WRITE_BATCH_SIZE = 1000
+# every value goes into an int column
+MAX_INT = 2**31 - 1
+
+UPSERT_SQL = """
+INSERT INTO video_progress (user_id, video_id, watched_seconds, completed, updated_at)
+SELECT h.user_id, h.video_id, h.seconds,
+       coalesce(v.duration > 0 AND h.seconds >= v.duration * %s, false),
+       now()
+FROM (VALUES {values}) AS h (user_id, video_id, seconds)
+JOIN videos v ON v.video_id = h.video_id
+JOIN users u ON u.user_id = h.user_id
+ON CONFLICT (user_id, video_id) DO UPDATE SET
+    watched_seconds = GREATEST(video_progress.watched_seconds, EXCLUDED.watched_seconds),
+    completed = video_progress.completed OR EXCLUDED.completed,
+    updated_at = now()
+WHERE EXCLUDED.watched_seconds > video_progress.watched_seconds
+   OR (EXCLUDED.completed AND NOT video_progress.completed)
+-- xmax is 0 for a freshly inserted row: the user's first view of the video
+RETURNING video_id, xmax = 0
+"""
+
+
+def write_progress(rows):
+    """
+    Upsert (user_id, video_id, watched_seconds) rows. Progress never moves
+    backwards, and a video counts as completed once the position passes
+    PROGRESS_COMPLETION_THRESHOLD of its duration. Heartbeats for videos or
+    users that no longer exist are dropped, as are rows with values out of
+    int range, which would fail the whole batch. First views count towards
+    trending. Returns the number of rows written.
+    """
+    # a fixed lock order keeps concurrent flushes from deadlocking
+    rows = sorted(row for row in rows if all(0 <= value <= MAX_INT for value in row))
+    written = 0
+    views = Counter()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            batch = rows[start:start + WRITE_BATCH_SIZE]
+            sql = UPSERT_SQL.format(values=", ".join(["(%s::int, %s::int, %s::int)"] * len(batch)))
+            params = [settings.PROGRESS_COMPLETION_THRESHOLD]
+            for row in batch:
+                params.extend(row)
+            cursor.execute(sql, params)
+            for video_id, inserted in cursor.fetchall():
+                written += 1
+                if inserted:
+                    views[video_id] += 1
+    for video_id, count in views.items():
+        record_event(video_id, "view", count)
+    return written
+
+
+class ProgressBuffer(BufferedWriter):
+    """Pending heartbeats as {(user_id, video_id): furthest watched_seconds}."""
+
+    def new_pending(self):
+        return {}
+
+    def add_to(self, pending, item):
+        user_id, video_id, seconds = item
+        key = (user_id, video_id)
+        if seconds > pending.get(key, -1):
+            pending[key] = seconds
+
+    def write(self, pending):
+        write_progress([(user_id, video_id, seconds) for (user_id, video_id), seconds in pending.items()])
+
+    def flush_size(self):
+        return settings.PROGRESS_FLUSH_SIZE
+
+    def flush_interval(self):
+        return settings.PROGRESS_FLUSH_INTERVAL
+
+
+progress_heartbeats = ProgressBuffer()
+
+
+def record_heartbeat(user_id, video_id, watched_seconds):
+    progress_heartbeats.add((user_id, video_id, watched_seconds))
+
+
+async def arecord_heartbeat(user_id, video_id, watched_seconds):
+    await progress_heartbeats.aadd((user_id, video_id, watched_seconds))
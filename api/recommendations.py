@@ -0,0 +1,310 @@
+# api/recommendations.py
+#
+# Personalized recommendations for GET /api/videos/recommended/.
+#
+# Offline, `python manage.py build_recommendations` turns likes, bookmarks,
+# ratings and watch progress into one weight per (user, video) and computes
+# item-item cosine similarity between videos from them: two videos are
+# similar when the same users engaged with both. Only each video's top
+# RECOMMENDATION_NEIGHBORS neighbours are kept, in video_neighbors.
+#
+# Online, a user's recommendations are the neighbours of the videos they
+# engaged with most recently, summed over those seeds and minus what they
+# have already seen: one query over the user's own interaction rows and the
+# (video_id, rank) primary key of video_neighbors. Users with no usable
+# history get the most liked videos instead.
+#
+# The similarity is computed with plain numpy. The interaction matrix is
+# kept as three flat arrays (user, video, weight); co-occurrences are
+# generated and summed one block of videos at a time, with blocks sized so
+# that no block produces more than RECOMMENDATION_MAX_PAIRS (user, video,
+# video) triples. Memory is therefore about 12 bytes per interaction plus
+# about 60 bytes per triple of the current block, however many interactions
+# there are (see benchmarks/bench_recommendations.py).
+import io
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+# how much each kind of interaction counts towards a (user, video) weight
+SIGNAL_WEIGHTS = {
+    "like": 1.0,
+    "bookmark": 1.0,
+    # scaled by (rating - 3) / 2: 5 stars = 1, 3 stars = 0, 1 star = -1
+    "rating": 1.0,
+    # scaled by the fraction watched; completed = 1
+    "progress": 0.5,
+}
+
+# rows per FETCH when reading the interactions
+FETCH_SIZE = 100_000
+
+INTERACTIONS_SQL = """
+SELECT user_id, video_id, weight FROM (
+    SELECT user_id, video_id, weight,
+           row_number() OVER (PARTITION BY user_id ORDER BY weight DESC, video_id) AS n
+    FROM (
+        SELECT user_id, video_id, sum(weight) AS weight
+        FROM (
+            SELECT user_id, video_id, %(like)s::float AS weight FROM likes
+            UNION ALL
+            SELECT user_id, video_id, %(bookmark)s::float FROM bookmarks
+            UNION ALL
+            SELECT user_id, video_id, %(rating)s::float * (rating - 3) / 2 FROM ratings
+            UNION ALL
+            SELECT p.user_id, p.video_id, %(progress)s::float * CASE
+                WHEN p.completed THEN 1
+                WHEN v.duration > 0 THEN least(1, p.watched_seconds::float / v.duration)
+                ELSE 0
+            END
+            FROM video_progress p JOIN videos v ON v.video_id = p.video_id
+        ) AS signals
+        GROUP BY user_id, video_id
+    ) AS summed
+    WHERE weight > 0
+) AS ranked
+WHERE n <= %(max_items)s
+"""
+
+
+def load_interactions():
+    """
+    (users, videos, weights) arrays of positive (user, video) weights, at
+    most RECOMMENDATION_MAX_USER_ITEMS per user (their heaviest).
+    """
+    params = dict(SIGNAL_WEIGHTS, max_items=settings.RECOMMENDATION_MAX_USER_ITEMS)
+    users, videos, weights = [], [], []
+    # a server-side cursor, so only FETCH_SIZE rows are held as Python tuples
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DECLARE interactions NO SCROLL CURSOR FOR " + INTERACTIONS_SQL, params)
+        while True:
+            cursor.execute(f"FETCH {FETCH_SIZE} FROM interactions")
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            user_ids, video_ids, values = zip(*rows)
+            users.append(np.array(user_ids, dtype=np.int32))
+            videos.append(np.array(video_ids, dtype=np.int32))
+            weights.append(np.array(values, dtype=np.float32))
+        cursor.execute("CLOSE interactions")
+    if not users:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+    return np.concatenate(users), np.concatenate(videos), np.concatenate(weights)
+
+
+def _group_starts(sorted_keys, n):
+    """starts[i]:starts[i + 1] is the run of key i in sorted_keys."""
+    starts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sorted_keys, minlength=n), out=starts[1:])
+    return starts
+
+
+def item_neighbors(users, items, weights, n_items, k, min_common=1, max_pairs=2_000_000):
+    """
+    Top-k cosine neighbours of every item of a user x item weight matrix
+    given as (users, items, weights) entries with dense indices.
+
+    Yields (sources, ranks, neighbors, scores) per block of source items,
+    grouped by source and best first (rank 0) within a source. Sources with
+    no neighbour sharing at least `min_common` users are left out.
+    """
+    if not len(users):
+        return
+    order = np.argsort(users, kind="stable")
+    users, items, weights = users[order], items[order], weights[order].astype(np.float64)
+    n_users = int(users.max()) + 1
+    degree = np.bincount(users, minlength=n_users)
+    user_starts = _group_starts(users, n_users)
+    norms = np.sqrt(np.bincount(items, weights=weights * weights, minlength=n_items))
+
+    # every entry of an item pairs with every entry of the same user, so
+    # that is the number of triples the item contributes as a source
+    cost = np.bincount(items, weights=degree[users], minlength=n_items)
+    cumulative = np.cumsum(cost)
+    by_item = np.argsort(items, kind="stable")
+    item_starts = _group_starts(items[by_item], n_items)
+
+    lo = 0
+    while lo < n_items:
+        done = cumulative[lo - 1] if lo else 0
+        # at least one item per block, however popular
+        hi = max(int(np.searchsorted(cumulative, done + max_pairs, side="right")), lo + 1)
+        entries = by_item[item_starts[lo]:item_starts[hi]]
+        if len(entries):
+            yield _block_neighbors(
+                entries, users, items, weights, degree, user_starts, norms,
+                lo, hi, n_items, k, min_common,
+            )
+        lo = hi
+
+
+def _block_neighbors(entries, users, items, weights, degree, user_starts, norms,
+                     lo, hi, n_items, k, min_common):
+    # expand each entry of the block into (entry, other entry of its user)
+    counts = degree[users[entries]]
+    total = int(counts.sum())
+    src = np.repeat(entries, counts)
+    ends = np.cumsum(counts)
+    dst = np.arange(total, dtype=np.int64)
+    dst += np.repeat(user_starts[users[entries]] - ends + counts, counts)
+
+    source, neighbor = items[src], items[dst]
+    keep = source != neighbor
+    key = (source[keep] - lo).astype(np.int64) * n_items + neighbor[keep]
+    product = (weights[src] * weights[dst])[keep]
+    del src, dst, source, neighbor, keep
+
+    cells = (hi - lo) * n_items
+    if cells <= len(key):
+        # dense enough to sum into a flat (block items x items) array
+        dot = np.bincount(key, weights=product, minlength=cells)
+        common = np.bincount(key, minlength=cells)
+        key = np.flatnonzero(common)
+        dot, common = dot[key], common[key]
+    else:
+        key, inverse = np.unique(key, return_inverse=True)
+        dot = np.bincount(inverse, weights=product)
+        common = np.bincount(inverse)
+    del product
+
+    source = key // n_items + lo
+    neighbor = key % n_items
+    score = dot / (norms[source] * norms[neighbor])
+    keep = (common >= min_common) & (score > 0)
+    source, neighbor, score = source[keep], neighbor[keep], score[keep]
+
+    # best first within each source, then the first k of each run
+    order = np.lexsort((neighbor, -score, source))
+    source, neighbor, score = source[order], neighbor[order], score[order]
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+    rank = np.arange(len(source)) - np.repeat(starts, np.diff(np.r_[starts, len(source)]))
+    top = rank < k
+    return source[top], rank[top], neighbor[top], score[top].astype(np.float32)
+
+
+def _copy_neighbors(cursor, video_ids, sources, ranks, neighbors, scores):
+    buffer = io.StringIO()
+    for row in zip(
+        video_ids[sources].tolist(), ranks.tolist(), video_ids[neighbors].tolist(), scores.tolist()
+    ):
+        buffer.write("%d\t%d\t%d\t%.6g\n" % row)
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY video_neighbors (video_id, rank, neighbor_id, score) FROM STDIN", buffer
+    )
+
+
+def build(progress=None):
+    """
+    Recompute video_neighbors from the current interactions. Readers keep
+    seeing the previous neighbours until the new ones are committed.
+    `progress(rows, videos)` is called after every block. Returns a dict of
+    counts and timings.
+    """
+    started = time.perf_counter()
+    users, videos, weights = load_interactions()
+    loaded = time.perf_counter()
+
+    _, user_index = np.unique(users, return_inverse=True)
+    video_ids, video_index = np.unique(videos, return_inverse=True)
+    del users, videos
+
+    rows = sources = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # DELETE rather than TRUNCATE, which would block readers until commit
+        cursor.execute("DELETE FROM video_neighbors")
+        for block_sources, ranks, neighbors, scores in item_neighbors(
+            user_index.astype(np.int32),
+            video_index.astype(np.int32),
+            weights,
+            len(video_ids),
+            k=settings.RECOMMENDATION_NEIGHBORS,
+            min_common=settings.RECOMMENDATION_MIN_COMMON_USERS,
+            max_pairs=settings.RECOMMENDATION_MAX_PAIRS,
+        ):
+            if len(block_sources):
+                _copy_neighbors(cursor, video_ids, block_sources, ranks, neighbors, scores)
+                rows += len(block_sources)
+                sources += int(np.count_nonzero(ranks == 0))
+            if progress is not None:
+                progress(rows, sources)
+
+    return {
+        "interactions": len(weights),
+        "users": int(user_index.max()) + 1 if len(user_index) else 0,
+        "videos": len(video_ids),
+        "videos_with_neighbors": sources,
+        "neighbors": rows,
+        "load_seconds": loaded - started,
+        "total_seconds": time.perf_counter() - started,
+    }
+
+
+RECOMMEND_SQL = """
+WITH history AS (
+    SELECT video_id, sum(weight) AS weight, max(at) AS at
+    FROM (
+        SELECT video_id, %(like)s::float AS weight, created_at AS at
+        FROM likes WHERE user_id = %(user)s
+        UNION ALL
+        SELECT video_id, %(bookmark)s::float, created_at
+        FROM bookmarks WHERE user_id = %(user)s
+        UNION ALL
+        SELECT video_id, %(rating)s::float * (rating - 3) / 2, created_at
+        FROM ratings WHERE user_id = %(user)s
+        UNION ALL
+        SELECT video_id, %(progress)s::float * CASE WHEN completed THEN 1 ELSE 0.5 END, updated_at
+        FROM video_progress WHERE user_id = %(user)s
+    ) AS signals
+    GROUP BY video_id
+),
+seeds AS (
+    SELECT video_id, weight FROM history
+    WHERE weight > 0
+    ORDER BY at DESC
+    LIMIT %(seeds)s
+)
+SELECT n.neighbor_id, sum(s.weight * n.score) AS score
+FROM seeds s
+JOIN video_neighbors n ON n.video_id = s.video_id
+WHERE n.neighbor_id NOT IN (SELECT video_id FROM history)
+GROUP BY n.neighbor_id
+ORDER BY score DESC, n.neighbor_id
+LIMIT %(limit)s
+"""
+
+POPULAR_SQL = """
+SELECT s.video_id FROM video_stats s
+WHERE s.video_id NOT IN (
+    SELECT video_id FROM likes WHERE user_id = %(user)s
+    UNION ALL SELECT video_id FROM bookmarks WHERE user_id = %(user)s
+    UNION ALL SELECT video_id FROM ratings WHERE user_id = %(user)s
+    UNION ALL SELECT video_id FROM video_progress WHERE user_id = %(user)s
+)
+ORDER BY s.like_count + s.bookmark_count DESC, s.video_id DESC
+LIMIT %(limit)s
+"""
+
+
+def recommend(user_id, limit=10):
+    """
+    [(video_id, score)] for the user, best first. Padded with popular videos
+    (score None) when their history gives fewer than `limit`.
+    """
+    params = dict(
+        SIGNAL_WEIGHTS, user=user_id, limit=limit, seeds=settings.RECOMMENDATION_SEED_VIDEOS,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(RECOMMEND_SQL, params)
+        results = [(video_id, float(score)) for video_id, score in cursor.fetchall()]
+        if len(results) < limit:
+            # fetch extra so dropping the ones already recommended still fills it
+            cursor.execute(POPULAR_SQL, dict(params, limit=limit + len(results)))
+            picked = {video_id for video_id, _ in results}
+            results += [
+                (video_id, None) for (video_id,) in cursor.fetchall() if video_id not in picked
+            ][:limit - len(results)]
+    return results
@@ -0,0 +1,351 @@
+# api/search.py
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.signals import post_delete, post_save
+from pgvector.django import CosineDistance
+
+from .embeddings import get_embedder
+from .models import TranscriptPassage, Video
+
+# Text search config used by the trigger on the videos table and by queries.
+# Keep in sync with api/migrations/0002_video_search_vector.py
+SEARCH_CONFIG = "english"
+
+# Weighted document: title > description > transcript > difficulty level
+VIDEO_SEARCH_VECTOR = (
+    SearchVector("title", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("transcript", weight="C", config=SEARCH_CONFIG)
+    + SearchVector("difficulty_level", weight="D", config=SEARCH_CONFIG)
+)
+
+MAX_RESULTS = 50
+
+# Columns that are only used inside the database and never serialized
+HEAVY_FIELDS = ("search_vector", "embedding_vector")
+
+# Reciprocal rank fusion constant, see Cormack et al. (2009)
+RRF_K = 60
+
+
+def normalize_query(raw_q: str) -> list:
+    """
+    Split a raw query into tokens, dropping punctuation like ? ! , .
+    """
+    cleaned = re.sub(r"[^\w\s]", " ", raw_q)
+    return [t for t in cleaned.split() if t]
+
+
+def build_tsquery(tokens):
+    """
+    AND across tokens, each token matched as a prefix so partial words
+    ("recurs") still hit ("recursion"). Tokens only contain \\w characters
+    so they are safe to splice into a raw tsquery.
+    """
+    raw = " & ".join(f"{token}:*" for token in tokens)
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_queryset():
+    """Videos as the serializer needs them: no heavy columns, stats joined."""
+    return Video.objects.defer(*HEAVY_FIELDS).select_related("stats")
+
+
+def filter_videos(qs, course_id=None, level=None):
+    if course_id:
+        qs = qs.filter(course_id=course_id)
+    if level:
+        qs = qs.filter(difficulty_level=level)
+    return qs
+
+
+def fulltext_queryset(tokens, course_id=None, level=None):
+    """
+    The page of a ranked search over the GIN-indexed videos.search_vector
+    column.
+
+    The total match count is computed with a window function so it comes back
+    with the page in a single query instead of a second COUNT(*).
+    """
+    qs = filter_videos(search_queryset(), course_id, level)
+
+    if tokens:
+        query = build_tsquery(tokens)
+        qs = (
+            qs.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-uploaded_at")
+        )
+    else:
+        qs = qs.order_by("-uploaded_at")
+
+    return qs.annotate(total=Window(Count("pk")))[:MAX_RESULTS]
+
+
+def fulltext_search(tokens, course_id=None, level=None):
+    videos = list(fulltext_queryset(tokens, course_id, level))
+    total = videos[0].total if videos else 0
+    return videos, total
+
+
+def passage_search(tokens, course_id=None, level=None):
+    """
+    Ranked search over transcript passages (built by `manage.py
+    index_transcripts`). Returns (passages, total); each passage has its
+    video's title loaded and a `headline` with the matches marked.
+    """
+    if not tokens:
+        return [], 0
+    query = build_tsquery(tokens)
+    qs = TranscriptPassage.objects.filter(search_vector=query)
+    if course_id:
+        qs = qs.filter(video__course_id=course_id)
+    if level:
+        qs = qs.filter(video__difficulty_level=level)
+
+    passages = list(
+        qs.select_related("video")
+        .only(
+            "video__video_id", "video__title", "position", "start_seconds", "end_seconds",
+            "char_start", "char_end", "text",
+        )
+        .annotate(
+            rank=SearchRank(F("search_vector"), query),
+            total=Window(Count("pk")),
+        )
+        .order_by("-rank", "video_id", "position")[:MAX_RESULTS]
+    )
+    # headlines are expensive, so only build them for the page we return
+    headlines = dict(
+        TranscriptPassage.objects.filter(pk__in=[p.pk for p in passages])
+        .annotate(headline=SearchHeadline("text", query, config=SEARCH_CONFIG, max_words=30, min_words=10))
+        .values_list("pk", "headline")
+    ) if passages else {}
+    for passage in passages:
+        passage.headline = headlines.get(passage.pk, passage.text)
+    return passages, (passages[0].total if passages else 0)
+
+
+def icontains_queryset(tokens, course_id=None, level=None):
+    """
+    The original ILIKE '%tok%' search. Kept as a fallback (and as the
+    baseline for benchmarks/bench_search.py).
+    """
+    qs = filter_videos(search_queryset(), course_id, level)
+
+    if tokens:
+        # AND across tokens, OR across fields
+        token_q = Q()
+        for token in tokens:
+            token_q &= (
+                Q(title__icontains=token) |
+                Q(description__icontains=token) |
+                Q(transcript__icontains=token) |
+                Q(difficulty_level__icontains=token)
+            )
+        qs = qs.filter(token_q)
+
+    return qs.order_by("-uploaded_at")
+
+
+def icontains_search(tokens, course_id=None, level=None):
+    qs = icontains_queryset(tokens, course_id, level)
+    return list(qs[:MAX_RESULTS]), qs.count()
+
+
+def semantic_search(text, k=20, course_id=None, level=None):
+    """
+    Approximate nearest neighbours by cosine distance over the HNSW index on
+    videos.embedding_vector. Returns a list of (video, distance).
+    """
+    vector = get_embedder().embed([text])[0]
+    qs = (
+        filter_videos(search_queryset(), course_id, level)
+        .filter(embedding_vector__isnull=False)
+        .annotate(distance=CosineDistance("embedding_vector", vector))
+        .order_by("distance")
+    )
+
+    with transaction.atomic():
+        # an HNSW scan returns at most ef_search rows, so it must cover k
+        ef_search = max(settings.VIDEO_HNSW_EF_SEARCH, k)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", [ef_search])
+        videos = list(qs[:k])
+
+    return [(video, video.distance) for video in videos]
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU of keyword search results with a TTL. Entries hold the
+    matching video ids and the total, not the rows, so they stay small and
+    the stats shown with each hit are always current.
+
+    Any Video save or delete clears it (see the signal handlers below).
+    That only reaches the worker process that made the change; other
+    processes pick it up when their entries expire. Writes that skip
+    signals (queryset.update(), bulk_create) also rely on the TTL.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every clear(), so a search that started before an
+        # invalidation can't store its (possibly stale) result afterwards
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.generation,
+            }
+
+
+search_results = SearchResultCache(max_entries=settings.SEARCH_CACHE_SIZE)
+
+
+def _invalidate_search_results(sender, using, **kwargs):
+    # after commit: a search between the clear and the commit would cache
+    # the old rows under the new generation
+    transaction.on_commit(search_results.clear, using=using)
+
+
+post_save.connect(_invalidate_search_results, sender=Video, dispatch_uid="search_results_save")
+post_delete.connect(_invalidate_search_results, sender=Video, dispatch_uid="search_results_delete")
+
+
+def _search_key(tokens, course_id, level):
+    return (
+        settings.VIDEO_SEARCH_BACKEND,
+        tuple(token.lower() for token in tokens),
+        str(course_id) if course_id else None,
+        level or None,
+    )
+
+
+def cached_search(tokens, course_id=None, level=None):
+    """
+    Keyword search through the configured backend (VIDEO_SEARCH_BACKEND),
+    answered from search_results when the same normalized query and filters
+    were seen recently. Returns (videos, total).
+    """
+    backend = icontains_search if settings.VIDEO_SEARCH_BACKEND == "icontains" else fulltext_search
+    ttl = settings.SEARCH_CACHE_TTL
+    if ttl <= 0:
+        return backend(tokens, course_id, level)
+
+    key = _search_key(tokens, course_id, level)
+    cached = search_results.get(key)
+    if cached is not None:
+        ids, total = cached
+        by_id = search_queryset().in_bulk(ids)
+        return [by_id[pk] for pk in ids if pk in by_id], total
+
+    generation = search_results.generation
+    videos, total = backend(tokens, course_id, level)
+    search_results.set(key, ([video.pk for video in videos], total), ttl, generation)
+    return videos, total
+
+
+async def _asearch(tokens, course_id=None, level=None):
+    if settings.VIDEO_SEARCH_BACKEND == "icontains":
+        qs = icontains_queryset(tokens, course_id, level)
+        return [video async for video in qs[:MAX_RESULTS]], await qs.acount()
+    videos = [video async for video in fulltext_queryset(tokens, course_id, level)]
+    return videos, (videos[0].total if videos else 0)
+
+
+async def acached_search(tokens, course_id=None, level=None):
+    """cached_search() for async views, through the async ORM."""
+    ttl = settings.SEARCH_CACHE_TTL
+    if ttl <= 0:
+        return await _asearch(tokens, course_id, level)
+
+    key = _search_key(tokens, course_id, level)
+    cached = search_results.get(key)
+    if cached is not None:
+        ids, total = cached
+        by_id = await search_queryset().ain_bulk(ids)
+        return [by_id[pk] for pk in ids if pk in by_id], total
+
+    generation = search_results.generation
+    videos, total = await _asearch(tokens, course_id, level)
+    search_results.set(key, ([video.pk for video in videos], total), ttl, generation)
+    return videos, total
+
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K):
+    """
+    Fuse several ranked lists of ids into one: score(id) = sum 1 / (k + rank).
+    Returns [(id, score)] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def hybrid_search(text, k=20, course_id=None, level=None):
+    """
+    Semantic ranking fused with the keyword (full-text) ranking.
+    Returns a list of (video, fused score).
+    """
+    semantic = semantic_search(text, max(k, MAX_RESULTS), course_id, level)
+    keyword, _ = fulltext_search(normalize_query(text), course_id, level)
+
+    videos = {video.pk: video for video in keyword}
+    videos.update((video.pk, video) for video, _ in semantic)
+
+    fused = reciprocal_rank_fusion(
+        [video.pk for video, _ in semantic],
+        [video.pk for video in keyword],
+    )
+    return [(videos[pk], score) for pk, score in fused[:k]]
@@ -0,0 +1,48 @@
+# api/search_log.py
+#
+# Search queries are logged from VideoViewSet.search without a per-request
+# INSERT: rows go into a process-wide buffer that is bulk inserted in the
+# background (see api/buffering.py).
+from django.conf import settings
+from django.utils import timezone
+
+from .buffering import BufferedWriter
+from .models import SearchLog
+from .suggest import suggestions
+
+MAX_QUERY_LENGTH = SearchLog._meta.get_field("query").max_length
+
+
+class SearchLogBuffer(BufferedWriter):
+    def flush_size(self):
+        return settings.SEARCH_LOG_FLUSH_SIZE
+
+    def flush_interval(self):
+        return settings.SEARCH_LOG_FLUSH_INTERVAL
+
+    def write(self, pending):
+        SearchLog.objects.bulk_create(pending, batch_size=1000)
+        suggestions.add_queries(row.query for row in pending)
+
+
+search_logs = SearchLogBuffer()
+
+
+def _log_row(user_id, query):
+    query = (query or "").strip()[:MAX_QUERY_LENGTH]
+    if not query or not settings.SEARCH_LOG_ENABLED:
+        return None
+    return SearchLog(user_id=user_id, query=query, searched_at=timezone.now())
+
+
+def record_search(user_id, query):
+    """Queue a search log row, timestamped now. No-op for empty queries."""
+    row = _log_row(user_id, query)
+    if row is not None:
+        search_logs.add(row)
+
+
+async def arecord_search(user_id, query):
+    row = _log_row(user_id, query)
+    if row is not None:
+        await search_logs.aadd(row)
@@ -1,5 +1,12 @@
+import json
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import PortalUser, Course, Video, VideoProgress, Like, Comment, Bookmark, Rating, SearchLog
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+from .models import PortalUser, Course, Video, VideoStats, TranscriptPassage, VideoProgress, Like, Comment, Bookmark, Rating, SearchLog
+from .storage import ensure_bucket, get_s3_client, object_key, presigned_get_url, public_url, upload_key
+from .tasks import enqueue
+from .uploads import S3UploadedFile
 from django.contrib.auth.hashers import make_password
 
 
@@ -36,28 +43,41 @@ class CourseSerializer(serializers.ModelSerializer):
             "level",
         ]
 
+class VideoStatsSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = VideoStats
+        fields = ["like_count", "bookmark_count", "comment_count", "rating_count", "average_rating"]
+
+
 class VideoSerializer(serializers.ModelSerializer):
-    course_id = serializers.IntegerField(source='course.course_id', read_only=True)
+    # read the FK column directly; source='course.course_id' fetched the course per row
+    course_id = serializers.IntegerField(read_only=True)
     file = serializers.FileField(write_only=True)  # for uploads
+    # from the video_stats row joined by the views (select_related("stats"))
+    stats = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
-        fields = "__all__"
-        read_only_fields = ["video_id", "file_path", "uploaded_by", "uploaded_at"]
+        exclude = ["search_vector", "embedding_vector", "hls_manifest"]
+        read_only_fields = ["video_id", "file_url", "uploaded_by", "uploaded_at"]
     
+    def get_stats(self, obj):
+        try:
+            stats = obj.stats
+        except VideoStats.DoesNotExist:
+            # no interactions yet
+            stats = VideoStats(video_id=obj.pk)
+        return VideoStatsSerializer(stats).data
+
     def get_play_url(self, obj):
         if not obj.file_url:
             return None
 
-        client = get_minio_client()
-        bucket = settings.MINIO_BUCKET_NAME
         try:
-            return client.get_presigned_url(
-                method="GET",
-                bucket_name=bucket,
-                object_name=obj.file_url,
-                expires=timedelta(hours=1),
-            )
+            url, _ = presigned_get_url(object_key(obj.file_url))
+            return url
         except Exception:
             return None
     
@@ -83,53 +103,128 @@ class VideoSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({"tags": "Invalid JSON"})
         return super().to_internal_value(data)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # direct uploads put the bytes in storage before the Video is created
+        if self.context.get("direct_upload"):
+            self.fields["file"].required = False
+
     def create(self, validated_data):
-        file = validated_data.pop("file")
+        file = validated_data.pop("file", None)
         user = self.context["request"].user
 
-        # MinIO client
-        from minio import Minio
-        from django.conf import settings
-        import uuid
-
-        minio_client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_USE_SSL,
-        )
-
-        bucket = settings.MINIO_BUCKET_NAME
-        if not minio_client.bucket_exists(bucket):
-            minio_client.make_bucket(bucket)
-
-        # Generate unique file name
-        filename = f"{uuid.uuid4()}_{file.name}"
-        file_path = f"{bucket}/{filename}"
-
-        # Upload to MinIO
-        minio_client.put_object(
-            bucket,
-            filename,
-            file,
-            length=file.size,
-            content_type=file.content_type,
-        )
+        if isinstance(file, S3UploadedFile):
+            # already streamed to object storage by S3UploadHandler
+            validated_data["file_url"] = public_url(file.key)
+        elif file is not None:
+            bucket = settings.AWS_STORAGE_BUCKET_NAME
+            ensure_bucket(bucket)
+
+            # Generate unique object key
+            key = upload_key(file.name)
+
+            # Upload to object storage (boto3 switches to a concurrent
+            # multipart upload for large files)
+            get_s3_client().upload_fileobj(
+                file,
+                bucket,
+                key,
+                ExtraArgs={"ContentType": file.content_type or "application/octet-stream"},
+            )
+            validated_data["file_url"] = public_url(key)
 
         # Save metadata in Postgres
         video = Video.objects.create(
             uploaded_by=user,
-            file_path=file_path,
             **validated_data,
         )
+        # duration, thumbnail and transcript passages (api/processing.py)
+        enqueue("process_video", video_id=video.pk)
+        return video
+
+    def update(self, instance, validated_data):
+        old_transcript = instance.transcript
+        video = super().update(instance, validated_data)
+        if video.transcript != old_transcript:
+            enqueue("ingest_transcript", video_id=video.pk)
         return video
 
 
+class BulkImportFieldsMixin:
+    """
+    DRF's ProhibitSurrogateCharactersValidator looks at every character in
+    Python, which is most of the validation time of a long transcript; an
+    import checks the same thing with one encode() instead.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                _reject_surrogates if isinstance(validator, ProhibitSurrogateCharactersValidator)
+                else validator
+                for validator in field.validators
+            ]
+        return fields
+
+
+def _reject_surrogates(value):
+    try:
+        str(value).encode("utf-8")
+    except UnicodeEncodeError:
+        # let DRF's validator find the character and word the error
+        ProhibitSurrogateCharactersValidator()(value)
+
+
+class CourseImportSerializer(BulkImportFieldsMixin, CourseSerializer):
+    """
+    One course of a bulk import (api/bulk.py). The user references are plain
+    ids, checked for a whole batch at once instead of one query per row.
+    """
+    created_by = serializers.IntegerField(source="created_by_id", required=False, allow_null=True)
+    instructor = serializers.IntegerField(source="instructor_id", required=False, allow_null=True)
+
+    class Meta(CourseSerializer.Meta):
+        read_only_fields = ["course_id", "created_at"]
+
+
+class VideoImportSerializer(BulkImportFieldsMixin, VideoSerializer):
+    """
+    One video of a bulk import: metadata for a file that is already in
+    object storage (file_url), rather than an upload.
+    """
+    file = None
+    stats = None
+    course = serializers.IntegerField(source="course_id", required=False, allow_null=True)
+
+    class Meta(VideoSerializer.Meta):
+        read_only_fields = ["video_id", "uploaded_by", "uploaded_at"]
+
+
+class TranscriptPassageSerializer(serializers.ModelSerializer):
+    """A passage search hit: where in the video (seconds and transcript offsets) it is."""
+    video_id = serializers.IntegerField(read_only=True)
+    video_title = serializers.CharField(source="video.title", read_only=True)
+    headline = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TranscriptPassage
+        fields = [
+            "video_id", "video_title", "position", "start_seconds", "end_seconds",
+            "char_start", "char_end", "text", "headline", "rank",
+        ]
+
 class VideoProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = VideoProgress
         fields = "__all__"
 
+class ProgressHeartbeatSerializer(serializers.Serializer):
+    # both end up in int columns (api/progress.py)
+    video = serializers.IntegerField(min_value=1, max_value=2**31 - 1)
+    watched_seconds = serializers.IntegerField(min_value=0, max_value=2**31 - 1)
+
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
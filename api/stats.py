@@ -0,0 +1,127 @@
+# api/stats.py
+#
+# Per-video engagement counters (video_stats). Each like/bookmark/comment/
+# rating write applies a delta with a single upsert in the same transaction,
+# so reading the numbers is a primary-key join instead of COUNT(*)/AVG() over
+# the interaction tables. `python manage.py reconcile_video_stats` recomputes
+# everything from scratch if the counters ever drift.
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Bookmark, Comment, Like, Rating
+
+COUNTERS = ("like_count", "bookmark_count", "comment_count", "rating_sum", "rating_count")
+
+# what one row of each interaction table adds to its video's counters: 1, or
+# the name of the row's field holding the amount
+ROW_COUNTERS = {
+    Like: {"like_count": 1},
+    Bookmark: {"bookmark_count": 1},
+    Comment: {"comment_count": 1},
+    Rating: {"rating_count": 1, "rating_sum": "rating"},
+}
+
+
+def adjust(video_id, **deltas):
+    """
+    Add `deltas` (counter name -> signed amount) to a video's counters,
+    creating its row on first use. Counters never go below zero.
+    """
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown video_stats counters: {sorted(unknown)}")
+    columns = [name for name in COUNTERS if deltas.get(name)]
+    if not columns:
+        return
+
+    sql = (
+        "INSERT INTO video_stats (video_id, {columns}, updated_at) "
+        "VALUES (%s, {inserts}, now()) "
+        "ON CONFLICT (video_id) DO UPDATE SET {updates}, updated_at = now()"
+    ).format(
+        columns=", ".join(columns),
+        inserts=", ".join("GREATEST(%s, 0)" for _ in columns),
+        updates=", ".join(f"{name} = GREATEST(video_stats.{name} + %s, 0)" for name in columns),
+    )
+    values = [deltas[name] for name in columns]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [video_id, *values, *values])
+
+
+def apply_change(old_video_id, old_deltas, new_video_id, new_deltas):
+    """Move an updated row's contribution from its old state to its new one."""
+    if old_video_id == new_video_id:
+        changed = {
+            name: new_deltas.get(name, 0) - old_deltas.get(name, 0)
+            for name in set(old_deltas) | set(new_deltas)
+        }
+        adjust(new_video_id, **changed)
+        return
+    adjust(old_video_id, **{name: -value for name, value in old_deltas.items()})
+    adjust(new_video_id, **new_deltas)
+
+
+def row_deltas(row):
+    """What one interaction row adds to its video's counters."""
+    return {
+        name: getattr(row, amount) if isinstance(amount, str) else amount
+        for name, amount in ROW_COUNTERS[type(row)].items()
+    }
+
+
+def user_deltas(user):
+    """
+    {video_id: deltas} of every interaction row of `user`, with one GROUP BY
+    per table, e.g. to take them out of the counters when the user goes.
+    """
+    deltas = {}
+    for model, counters in ROW_COUNTERS.items():
+        aggregates = {
+            name: Sum(amount) if isinstance(amount, str) else Count("pk")
+            for name, amount in counters.items()
+        }
+        for row in model.objects.filter(user=user).values("video_id").annotate(**aggregates):
+            deltas.setdefault(row.pop("video_id"), {}).update(row)
+    return deltas
+
+
+RECONCILE_SQL = """
+INSERT INTO video_stats
+    (video_id, like_count, bookmark_count, comment_count, rating_sum, rating_count, updated_at)
+SELECT v.video_id,
+       coalesce(l.n, 0), coalesce(b.n, 0), coalesce(c.n, 0),
+       coalesce(r.total, 0), coalesce(r.n, 0), now()
+FROM videos v
+LEFT JOIN (SELECT video_id, count(*) AS n FROM likes GROUP BY video_id) l USING (video_id)
+LEFT JOIN (SELECT video_id, count(*) AS n FROM bookmarks GROUP BY video_id) b USING (video_id)
+LEFT JOIN (SELECT video_id, count(*) AS n FROM comments GROUP BY video_id) c USING (video_id)
+LEFT JOIN (SELECT video_id, count(*) AS n, sum(rating) AS total FROM ratings GROUP BY video_id) r
+    USING (video_id)
+ON CONFLICT (video_id) DO UPDATE SET
+    like_count = EXCLUDED.like_count,
+    bookmark_count = EXCLUDED.bookmark_count,
+    comment_count = EXCLUDED.comment_count,
+    rating_sum = EXCLUDED.rating_sum,
+    rating_count = EXCLUDED.rating_count,
+    updated_at = now()
+WHERE (video_stats.like_count, video_stats.bookmark_count, video_stats.comment_count,
+       video_stats.rating_sum, video_stats.rating_count)
+      IS DISTINCT FROM
+      (EXCLUDED.like_count, EXCLUDED.bookmark_count, EXCLUDED.comment_count,
+       EXCLUDED.rating_sum, EXCLUDED.rating_count)
+"""
+
+
+def reconcile():
+    """
+    Recompute every video's counters with one aggregate pass over each
+    interaction table. Returns the number of rows that changed.
+
+    Must run inside a transaction. video_stats is locked against concurrent
+    adjust() calls first: a write that is still in flight isn't in our
+    snapshot, and it applies its delta after we commit, so nothing is lost.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE video_stats IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(RECONCILE_SQL)
+        return cursor.rowcount
@@ -0,0 +1,246 @@
+# api/storage.py
+#
+# Object storage helpers (Railway bucket / MinIO / any S3-compatible store).
+# One boto3 client is shared by the whole process: creating a client means
+# building a session, resolving the endpoint and loading credentials, which is
+# far too slow to do per request. boto3 clients are thread-safe.
+import hashlib
+import hmac
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from urllib.parse import parse_qsl, quote, urlsplit
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+_client = None
+_client_lock = threading.Lock()
+
+# buckets we've already checked (or created) in this process
+_known_buckets = set()
+_bucket_lock = threading.Lock()
+
+
+def get_s3_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                session = boto3.session.Session()
+                _client = session.client(
+                    "s3",
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+def ensure_bucket(bucket: str):
+    """Create `bucket` if needed; only asks the server once per process."""
+    if bucket in _known_buckets:
+        return
+    with _bucket_lock:
+        if bucket in _known_buckets:
+            return
+        client = get_s3_client()
+        try:
+            client.head_bucket(Bucket=bucket)
+        except ClientError:
+            client.create_bucket(Bucket=bucket)
+        _known_buckets.add(bucket)
+
+
+def object_key(file_url: str) -> str:
+    """
+    Extract the object key from a stored file_url.
+    Example: https://bucket.t3.storageapi.dev/media/videos/Programming/video.mp4
+    gives media/videos/Programming/video.mp4
+    """
+    url_parts = file_url.split(".dev/")
+    if len(url_parts) > 1:
+        return url_parts[-1]
+    # Fallback: assume file_url is just the key
+    return file_url
+
+
+def upload_key(filename: str) -> str:
+    """A fresh, unique object key for an uploaded video file."""
+    name = get_valid_filename(unicodedata.normalize("NFKD", filename))
+    return f"{settings.AWS_LOCATION}/videos/{uuid.uuid4()}_{name}"
+
+
+def public_url(key: str) -> str:
+    """The file_url we store for an object key (inverse of object_key)."""
+    return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{key}"
+
+
+class PresignedUrlCache:
+    """
+    Thread-safe LRU of presigned GET URLs keyed by object key. A URL is
+    handed out again until it gets within the safety margin of its expiry,
+    so players always get at least that long to start the download.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, min_remaining):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at - time.time() < min_remaining:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, url, expires_at):
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+presigned_urls = PresignedUrlCache()
+
+
+def presigned_get_url(key: str):
+    """
+    Return (url, expires_at) for a GET on `key`, where expires_at is a unix
+    timestamp. Reuses a cached URL when it still has enough life left.
+    """
+    cached = presigned_urls.get(key, settings.S3_PRESIGN_SAFETY_MARGIN)
+    if cached is not None:
+        return cached
+
+    expires_in = settings.S3_PRESIGN_EXPIRES
+    expires_at = time.time() + expires_in
+    url = get_s3_client().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": key},
+        ExpiresIn=expires_in,
+    )
+    presigned_urls.set(key, url, expires_at)
+    return url, expires_at
+
+
+# presign_many() has boto3 presign this key to learn how URLs look
+PROBE_KEY = "presign-probe"
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+class _BatchSigner:
+    """
+    SigV4 query signing of GETs, reusing everything but the key from a URL
+    boto3 presigned: endpoint and addressing style, credential scope, time
+    and expiry. What's left per URL is two hashes.
+    """
+
+    def __init__(self, probe_url, secret_key):
+        url = urlsplit(probe_url)
+        query = dict(parse_qsl(url.query))
+        self.signature = query.pop("X-Amz-Signature", None)
+        self.ok = (
+            url.path.endswith("/" + PROBE_KEY)
+            and query.get("X-Amz-Algorithm") == "AWS4-HMAC-SHA256"
+            and query.get("X-Amz-SignedHeaders") == "host"
+        )
+        if not self.ok:
+            return
+        self.origin = f"{url.scheme}://{url.netloc}"
+        self.host = url.netloc
+        self.base_path = url.path[:-len(PROBE_KEY)]
+        self.amz_date = query["X-Amz-Date"]
+        self.scope = query["X-Amz-Credential"].split("/", 1)[1]
+        date, region, service, terminator = self.scope.split("/")
+        self.signing_key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret_key}".encode(), date), region), service), terminator)
+        self.query = "&".join(
+            f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(query.items())
+        )
+
+    def _sign(self, path):
+        canonical_request = f"GET\n{path}\n{self.query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{self.amz_date}\n{self.scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        return hmac.new(self.signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def verified(self):
+        """Whether signing the probe key here gives boto3's signature."""
+        return self.ok and hmac.compare_digest(self._sign(self.base_path + PROBE_KEY), self.signature)
+
+    def url(self, key):
+        path = self.base_path + quote(key, safe="/~")
+        return f"{self.origin}{path}?{self.query}&X-Amz-Signature={self._sign(path)}"
+
+
+def presign_many(keys, expires_in):
+    """
+    Presigned GET URLs of `keys` (in order), valid for `expires_in` seconds,
+    signed in one pass: boto3 presigns one probe key, which settles the
+    endpoint, credentials and time, and the rest only need their own
+    signature. If the probe can't be reproduced (an unusual endpoint or
+    signer), every key goes through boto3.
+    """
+    client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+
+    def presign(key):
+        return client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in)
+
+    if len(keys) < 2:
+        return [presign(key) for key in keys]
+    credentials = client._get_credentials()
+    if credentials is None:
+        return [presign(key) for key in keys]
+    frozen = credentials.get_frozen_credentials()
+    signer = _BatchSigner(presign(PROBE_KEY), frozen.secret_key)
+    if not signer.verified():
+        return [presign(key) for key in keys]
+    return [signer.url(key) for key in keys]
+
+
+def presigned_get_urls(keys):
+    """
+    {key: (url, expires_at)} for GETs on `keys`, like presigned_get_url
+    but with the missing URLs signed together (presign_many).
+    """
+    found, missing = {}, []
+    for key in dict.fromkeys(keys):
+        cached = presigned_urls.get(key, settings.S3_PRESIGN_SAFETY_MARGIN)
+        if cached is None:
+            missing.append(key)
+        else:
+            found[key] = cached
+    if missing:
+        expires_in = settings.S3_PRESIGN_EXPIRES
+        expires_at = time.time() + expires_in
+        for key, url in zip(missing, presign_many(missing, expires_in)):
+            presigned_urls.set(key, url, expires_at)
+            found[key] = (url, expires_at)
+    return found
@@ -0,0 +1,159 @@
+# api/streaming.py
+#
+# Record streams in NDJSON and CSV, for the bulk import and export endpoints
+# (api/bulk.py). Both directions work one record at a time, so neither an
+# upload nor a download is ever held in memory as a whole.
+#
+# The two renderers only exist so DRF's content negotiation knows the formats
+# (?format=csv or an Accept header); export actions stream their responses
+# themselves with stream_response().
+import codecs
+import csv
+import datetime
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+CONTENT_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv",
+}
+
+# records per chunk handed to the WSGI server
+CHUNK_RECORDS = 500
+
+
+class RecordStreamError(ValueError):
+    """A line of the input couldn't be read as a record."""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def format_for_content_type(content_type, default=NDJSON):
+    """NDJSON or CSV for a request Content-Type header."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return CSV
+    if media_type in ("application/x-ndjson", "application/jsonl", "application/json"):
+        return NDJSON
+    return default
+
+
+def read_records(stream, fmt):
+    """
+    Yield (line number, dict) from a binary stream of NDJSON objects or CSV
+    rows with a header line. Blank NDJSON lines and empty CSV cells are
+    skipped, so an empty cell means "not given". Raises RecordStreamError
+    at the first line that can't be read.
+    """
+    # utf-8-sig drops the BOM spreadsheet exports like to start with
+    text = codecs.getreader("utf-8-sig")(stream)
+    line_number = 0
+    try:
+        if fmt == CSV:
+            reader = csv.DictReader(text)
+            for row in reader:
+                line_number = reader.line_num
+                if None in row:
+                    raise RecordStreamError(line_number, "more cells than header columns")
+                yield line_number, {key: value for key, value in row.items() if value != ""}
+            return
+
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                raise RecordStreamError(line_number, f"invalid JSON ({exc})") from None
+            if not isinstance(record, dict):
+                raise RecordStreamError(line_number, "expected a JSON object")
+            yield line_number, record
+    except UnicodeDecodeError:
+        raise RecordStreamError(line_number + 1, "not UTF-8 text") from None
+    except csv.Error as exc:
+        raise RecordStreamError(line_number + 1, f"invalid CSV ({exc})") from None
+
+
+class RecordEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder, except that datetimes keep their microseconds: export
+    timestamps are fed back as `since` positions and must compare equal.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return super().default(o)
+
+
+_encoder = RecordEncoder()
+
+
+def _csv_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (dict, list)):
+        return _encoder.encode(value)
+    # dates and times in ISO 8601, as in NDJSON
+    return _encoder.default(value)
+
+
+def write_records(records, fields, fmt):
+    """
+    Encode an iterable of dicts as NDJSON or CSV (header first), yielding a
+    chunk of text every CHUNK_RECORDS records.
+    """
+    buffer = io.StringIO()
+    writer = None
+    if fmt == CSV:
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+
+    count = 0
+    for record in records:
+        if writer is not None:
+            writer.writerow([_csv_value(record.get(field)) for field in fields])
+        else:
+            buffer.write(_encoder.encode({field: record.get(field) for field in fields}))
+            buffer.write("\n")
+        count += 1
+        if count % CHUNK_RECORDS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_response(records, fields, fmt, filename):
+    response = StreamingHttpResponse(
+        write_records(records, fields, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = CONTENT_TYPES[NDJSON]
+    format = NDJSON
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # errors and other plain responses: one JSON document
+        return _encoder.encode(data).encode() + b"\n"
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = CONTENT_TYPES[CSV]
+    format = CSV
@@ -0,0 +1,365 @@
+# api/suggest.py
+#
+# Typeahead suggestions for GET /api/videos/suggest/?prefix=. Terms come
+# from video titles, course titles, video tags and popular search queries,
+# weighted by how often they occur, and are answered from memory.
+#
+# The index is a sorted array rather than a node-per-character trie: all
+# terms live in one UTF-8 blob with an offsets array, so a prefix is a pair
+# of binary searches giving the contiguous range of terms that start with it,
+# and the best k in that range are picked with numpy. At 1M terms that is a
+# few tens of MB instead of the hundreds a dict-of-dicts trie needs (see
+# benchmarks/bench_suggest.py).
+#
+# The array is immutable. Changes between rebuilds (new videos, renamed
+# courses, flushed search logs) go into a small sorted overlay that is merged
+# into every answer; the whole index is rebuilt from the database in the
+# background every SUGGEST_REBUILD_INTERVAL seconds or when the overlay grows
+# past SUGGEST_MAX_PENDING terms. The first build also runs in the
+# background: until it's in, a worker answers with no suggestions.
+import bisect
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import Course, Video
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 200
+
+
+def normalize_term(text) -> str:
+    """Lowercase and collapse whitespace; "" for anything unusable."""
+    if not isinstance(text, str):
+        return ""
+    return " ".join(text.lower().split())[:MAX_TERM_LENGTH]
+
+
+class _Keys:
+    """Sequence view of the encoded terms, so bisect can search the blob."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+
+class PrefixIndex:
+    """
+    Immutable term -> weight index with top-k prefix lookups. Terms are
+    sorted by their UTF-8 bytes (the same order as by code point), so all
+    terms sharing a prefix form one contiguous range.
+    """
+
+    def __init__(self, weights):
+        encoded = sorted((term.encode(), weight) for term, weight in weights.items() if weight > 0)
+        lengths = np.fromiter((len(term) for term, _ in encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # array rather than numpy: indexing it gives plain ints, which are
+        # much faster to slice the blob with than numpy scalars
+        self.offsets = array("q", offsets.tobytes())
+        self.blob = b"".join(term for term, _ in encoded)
+        self.weights = np.fromiter((weight for _, weight in encoded), dtype=np.int64, count=len(encoded))
+        self._keys = _Keys(self.blob, self.offsets)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def nbytes(self):
+        return len(self.blob) + self.offsets.itemsize * len(self.offsets) + self.weights.nbytes
+
+    def term(self, i):
+        return self._keys[i].decode()
+
+    def weight(self, term):
+        key = term.encode()
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self) and self._keys[i] == key:
+            return int(self.weights[i])
+        return 0
+
+    def prefix_range(self, prefix):
+        key = prefix.encode()
+        lo = bisect.bisect_left(self._keys, key)
+        # 0xff never occurs in UTF-8, so this sorts after every extension
+        hi = bisect.bisect_left(self._keys, key + b"\xff", lo)
+        return lo, hi
+
+    def top(self, prefix, k):
+        """[(term, weight)] for the k heaviest terms starting with prefix."""
+        lo, hi = self.prefix_range(prefix)
+        if hi - lo > k:
+            best = np.argpartition(self.weights[lo:hi], hi - lo - k)[hi - lo - k:] + lo
+        else:
+            best = range(lo, hi)
+        return sorted(
+            ((self.term(i), int(self.weights[i])) for i in best),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+
+class SuggestionIndex:
+    """
+    PrefixIndex plus the pending overlay, memoized answers, and the
+    rebuild/refresh logic. Thread-safe.
+    """
+
+    def __init__(self, max_memo=10000):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._index = None
+        self._built_at = 0.0
+        self._rebuilding = False
+        # term -> weight change since the index was built, and its keys sorted
+        self._pending = {}
+        self._pending_keys = []
+        # queries not yet seen often enough to become suggestions
+        self._candidates = Counter()
+        self._memo = OrderedDict()
+        self.max_memo = max_memo
+
+    # -- lookups ------------------------------------------------------------
+
+    def suggest(self, prefix, k=10):
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        index = self._current_index()
+
+        with self._lock:
+            memo_key = (prefix, k)
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                self._memo.move_to_end(memo_key)
+                return cached
+            lo = bisect.bisect_left(self._pending_keys, prefix)
+            hi = bisect.bisect_left(self._pending_keys, prefix + "\U0010ffff", lo)
+            changed = {term: self._pending[term] for term in self._pending_keys[lo:hi]}
+
+        # at most len(changed) of the index's answers can have moved, so the
+        # true top k is within its top k + len(changed) plus the changed terms
+        weights = dict(index.top(prefix, k + len(changed)))
+        for term, delta in changed.items():
+            weights[term] = weights.get(term, index.weight(term)) + delta
+        result = sorted(
+            ((term, weight) for term, weight in weights.items() if weight > 0),
+            key=lambda item: (-item[1], item[0]),
+        )[:k]
+
+        with self._lock:
+            if index is not self._index:
+                # answered from an index that is being replaced, or from
+                # EMPTY_INDEX during the first build: don't keep it
+                return result
+            self._memo[memo_key] = result
+            while len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        return result
+
+    # -- incremental updates ------------------------------------------------
+
+    def adjust(self, deltas):
+        """Apply {term: weight change} without rebuilding."""
+        normalized = Counter()
+        for term, delta in deltas.items():
+            normalized[normalize_term(term)] += delta
+        with self._lock:
+            for term, delta in normalized.items():
+                if not term or not delta:
+                    continue
+                if term not in self._pending:
+                    bisect.insort(self._pending_keys, term)
+                    self._pending[term] = 0
+                self._pending[term] += delta
+            self._memo.clear()
+            overflow = len(self._pending) > settings.SUGGEST_MAX_PENDING
+        if overflow:
+            self.rebuild_in_background()
+
+    def add_queries(self, queries):
+        """
+        Count searched queries. A query becomes a suggestion once it has been
+        searched SUGGEST_MIN_QUERY_COUNT times; known terms just gain weight.
+        """
+        index = self._index
+        if index is None:
+            return  # the first build reads them from search_logs
+        deltas = Counter()
+        with self._lock:
+            for query in filter(None, map(normalize_term, queries)):
+                if query in self._pending or index.weight(query):
+                    deltas[query] += 1
+                    continue
+                self._candidates[query] += 1
+                if self._candidates[query] >= settings.SUGGEST_MIN_QUERY_COUNT:
+                    deltas[query] += self._candidates.pop(query)
+            if len(self._candidates) > settings.SUGGEST_MAX_PENDING:
+                # forget the long tail of one-off queries
+                self._candidates = Counter(dict(self._candidates.most_common(settings.SUGGEST_MAX_PENDING // 2)))
+        if deltas:
+            self.adjust(deltas)
+
+    # -- building -----------------------------------------------------------
+
+    def _current_index(self):
+        index = self._index
+        if index is None:
+            # reading every term takes seconds at scale; answer with no
+            # suggestions until the first build is in, not on the request path
+            self.rebuild_in_background()
+            return EMPTY_INDEX
+        if time.monotonic() - self._built_at > settings.SUGGEST_REBUILD_INTERVAL:
+            self.rebuild_in_background()
+        return index
+
+    def load(self, weights):
+        """Replace the index with one built from {term: weight}."""
+        index = PrefixIndex(weights)
+        with self._lock:
+            self._index = index
+            self._built_at = time.monotonic()
+            self._pending, self._pending_keys = {}, []
+            self._candidates.clear()
+            self._memo.clear()
+
+    def rebuild(self):
+        """Reload every term from the database and swap in a fresh index."""
+        with self._rebuild_lock:
+            if self._index is not None and time.monotonic() - self._built_at < 1:
+                return  # someone else just did
+            with self._lock:
+                pending_before = dict(self._pending)
+            index = PrefixIndex(load_term_weights())
+            with self._lock:
+                # changes made while we were reading may be missing from the
+                # snapshot, so they stay on as the new index's overlay
+                self._pending = {
+                    term: delta - pending_before.get(term, 0)
+                    for term, delta in self._pending.items()
+                    if delta != pending_before.get(term, 0)
+                }
+                self._pending_keys = sorted(self._pending)
+                self._index = index
+                self._built_at = time.monotonic()
+                self._candidates.clear()
+                self._memo.clear()
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                close_old_connections()
+                self.rebuild()
+            except Exception:
+                logger.exception("Rebuilding the suggestion index failed")
+            finally:
+                self._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=run, name="suggest-rebuild", daemon=True).start()
+
+
+TERM_WEIGHTS_SQL = """
+SELECT lower(title), count(*) FROM videos GROUP BY 1
+UNION ALL
+SELECT lower(title), count(*) FROM courses GROUP BY 1
+UNION ALL
+SELECT lower(tag), count(*)
+FROM videos, jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(tags) = 'array' THEN tags ELSE '[]'::jsonb END
+) AS tag
+GROUP BY 1
+UNION ALL
+SELECT lower(query), count(*) FROM search_logs GROUP BY 1 HAVING count(*) >= %s
+"""
+
+
+def load_term_weights():
+    """{term: weight} over titles, tags and popular search queries."""
+    weights = Counter()
+    with connection.cursor() as cursor:
+        cursor.execute(TERM_WEIGHTS_SQL, [settings.SUGGEST_MIN_QUERY_COUNT])
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for text, count in rows:
+                term = normalize_term(text)
+                if term:
+                    weights[term] += count
+    return weights
+
+
+EMPTY_INDEX = PrefixIndex({})
+suggestions = SuggestionIndex()
+
+
+def _video_terms(title, tags):
+    terms = Counter([title])
+    if isinstance(tags, list):
+        terms.update(tag for tag in tags if isinstance(tag, str))
+    return terms
+
+
+def index_created(courses=(), videos=()):
+    """Add the terms of rows created without save() signals (bulk_create)."""
+    if suggestions._index is None:
+        return
+    terms = Counter(course.title for course in courses)
+    for video in videos:
+        terms.update(_video_terms(video.title, video.tags))
+    suggestions.adjust(terms)
+
+
+# Keep the index in step with catalog writes. Saves that change terms look
+# up the old row first (in pre_save) so the old title/tags can be removed.
+
+def _remember_old_terms(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None or suggestions._index is None:
+        return
+    if sender is Video:
+        old = Video.objects.filter(pk=instance.pk).values("title", "tags").first()
+        instance._suggest_old_terms = _video_terms(old["title"], old["tags"]) if old else Counter()
+    else:
+        old = Course.objects.filter(pk=instance.pk).values_list("title", flat=True).first()
+        instance._suggest_old_terms = Counter([old]) if old else Counter()
+
+
+def _terms_saved(sender, instance, raw=False, **kwargs):
+    if raw or suggestions._index is None:
+        return
+    new = _video_terms(instance.title, instance.tags) if sender is Video else Counter([instance.title])
+    deltas = Counter(new)
+    deltas.subtract(getattr(instance, "_suggest_old_terms", Counter()))
+    suggestions.adjust(deltas)
+
+
+def _terms_deleted(sender, instance, **kwargs):
+    if suggestions._index is None:
+        return
+    old = _video_terms(instance.title, instance.tags) if sender is Video else Counter([instance.title])
+    suggestions.adjust({term: -count for term, count in old.items()})
+
+
+for _model in (Video, Course):
+    pre_save.connect(_remember_old_terms, sender=_model, dispatch_uid=f"suggest_pre_{_model.__name__}")
+    post_save.connect(_terms_saved, sender=_model, dispatch_uid=f"suggest_save_{_model.__name__}")
+    post_delete.connect(_terms_deleted, sender=_model, dispatch_uid=f"suggest_delete_{_model.__name__}")
@@ -0,0 +1,211 @@
+# api/tasks.py
+#
+# A durable job queue in Postgres, without a broker. enqueue() inserts a row
+# into task_queue (migration 0010), in the caller's transaction, so a job
+# exists exactly when the write that asked for it commits. Workers
+# (`python manage.py run_task_worker`) claim due rows with
+# FOR UPDATE SKIP LOCKED, so any number of them share the queue without
+# waiting on each other, and run the registered function with the row's
+# args.
+#
+# Claiming commits right away and leases the job: its run_at moves
+# TASK_LEASE seconds out (or the job's own lease, from when it starts), so a
+# job whose worker dies runs again after that, and no transaction stays open
+# while a job runs. The rest of a batch (run_task_worker --batch-size) has its
+# leases renewed while it waits behind a long job (see run_claimed). A job that raises is retried with exponential backoff
+# (TASK_RETRY_DELAY doubling per attempt, up to TASK_RETRY_MAX_DELAY) until it
+# has used max_attempts; then its row stays with failed_at and last_error set.
+# Done jobs are deleted.
+#
+# Delivery is at least once (a worker can die between running a job and
+# deleting it), so jobs must be safe to run twice.
+import json
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# name -> (function, max_attempts or None for TASK_MAX_ATTEMPTS, lease or None
+# for TASK_LEASE)
+REGISTRY = {}
+
+CLAIM_SQL = """
+UPDATE task_queue SET run_at = now() + %(lease)s * interval '1 second', attempts = attempts + 1
+WHERE id IN (
+    SELECT id FROM task_queue
+    WHERE run_at <= now() AND failed_at IS NULL
+    ORDER BY run_at, id
+    LIMIT %(limit)s
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, task, args, attempts, max_attempts
+"""
+
+RENEW_SQL = """
+UPDATE task_queue SET run_at = now() + %(lease)s * interval '1 second'
+WHERE (id, attempts) IN (SELECT * FROM unnest(%(ids)s::bigint[], %(attempts)s::int[]))
+RETURNING id
+"""
+
+
+class PermanentTaskError(Exception):
+    """Raised by a job that retrying can't help; it fails right away."""
+
+
+def task(name=None, max_attempts=None, lease=None):
+    """
+    Register a function as a job, under its own name unless `name` is given.
+    A job that can run longer than TASK_LEASE seconds needs its own `lease`.
+    """
+    def register(fn):
+        REGISTRY[name or fn.__name__] = (fn, max_attempts, lease)
+        return fn
+    return register
+
+
+def _max_attempts(name):
+    _, max_attempts, _ = REGISTRY.get(name, (None, None, None))
+    return max_attempts or settings.TASK_MAX_ATTEMPTS
+
+
+def enqueue(name, delay=0, **kwargs):
+    """Queue the job `name`(**kwargs) to run in `delay` seconds or later."""
+    return Task.objects.create(
+        task=name, args=kwargs, run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=_max_attempts(name),
+    )
+
+
+def enqueue_many(name, kwargs_list, batch_size=1000):
+    """Queue one `name` job per dict of keyword arguments."""
+    now = timezone.now()
+    return Task.objects.bulk_create(
+        [Task(task=name, args=kwargs, run_at=now, max_attempts=_max_attempts(name)) for kwargs in kwargs_list],
+        batch_size=batch_size,
+    )
+
+
+def claim(limit=1):
+    """Lease up to `limit` due jobs: [(id, name, args, attempts, max_attempts)]."""
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, {"lease": settings.TASK_LEASE, "limit": limit})
+        # Django leaves jsonb undecoded (JSONField does it), so does a raw query
+        return [
+            (job_id, name, json.loads(args), attempts, max_attempts)
+            for job_id, name, args, attempts, max_attempts in cursor.fetchall()
+        ]
+
+
+def retry_delay(attempts):
+    # jittered to spread out jobs that failed together (e.g. storage was down)
+    delay = settings.TASK_RETRY_DELAY * 2 ** (attempts - 1) * random.uniform(0.75, 1.25)
+    return min(delay, settings.TASK_RETRY_MAX_DELAY)
+
+
+def _failed(job_id, name, attempts, max_attempts, permanent):
+    error = traceback.format_exc()
+    if permanent or attempts >= max_attempts:
+        logger.error("Task %s (%s) failed after %d attempts", job_id, name, attempts, exc_info=True)
+        Task.objects.filter(pk=job_id).update(last_error=error, failed_at=timezone.now())
+    else:
+        delay = retry_delay(attempts)
+        logger.warning("Task %s (%s) failed, retrying in %.0fs", job_id, name, delay, exc_info=True)
+        Task.objects.filter(pk=job_id).update(
+            last_error=error, run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+
+def _renew_leases(jobs, lease):
+    """
+    Lease `jobs` for `lease` seconds from now, those still ours: a job whose
+    lease ran out and that another worker claimed has moved on to a later
+    attempt. Returns the ids renewed.
+    """
+    if not jobs:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(RENEW_SQL, {
+            "lease": lease,
+            "ids": [job[0] for job in jobs],
+            "attempts": [job[3] for job in jobs],
+        })
+        return {job_id for job_id, in cursor.fetchall()}
+
+
+def run_claimed(jobs):
+    """
+    Run claimed jobs in turn, then delete the ones that succeeded. Returns
+    how many did.
+
+    A job with its own lease gets it when it starts, and the jobs of the
+    batch waiting behind it have theirs pushed past it, as they do whenever
+    half of TASK_LEASE has gone by, so they aren't handed to another worker
+    while they wait. One that was anyway (its lease ran out) is skipped: it
+    belongs to the worker that claimed it again.
+    """
+    done = []
+    renewed_at = time.monotonic()
+    for position, (job_id, name, args, attempts, max_attempts) in enumerate(jobs):
+        _, _, lease = REGISTRY.get(name, (None, None, None))
+        # until half of TASK_LEASE has gone by, the leases from the claim (or
+        # the last renewal) are good for the whole batch
+        if lease or time.monotonic() - renewed_at > settings.TASK_LEASE / 2:
+            if job_id not in _renew_leases(jobs[position:position + 1], lease or settings.TASK_LEASE):
+                continue
+            _renew_leases(jobs[position + 1:], (lease or settings.TASK_LEASE) + settings.TASK_LEASE)
+            renewed_at = time.monotonic()
+        try:
+            if name not in REGISTRY:
+                raise PermanentTaskError(f"No task named {name!r}")
+            fn, _, _ = REGISTRY[name]
+            fn(**args)
+        except PermanentTaskError:
+            _failed(job_id, name, attempts, max_attempts, permanent=True)
+        except Exception:
+            _failed(job_id, name, attempts, max_attempts, permanent=False)
+        else:
+            done.append(job_id)
+    if done:
+        Task.objects.filter(pk__in=done).delete()
+    return len(done)
+
+
+def work(stop, batch_size=1, poll_interval=None, burst=False):
+    """
+    Claim and run jobs until `stop` (a threading/multiprocessing Event) is
+    set, or with `burst` until none is due. Returns the number of jobs done.
+    """
+    poll_interval = settings.TASK_POLL_INTERVAL if poll_interval is None else poll_interval
+    done = 0
+    while not stop.is_set():
+        # as Django does between requests: drop a broken or expired connection
+        close_old_connections()
+        jobs = claim(batch_size)
+        if jobs:
+            done += run_claimed(jobs)
+        elif burst:
+            break
+        else:
+            stop.wait(poll_interval)
+    return done
+
+
+def queue_stats():
+    """Due, scheduled (later or leased) and failed job counts."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FILTER (WHERE failed_at IS NULL AND run_at <= now()), "
+            "count(*) FILTER (WHERE failed_at IS NULL AND run_at > now()), "
+            "count(*) FILTER (WHERE failed_at IS NOT NULL) FROM task_queue"
+        )
+        due, scheduled, failed = cursor.fetchone()
+    return {"due": due, "scheduled": scheduled, "failed": failed}
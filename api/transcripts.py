@@ -0,0 +1,234 @@
+# api/transcripts.py
+#
+# Splitting transcripts into timestamped passages for passage search. Used by
+# `python manage.py index_transcripts`, which runs split_batch in a process
+# pool, so the splitting sticks to the standard library and never touches
+# the database; write_passages stores what it returns. The ingest jobs in
+# api/processing.py do the same for one video.
+#
+# Three transcript shapes are understood:
+#   - WebVTT / SRT cues ("00:01:02.500 --> 00:01:05.000" lines)
+#   - inline markers like "[01:02]", "[1:02:03]" or "(01:02)"
+#   - plain text, where times are estimated from the position in the text
+#     (scaled to the video's duration when it is known)
+import hashlib
+import re
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from .models import TranscriptIndexState, TranscriptPassage
+
+# target passage size; a passage ends at the first segment boundary past it
+PASSAGE_WORDS = 60
+# and no passage is longer than this, even inside one long segment
+MAX_PASSAGE_WORDS = 120
+# speaking rate used when a plain transcript has no duration to scale to
+WORDS_PER_SECOND = 2.5
+# rows per INSERT statement in write_passages
+INSERT_BATCH_SIZE = 1000
+
+_TIME = r"(?:\d{1,2}:)?\d{1,2}:\d{2}(?:[.,]\d{1,3})?"
+CUE_RE = re.compile(rf"^\s*({_TIME})\s*-->\s*({_TIME})", re.M)
+MARKER_RE = re.compile(r"[\[(]((?:\d{1,2}:)?\d{1,2}:\d{2})[\])]")
+SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+WORD_RE = re.compile(r"\S+")
+MARKUP_CHARS = frozenset("[(<")
+
+
+@dataclass
+class Passage:
+    position: int
+    start_seconds: float
+    end_seconds: float
+    char_start: int
+    char_end: int
+    text: str
+
+
+def transcript_md5(transcript: str) -> str:
+    # matches Postgres md5(text), which hashes the UTF-8 bytes
+    return hashlib.md5(transcript.encode()).hexdigest()
+
+
+def parse_time(value: str) -> float:
+    """'01:02:03.5', '1:02' or '02:03,250' -> seconds."""
+    seconds = 0.0
+    for part in value.replace(",", ".").split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+# -- segments: (start_seconds, end_seconds, char_start, char_end) spans -----
+# Times are None where the transcript doesn't say.
+
+def _cue_segments(text):
+    """One segment per VTT/SRT cue; char offsets cover the cue's text lines."""
+    matches = list(CUE_RE.finditer(text))
+    segments = []
+    for i, match in enumerate(matches):
+        body_start = text.find("\n", match.end())
+        if body_start < 0:
+            continue
+        body_end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[body_start:body_end]
+        # drop the next cue's numeric id (SRT) and blank lines at the end
+        body = re.sub(r"\n\s*\d+\s*$", "", body.rstrip())
+        if body.strip():
+            lead = len(body) - len(body.lstrip())
+            segments.append((
+                parse_time(match.group(1)), parse_time(match.group(2)),
+                body_start + lead, body_start + len(body),
+            ))
+    return segments
+
+
+def _marker_segments(text):
+    """Text between consecutive [mm:ss] markers, timed by the marker before it."""
+    matches = list(MARKER_RE.finditer(text))
+    segments = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        if text[match.end():end].strip():
+            segments.append((parse_time(match.group(1)), None, match.end(), end))
+    return segments
+
+
+def _sentence_segments(text):
+    return [(None, None, m.start(), m.end()) for m in SENTENCE_RE.finditer(text) if m.group().strip()]
+
+
+def _clean(text):
+    text = MARKER_RE.sub(" ", text)
+    # inline VTT tags such as <v Speaker> or <00:01:02.000>
+    text = re.sub(r"<[^>]+>", " ", text)
+    return " ".join(text.split())
+
+
+def _is_word(token):
+    # only tokens with markup characters need the (slower) full clean
+    return not MARKUP_CHARS.intersection(token) or bool(_clean(token))
+
+
+def split_transcript(transcript, duration=None, passage_words=PASSAGE_WORDS,
+                     max_words=MAX_PASSAGE_WORDS):
+    """Split a transcript into Passages, in order."""
+    text = transcript or ""
+    if not text.strip():
+        return []
+
+    segments = _cue_segments(text) or _marker_segments(text) or _sentence_segments(text)
+    timed = segments[0][0] is not None
+
+    # words as (char_start, char_end, seconds, segment index) in reading order
+    words = []
+    segment_ends = []
+    for index, (start, end, seg_start, seg_end) in enumerate(segments):
+        seg_words = [
+            (m.start() + seg_start, m.end() + seg_start)
+            for m in WORD_RE.finditer(text[seg_start:seg_end])
+            if _is_word(m.group())
+        ]
+        if timed:
+            # a segment lasts until its stated end, else until the next one
+            if end is None or end <= start:
+                end = segments[index + 1][0] if index + 1 < len(segments) else None
+            if end is None or end <= start:
+                end = start + len(seg_words) / WORDS_PER_SECOND
+            step = (end - start) / max(len(seg_words), 1)
+            words.extend((a, b, start + n * step, index) for n, (a, b) in enumerate(seg_words))
+        else:
+            words.extend((a, b, None, index) for a, b in seg_words)
+        segment_ends.append(end)
+
+    if not words:
+        return []
+
+    if not timed:
+        # estimate: proportional to position when the duration is known,
+        # otherwise a typical speaking rate
+        total_chars = len(text)
+        words = [
+            (a, b, duration * a / total_chars if duration else n / WORDS_PER_SECOND, seg)
+            for n, (a, b, _, seg) in enumerate(words)
+        ]
+
+    passages = []
+    chunk = []
+    for n, word in enumerate(words):
+        chunk.append(word)
+        next_word = words[n + 1] if n + 1 < len(words) else None
+        at_boundary = next_word is None or next_word[3] != word[3]
+        if next_word is None or len(chunk) >= max_words or (len(chunk) >= passage_words and at_boundary):
+            # tokens that are words alone can still add up to markup only,
+            # such as "<v" and "Bob>"
+            passage_text = _clean(" ".join(text[a:b] for a, b, _, _ in chunk))
+            if not passage_text:
+                chunk = []
+                continue
+            char_start, char_end = chunk[0][0], chunk[-1][1]
+            if timed and at_boundary:
+                end_seconds = segment_ends[word[3]]
+            elif next_word is not None:
+                end_seconds = next_word[2]
+            elif duration and duration > word[2]:
+                end_seconds = duration
+            else:
+                end_seconds = word[2] + 1 / WORDS_PER_SECOND
+            passages.append(Passage(
+                position=len(passages),
+                start_seconds=round(chunk[0][2], 2),
+                end_seconds=round(end_seconds, 2),
+                char_start=char_start,
+                char_end=char_end,
+                text=passage_text,
+            ))
+            chunk = []
+    return passages
+
+
+def split_batch(rows, passage_words=PASSAGE_WORDS, max_words=MAX_PASSAGE_WORDS):
+    """
+    Process-pool entry point: [(video_id, transcript, duration)] ->
+    [(video_id, md5, [Passage])].
+    """
+    return [
+        (video_id, transcript_md5(transcript or ""),
+         split_transcript(transcript, duration, passage_words, max_words))
+        for video_id, transcript, duration in rows
+    ]
+
+
+def write_passages(results):
+    """
+    Replace the passages of every video in `results` (as returned by
+    split_batch) and record which transcript they were built from.
+    """
+    video_ids = [video_id for video_id, _, _ in results]
+    rows = [
+        (video_id, p.position, p.start_seconds, p.end_seconds, p.char_start, p.char_end, p.text)
+        for video_id, _, passages in results
+        for p in passages
+    ]
+    with transaction.atomic():
+        TranscriptPassage.objects.filter(video_id__in=video_ids).delete()
+        # raw INSERT: the ORM would also write the generated search_vector column
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                batch = rows[start:start + INSERT_BATCH_SIZE]
+                cursor.execute(
+                    "INSERT INTO transcript_passages "
+                    "(video_id, position, start_seconds, end_seconds, char_start, char_end, text) "
+                    "VALUES " + ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(batch)),
+                    [value for row in batch for value in row],
+                )
+        TranscriptIndexState.objects.bulk_create(
+            [
+                TranscriptIndexState(video_id=video_id, transcript_md5=md5, passage_count=len(passages))
+                for video_id, md5, passages in results
+            ],
+            update_conflicts=True,
+            unique_fields=["video"],
+            update_fields=["transcript_md5", "passage_count", "indexed_at"],
+        )
+    return len(rows)
@@ -0,0 +1,214 @@
+# api/trending.py
+#
+# Time-decayed popularity leaderboards for GET /api/videos/trending/ and
+# /api/courses/trending/.
+#
+# Every like, bookmark, comment, rating and first view adds its weight to the
+# video's score, and the score halves every TRENDING_HALF_LIFE seconds. Decay
+# is never applied to stored rows: an event at time t is stored as
+#
+#     ln(weight) + (t - EPOCH) * ln 2 / TRENDING_HALF_LIFE
+#
+# and scores are summed in log space. Every score decays at the same rate, so
+# the order of the stored numbers is already the order of the decayed scores
+# and an update touches one row per leaderboard. The leaderboards are rows of
+# trending_scores ordered by the (board, score DESC) index: an update is one
+# upsert per board (a B-tree insert), and the top k is the first k index
+# entries.
+#
+# Boards:
+#   videos                      every video
+#   videos:course:<course_id>   the videos of one course
+#   courses                     every course, by the activity on its videos
+#   courses:category:<name>     the courses of one category
+#
+# Events are buffered per process (see api/buffering.py) and written every
+# TRENDING_FLUSH_INTERVAL seconds. Deleting a like or rating doesn't take its
+# weight back; `python manage.py rebuild_trending` recomputes every board from
+# the interaction tables.
+import math
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .buffering import BufferedWriter
+
+# 2024-01-01T00:00:00Z; stored scores are log-weights relative to it
+EPOCH = 1704067200
+
+# how much one event of each kind adds to a video's score
+EVENT_WEIGHTS = {
+    "like": 3.0,
+    "bookmark": 3.0,
+    "comment": 2.0,
+    "rating": 2.0,
+    # first progress row of a (user, video)
+    "view": 1.0,
+}
+
+# rebuild_trending ignores events older than this many half-lives (weight
+# below 1e-6 of a new one)
+REBUILD_HALF_LIVES = 20
+
+
+def decay_offset(at=None):
+    """The log-space score of a weight-1 event at `at` (default now)."""
+    at = time.time() if at is None else at
+    return (at - EPOCH) * math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+# Fans events (video_id, value) out to every board their video is on.
+BOARDS_SQL = """
+    SELECT 'videos' AS board, v.video_id AS entity_id, e.value
+    FROM events e JOIN videos v ON v.video_id = e.video_id
+    UNION ALL
+    SELECT 'videos:course:' || v.course_id, v.video_id, e.value
+    FROM events e JOIN videos v ON v.video_id = e.video_id
+    WHERE v.course_id IS NOT NULL
+    UNION ALL
+    SELECT 'courses', v.course_id, e.value
+    FROM events e JOIN videos v ON v.video_id = e.video_id
+    WHERE v.course_id IS NOT NULL
+    UNION ALL
+    SELECT 'courses:category:' || c.category, c.course_id, e.value
+    FROM events e
+    JOIN videos v ON v.video_id = e.video_id
+    JOIN courses c ON c.course_id = v.course_id
+    WHERE c.category <> ''
+"""
+
+# One statement per flush. Weights of the same (board, entity) are summed
+# before the upsert, which adds them to the stored score with a log-space
+# addition: ln(e^a + e^b) = max(a, b) + ln(1 + e^-|a - b|).
+UPSERT_SQL = """
+WITH events (video_id, value) AS (VALUES {values})
+INSERT INTO trending_scores (board, entity_id, score, updated_at)
+SELECT board, entity_id, ln(sum(value)) + %s, now()
+FROM (""" + BOARDS_SQL + """) AS boards
+GROUP BY board, entity_id
+-- a fixed lock order keeps concurrent flushes from deadlocking
+ORDER BY board, entity_id
+ON CONFLICT (board, entity_id) DO UPDATE SET
+    score = GREATEST(trending_scores.score, EXCLUDED.score)
+          + ln(1 + exp(-abs(trending_scores.score - EXCLUDED.score))),
+    updated_at = now()
+"""
+
+
+def write_events(weights, at=None):
+    """Add {video_id: weight} to every board the videos are on."""
+    weights = {video_id: weight for video_id, weight in weights.items() if weight > 0}
+    if not weights:
+        return
+    sql = UPSERT_SQL.format(values=", ".join(["(%s::int, %s::float)"] * len(weights)))
+    params = [value for item in sorted(weights.items()) for value in item]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, decay_offset(at)])
+
+
+class TrendingBuffer(BufferedWriter):
+    """Pending events as {video_id: summed weight}."""
+
+    def new_pending(self):
+        return Counter()
+
+    def add_to(self, pending, item):
+        video_id, weight = item
+        pending[video_id] += weight
+
+    def write(self, pending):
+        write_events(pending)
+
+    def flush_size(self):
+        return settings.TRENDING_FLUSH_SIZE
+
+    def flush_interval(self):
+        return settings.TRENDING_FLUSH_INTERVAL
+
+
+trending_events = TrendingBuffer()
+
+
+def record_event(video_id, kind, count=1):
+    """
+    Count `count` events of `kind` (see EVENT_WEIGHTS) on a video once the
+    current transaction commits.
+    """
+    weight = EVENT_WEIGHTS[kind] * count
+    transaction.on_commit(lambda: trending_events.add((video_id, weight)))
+
+
+def top(board, limit):
+    """[(entity_id, decayed score)] of the best `limit` entries of a board."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT entity_id, score FROM trending_scores WHERE board = %s "
+            "ORDER BY score DESC, entity_id DESC LIMIT %s",
+            [board, limit],
+        )
+        rows = cursor.fetchall()
+    offset = decay_offset()
+    return [(entity_id, round(math.exp(score - offset), 4)) for entity_id, score in rows]
+
+
+def video_board(course_id=None):
+    return f"videos:course:{course_id}" if course_id else "videos"
+
+
+def course_board(category=None):
+    return f"courses:category:{category}" if category else "courses"
+
+
+# every event of the last REBUILD_HALF_LIVES half-lives with its log-space score
+REBUILD_SQL = """
+WITH events (video_id, value) AS (
+    SELECT video_id, ln(%(like)s::float) + (extract(epoch FROM created_at) - %(epoch)s) * %(rate)s
+    FROM likes WHERE created_at >= %(since)s
+    UNION ALL
+    SELECT video_id, ln(%(bookmark)s::float) + (extract(epoch FROM created_at) - %(epoch)s) * %(rate)s
+    FROM bookmarks WHERE created_at >= %(since)s
+    UNION ALL
+    SELECT video_id, ln(%(comment)s::float) + (extract(epoch FROM created_at) - %(epoch)s) * %(rate)s
+    FROM comments WHERE created_at >= %(since)s
+    UNION ALL
+    SELECT video_id, ln(%(rating)s::float) + (extract(epoch FROM created_at) - %(epoch)s) * %(rate)s
+    FROM ratings WHERE created_at >= %(since)s
+    UNION ALL
+    -- progress rows only keep their latest update, which stands in for the view
+    SELECT video_id, ln(%(view)s::float) + (extract(epoch FROM updated_at) - %(epoch)s) * %(rate)s
+    FROM video_progress WHERE updated_at >= %(since)s
+)
+INSERT INTO trending_scores (board, entity_id, score, updated_at)
+SELECT board, entity_id, ln(sum(exp(value - %(offset)s))) + %(offset)s, now()
+FROM (""" + BOARDS_SQL + """) AS boards
+GROUP BY board, entity_id
+"""
+
+
+def rebuild():
+    """
+    Recompute every board from the interaction tables, dropping entries
+    whose score has decayed to nothing. Call inside a transaction; returns
+    the number of leaderboard rows written.
+    """
+    now = time.time()
+    params = dict(
+        EVENT_WEIGHTS,
+        epoch=EPOCH,
+        rate=math.log(2) / settings.TRENDING_HALF_LIFE,
+        offset=decay_offset(now),
+        since=datetime.fromtimestamp(
+            now - REBUILD_HALF_LIVES * settings.TRENDING_HALF_LIFE, tz=timezone.utc
+        ),
+    )
+    with connection.cursor() as cursor:
+        # flushes wait until the new rows are committed. Events still in a
+        # worker's buffer are counted again when it flushes, which is at
+        # most TRENDING_FLUSH_INTERVAL seconds of activity.
+        cursor.execute("LOCK TABLE trending_scores IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM trending_scores")
+        cursor.execute(REBUILD_SQL, params)
+        return cursor.rowcount
@@ -0,0 +1,324 @@
+# api/uploads.py
+#
+# Streaming video uploads. Instead of letting MultiPartParser spool the whole
+# file to a temp file and then re-reading it for a single put_object, the
+# request body is cut into parts as it arrives and each part is sent to
+# S3/MinIO as part of a multipart upload. Parts go up on a shared thread pool
+# while the next one is being read, and at most S3_UPLOAD_MAX_INFLIGHT_PARTS
+# parts per upload are held in memory at once.
+#
+# Uploads can be resumed: a client first opens an upload session
+# (POST /api/videos/uploads/), streams the file with ?upload_token=..., and if
+# the connection drops asks how many bytes were stored
+# (GET /api/videos/uploads/?upload_token=...) and re-sends the rest.
+#
+# For the largest files the bytes can skip the app servers entirely: the
+# direct-upload actions hand the client presigned URLs for every part and
+# only see the final "complete" call.
+#
+# Incomplete multipart uploads that are never resumed should be cleaned up by
+# a bucket lifecycle rule (AbortIncompleteMultipartUpload).
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from rest_framework.exceptions import ValidationError
+
+from .storage import ensure_bucket, get_s3_client, upload_key
+
+TOKEN_SALT = "api.uploads"
+
+# S3 rejects multipart parts (other than the last) smaller than this
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.S3_UPLOAD_THREADS,
+                    thread_name_prefix="s3-upload",
+                )
+    return _executor
+
+
+def part_size():
+    return max(settings.S3_UPLOAD_PART_SIZE, MIN_PART_SIZE)
+
+
+def make_upload_token(key, upload_id, user):
+    return signing.dumps({"key": key, "upload_id": upload_id, "user": user.pk}, salt=TOKEN_SALT)
+
+
+def read_upload_token(token, user, max_age=None):
+    """
+    Return (key, upload_id) for a token issued to `user`, or raise a
+    ValidationError.
+    """
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        raise ValidationError({"upload_token": "Invalid or expired upload token"})
+    if data.get("user") != user.pk:
+        raise ValidationError({"upload_token": "Upload token belongs to another user"})
+    return data["key"], data["upload_id"]
+
+
+def list_uploaded_parts(key, upload_id):
+    """Return {part_number: (etag, size)} for parts already stored."""
+    client = get_s3_client()
+    parts = {}
+    kwargs = {"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": key, "UploadId": upload_id}
+    while True:
+        response = client.list_parts(**kwargs)
+        for part in response.get("Parts", []):
+            parts[part["PartNumber"]] = (part["ETag"], part["Size"])
+        if not response.get("IsTruncated"):
+            return parts
+        kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+
+def start_multipart_upload(filename, content_type):
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    ensure_bucket(bucket)
+    key = upload_key(filename)
+    response = get_s3_client().create_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        ContentType=content_type or "application/octet-stream",
+    )
+    return key, response["UploadId"]
+
+
+def abort_multipart_upload(key, upload_id):
+    get_s3_client().abort_multipart_upload(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, UploadId=upload_id
+    )
+
+
+def complete_multipart_upload(key, upload_id, etags=None):
+    """
+    Finish a multipart upload. `etags` maps part number -> ETag; when it is
+    not given the parts stored on the server are used.
+    """
+    if etags is None:
+        etags = {number: etag for number, (etag, _) in list_uploaded_parts(key, upload_id).items()}
+    get_s3_client().complete_multipart_upload(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": [
+                {"PartNumber": number, "ETag": etag}
+                for number, etag in sorted(etags.items())
+            ]
+        },
+    )
+
+
+def presigned_part_urls(key, upload_id, size):
+    """Presigned PUT URLs for every part of a `size`-byte upload."""
+    count = max(1, -(-size // part_size()))
+    if count > MAX_PARTS:
+        raise ValidationError({"size": "File is too large for a multipart upload"})
+
+    client = get_s3_client()
+    return [
+        {
+            "part_number": number,
+            "url": client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": number,
+                },
+                ExpiresIn=settings.S3_PRESIGN_EXPIRES,
+            ),
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+class MultipartUploadWriter:
+    """
+    File-like sink that turns a stream of writes into multipart upload parts.
+    With resume=True, writing continues after the parts already stored.
+    """
+
+    def __init__(self, key, upload_id, resume=False):
+        self.key = key
+        self.upload_id = upload_id
+        self.part_size = part_size()
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.completed = False
+
+        stored = list_uploaded_parts(key, upload_id) if resume else {}
+        self.etags = {number: etag for number, (etag, _) in stored.items()}
+        self.resumed_bytes = sum(size for _, size in stored.values())
+        self.next_part = max(stored, default=0) + 1
+
+        self._buffer = bytearray()
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(settings.S3_UPLOAD_MAX_INFLIGHT_PARTS)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            body = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(body)
+
+    def _submit(self, body):
+        # stop reading as soon as a part has failed
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+        # blocks the reader when too many parts are already in flight,
+        # which is what keeps memory bounded
+        self._slots.acquire()
+        number = self.next_part
+        self.next_part += 1
+        future = _get_executor().submit(self._upload_part, number, body)
+        self._futures.append(future)
+
+    def _upload_part(self, number, body):
+        try:
+            response = get_s3_client().upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=number,
+                Body=body,
+            )
+            self.etags[number] = response["ETag"]
+        finally:
+            self._slots.release()
+
+    def wait(self):
+        """Wait for in-flight parts; re-raises the first upload error."""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def complete(self):
+        # the last part may be smaller than part_size (or empty)
+        if self._buffer or not self.etags:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        self.wait()
+        complete_multipart_upload(self.key, self.upload_id, self.etags)
+        self.completed = True
+
+    def abort(self):
+        for future in self._futures:
+            future.cancel()
+        abort_multipart_upload(self.key, self.upload_id)
+
+
+class S3UploadedFile(UploadedFile):
+    """An uploaded file whose bytes already live in object storage."""
+
+    def __init__(self, key, name, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.key = key
+
+    def open(self, mode=None):
+        raise ValueError("S3UploadedFile contents are in object storage, not local")
+
+    def close(self):
+        pass
+
+
+class S3UploadHandler(FileUploadHandler):
+    """
+    Upload handler that streams one form field (default "file") straight
+    into a multipart upload. Other fields fall through to the next handler.
+    `resume` is a (key, upload_id) pair from an upload session.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, request=None, field_name="file", resume=None):
+        super().__init__(request)
+        self.field_name_to_stream = field_name
+        self.resume = resume
+        self.writer = None
+        self.uploaded_file = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.field_name_to_stream:
+            return
+
+        if self.resume:
+            key, upload_id = self.resume
+        else:
+            key, upload_id = start_multipart_upload(self.file_name, self.content_type)
+        try:
+            self.writer = MultipartUploadWriter(key, upload_id, resume=bool(self.resume))
+        except ClientError as e:
+            if not self.resume:
+                raise
+            # the session was already completed or aborted
+            raise ValidationError({"upload_token": f"Upload session is gone: {e}"})
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.writer is None or self.writer.completed:
+            return raw_data
+        self.writer.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.writer is None or self.writer.completed:
+            return None
+        self.writer.complete()
+        self.uploaded_file = S3UploadedFile(
+            key=self.writer.key,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.writer.resumed_bytes + file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        return self.uploaded_file
+
+    def upload_interrupted(self):
+        self.abort()
+
+    def abort(self):
+        """
+        Called when the request body could not be read completely. A fresh
+        upload is aborted; a resumable one keeps its stored parts.
+        """
+        if self.writer is None or self.writer.completed:
+            return
+        if self.resume:
+            try:
+                self.writer.wait()
+            except Exception:
+                pass
+        else:
+            self.writer.abort()
+
+    def discard(self):
+        """Remove the stored object, e.g. when the rest of the form is invalid."""
+        if self.uploaded_file is not None:
+            get_s3_client().delete_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.uploaded_file.key
+            )
+        else:
+            self.abort()
@@ -1,28 +1,45 @@
 import os
+import time
 import unicodedata
 from uuid import uuid4
 from datetime import timedelta
 
+from botocore.exceptions import ClientError
 from django.conf import settings
+from django.db import connection, transaction
+from django.http import Http404
 from django.utils.text import get_valid_filename
 
-import re
-from django.db.models import Q
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
-import boto3
-from botocore.config import Config
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
 
 from .models import *
 from .serializers import *
-#from .minio_client import get_minio_client
-from django.conf import settings
-#from minio.error import S3Error
+from .search import (
+    cached_search, hybrid_search, normalize_query, passage_search, search_queryset, search_results,
+    semantic_search,
+)
+from .analytics import CanViewAnalytics, course_report, video_report
+from .bulk import BulkCatalogMixin
+from .caching import CatalogCacheMixin, invalidate
+from .hls import manifest_url
+from .progress import record_heartbeat
+from .recommendations import recommend
+from .search_log import record_search
+from .suggest import suggestions
+from . import playback, stats, trending
+from .storage import get_s3_client, object_key, presigned_get_url, public_url
+from .uploads import (
+    S3UploadHandler, abort_multipart_upload, complete_multipart_upload, list_uploaded_parts,
+    make_upload_token, part_size, presigned_part_urls, read_upload_token, start_multipart_upload,
+)
 
 
 def _safe_name(name: str) -> str:
@@ -31,13 +48,89 @@ def _safe_name(name: str) -> str:
     return get_valid_filename(name)
 
 
+def _limit_param(request, default=20, maximum=50):
+    """?limit= clamped to 1..maximum, or None if it isn't a number."""
+    try:
+        return max(1, min(int(request.query_params.get("limit", default)), maximum))
+    except ValueError:
+        return None
+
+
+# The serializers of every viewset but VideoViewSet emit foreign keys as
+# plain ids, so a list is one query with the default queryset and needs no
+# select_related/prefetch_related; api/tests.py pins each list's query count.
+
 class PortalUserViewSet(viewsets.ModelViewSet):
     queryset = PortalUser.objects.all()
     serializer_class = PortalUserSerializer
+    pagination_ordering = ("-created_at", "-pk")
 
-class CourseViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        # their videos lose uploaded_by
+        video_ids = list(Video.objects.filter(uploaded_by=instance).values_list("pk", flat=True))
+        with transaction.atomic():
+            # their likes, bookmarks, comments and ratings go with them: take
+            # what they added out of video_stats, as VideoStatsMixin does per row
+            deltas = stats.user_deltas(instance)
+            super().perform_destroy(instance)
+            for video_id, video_deltas in deltas.items():
+                stats.adjust(video_id, **{name: -value for name, value in video_deltas.items()})
+            invalidate("video", *set(video_ids) | set(deltas))
+
+class CourseViewSet(BulkCatalogMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_ordering = ("-created_at", "-pk")
+    cache_namespace = "course"
+    bulk_kind = "courses"
+
+    def perform_destroy(self, instance):
+        # deleting a course deletes its videos
+        video_ids = list(instance.videos.values_list("pk", flat=True))
+        super().perform_destroy(instance)
+        invalidate("video", *video_ids)
+
+    @action(detail=False, methods=["get"], url_path="trending")
+    def trending(self, request):
+        """Most active courses lately (?category=, ?limit= up to 50)."""
+        limit = _limit_param(request)
+        if limit is None:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = trending.top(trending.course_board(request.query_params.get("category")), limit)
+        courses = Course.objects.in_bulk([course_id for course_id, _ in ranked])
+        ranked = [(courses[course_id], score) for course_id, score in ranked if course_id in courses]
+
+        results = self.get_serializer([course for course, _ in ranked], many=True).data
+        for item, (_, score) in zip(results, ranked):
+            item["trending_score"] = score
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="analytics",
+            permission_classes=[IsAuthenticated, CanViewAnalytics])
+    def analytics(self, request, pk=None):
+        """
+        Students, completion, watched percentage, ratings and per-video
+        drop-off for the course's instructor (as of refreshed_at; see
+        api/analytics.py).
+        """
+        return Response(course_report(self.get_object()), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="play-urls", permission_classes=[IsAuthenticated],
+            authentication_classes=[JWTStatelessUserAuthentication])
+    def play_urls(self, request, pk=None):
+        """Play URLs of every video in the course, as VideoViewSet.play_batch returns them."""
+        try:
+            course_id = int(pk)
+        except ValueError:
+            raise Http404
+        videos = list(Video.objects.filter(course_id=course_id).order_by("pk").only(*playback.PLAY_FIELDS))
+        # only an empty result needs the course looked up
+        if not videos and not Course.objects.filter(pk=course_id).exists():
+            raise Http404
+        return Response(
+            {"course_id": course_id, "videos": playback.play_urls(request, videos)}, status=status.HTTP_200_OK,
+        )
     
 
 #class VideoViewSet(viewsets.ModelViewSet):
@@ -49,114 +142,438 @@ class CourseViewSet(viewsets.ModelViewSet):
 class VideoProgressViewSet(viewsets.ModelViewSet):
     queryset = VideoProgress.objects.all()
     serializer_class = VideoProgressSerializer
+    # heartbeats keep moving updated_at, which would make rows jump past the
+    # cursor while a client pages; the id never changes
+    pagination_ordering = ("-pk",)
+
+    @action(detail=False, methods=["post"], url_path="heartbeat", permission_classes=[IsAuthenticated],
+            authentication_classes=[JWTStatelessUserAuthentication])
+    def heartbeat(self, request):
+        """
+        Player position update: {video, watched_seconds}. Buffered and
+        written in the background (see api/progress.py), hence 202. Only
+        needs the token's user id, so the user isn't looked up.
+        """
+        serializer = ProgressHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        record_heartbeat(request.user.pk, serializer.validated_data["video"],
+                         serializer.validated_data["watched_seconds"])
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+class VideoStatsMixin:
+    """
+    Keeps video_stats in step with the rows of an interaction viewset, whose
+    model must be one of stats.ROW_COUNTERS: what one row adds to its video's
+    counters is adjusted in the same transaction as the write. New rows also
+    count as a `trending_event` for the trending leaderboards.
+    """
+
+    trending_event = None
 
-class LikeViewSet(viewsets.ModelViewSet):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.queryset.model not in stats.ROW_COUNTERS:
+            raise TypeError(f"{cls.__name__}: no video_stats counters for {cls.queryset.model.__name__}")
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save()
+            stats.adjust(instance.video_id, **stats.row_deltas(instance))
+            invalidate("video", instance.video_id)
+            trending.record_event(instance.video_id, self.trending_event)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old_video_id = serializer.instance.video_id
+            old_deltas = stats.row_deltas(serializer.instance)
+            instance = serializer.save()
+            stats.apply_change(old_video_id, old_deltas, instance.video_id, stats.row_deltas(instance))
+            invalidate("video", old_video_id, instance.video_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            video_id, deltas = instance.video_id, stats.row_deltas(instance)
+            deleted, _ = instance.delete()
+            # a concurrent DELETE of the same row got there first and already
+            # took it out of the counters
+            if deleted:
+                stats.adjust(video_id, **{name: -value for name, value in deltas.items()})
+                invalidate("video", video_id)
+
+class LikeViewSet(VideoStatsMixin, viewsets.ModelViewSet):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
+    pagination_ordering = ("-created_at", "-pk")
+    trending_event = "like"
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(VideoStatsMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    pagination_ordering = ("-created_at", "-pk")
+    trending_event = "comment"
 
-class BookmarkViewSet(viewsets.ModelViewSet):
+class BookmarkViewSet(VideoStatsMixin, viewsets.ModelViewSet):
     queryset = Bookmark.objects.all()
     serializer_class = BookmarkSerializer
+    pagination_ordering = ("-created_at", "-pk")
+    trending_event = "bookmark"
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(VideoStatsMixin, viewsets.ModelViewSet):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
+    pagination_ordering = ("-created_at", "-pk")
+    trending_event = "rating"
 
 class SearchLogViewSet(viewsets.ModelViewSet):
     queryset = SearchLog.objects.all()
     serializer_class = SearchLogSerializer
+    pagination_ordering = ("-searched_at", "-pk")
     
-class VideoViewSet(viewsets.ModelViewSet):
-    # queryset = Video.objects.select_related("course", "uploaded_by").all()
-    queryset = Video.objects.all()
+class VideoViewSet(BulkCatalogMixin, CatalogCacheMixin, viewsets.ModelViewSet):
+    # VideoSerializer only emits course/uploaded_by ids, so the only join is
+    # the one-to-one stats row; keep the search/embedding columns out of
+    # every SELECT
+    queryset = Video.objects.defer("search_vector", "embedding_vector").select_related("stats")
     serializer_class = VideoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_ordering = ("-uploaded_at", "-pk")
+    cache_namespace = "video"
+    bulk_kind = "videos"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "play":
+            # play only needs the object keys
+            return qs.select_related(None).only("video_id", "file_url", "hls_manifest")
+        if self.action == "play_batch":
+            return qs.select_related(None).only(*playback.PLAY_FIELDS)
+        return qs
+
+    def create(self, request, *args, **kwargs):
+        """
+        Upload a video. The file field is streamed straight into object
+        storage by S3UploadHandler; pass ?upload_token= (from the uploads
+        action) to continue an interrupted upload.
+        """
+        token = request.query_params.get("upload_token")
+        resume = read_upload_token(token, request.user, settings.UPLOAD_TOKEN_MAX_AGE) if token else None
+
+        # must be installed before request.data is first touched
+        handler = S3UploadHandler(request, resume=resume)
+        request.upload_handlers = [handler, *request._request.upload_handlers]
+        try:
+            data = request.data
+        except Exception:
+            handler.abort()
+            raise
+
+        serializer = self.get_serializer(data=data)
+        if not serializer.is_valid():
+            handler.discard()
+            raise ValidationError(serializer.errors)
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(detail=False, methods=["get", "post", "delete"], url_path="uploads")
+    def uploads(self, request):
+        """
+        Resumable upload sessions.
+        POST {filename, content_type} opens one and returns an upload_token,
+        GET ?upload_token= reports how many bytes are stored (resume from
+        there), DELETE ?upload_token= abandons it.
+        """
+        if request.method == "POST":
+            filename = request.data.get("filename")
+            if not filename:
+                raise ValidationError({"filename": "This field is required."})
+            key, upload_id = start_multipart_upload(filename, request.data.get("content_type"))
+            return Response(
+                {"upload_token": make_upload_token(key, upload_id, request.user), "part_size": part_size()},
+                status=status.HTTP_201_CREATED,
+            )
+
+        key, upload_id = read_upload_token(
+            request.query_params.get("upload_token", ""), request.user, settings.UPLOAD_TOKEN_MAX_AGE,
+        )
+        try:
+            if request.method == "DELETE":
+                abort_multipart_upload(key, upload_id)
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            parts = list_uploaded_parts(key, upload_id)
+        except ClientError as e:
+            # e.g. NoSuchUpload: the session was already completed or aborted
+            raise ValidationError({"upload_token": f"Upload session is gone: {e}"})
+        return Response({"received_bytes": sum(size for _, size in parts.values()), "parts": len(parts)})
+
+    @action(detail=False, methods=["post"], url_path="direct-upload")
+    def direct_upload(self, request):
+        """
+        Start an upload that goes straight from the client to object storage.
+        POST {filename, content_type, size}; the client PUTs each part to its
+        URL and then calls direct-upload/complete/.
+        """
+        filename = request.data.get("filename")
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            size = -1
+        if not filename or size < 0:
+            raise ValidationError({"detail": "filename and size are required"})
+
+        key, upload_id = start_multipart_upload(filename, request.data.get("content_type"))
+        try:
+            parts = presigned_part_urls(key, upload_id, size)
+        except ValidationError:
+            abort_multipart_upload(key, upload_id)
+            raise
+
+        return Response(
+            {
+                "upload_token": make_upload_token(key, upload_id, request.user),
+                "part_size": part_size(),
+                "expires_in": settings.S3_PRESIGN_EXPIRES,
+                "parts": parts,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=["post"], url_path="direct-upload/complete")
+    def direct_upload_complete(self, request):
+        """
+        Finish a direct upload and create the Video. Takes the usual video
+        fields plus upload_token and, optionally, parts=[{part_number, etag}]
+        (otherwise the parts stored on the server are used). Sending the
+        same upload_token again returns the Video it created, with a 200.
+        """
+        key, upload_id = read_upload_token(
+            request.data.get("upload_token", ""), request.user, settings.UPLOAD_TOKEN_MAX_AGE,
+        )
+
+        serializer = self.get_serializer(
+            data=request.data,
+            context={**self.get_serializer_context(), "direct_upload": True},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        parts = request.data.get("parts")
+        etags = None
+        if parts:
+            try:
+                etags = {int(p["part_number"]): p["etag"] for p in parts}
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError({"parts": "Expected a list of {part_number, etag}"})
 
-    @action(detail=True, methods=["get"], url_path="play", permission_classes=[IsAuthenticated])
+        file_url = public_url(key)
+        with transaction.atomic():
+            # a replayed token waits here for the first complete, then gets
+            # its Video instead of another one for the same object
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [file_url])
+            existing = Video.objects.filter(file_url=file_url).first()
+            if existing is not None:
+                return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
+
+            try:
+                complete_multipart_upload(key, upload_id, etags)
+            except ClientError as e:
+                raise ValidationError({"upload_token": f"Could not complete upload: {e}"})
+            try:
+                serializer.save(file_url=file_url)
+            except Exception:
+                # don't leave the finished object behind without a Video
+                get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+                raise
+        invalidate("video")
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["get"], url_path="play", permission_classes=[IsAuthenticated],
+            authentication_classes=[JWTStatelessUserAuthentication])
     def play(self, request, pk=None):
         """
-        Return a presigned URL for this video that expires in 1 hour.
+        Return a presigned URL for this video's file and, once it has been
+        packaged for adaptive streaming, the URL of its HLS master playlist
+        (api/hls.py), which players should prefer. URLs are cached per object
+        key and reused while they have at least S3_PRESIGN_SAFETY_MARGIN
+        seconds of life left. Any valid token will do, so the user isn't
+        looked up.
         """
         try:
             video = self.get_object()
-            
-            # Extract the key from file_url
-            # Example: https://bucket.t3.storageapi.dev/media/videos/Programming/video.mp4
-            # We need: media/videos/Programming/video.mp4
-            url_parts = video.file_url.split('.dev/')
-            if len(url_parts) > 1:
-                file_key = url_parts[-1]
-            else:
-                # Fallback: assume file_url is just the key
-                file_key = video.file_url
-            
-            # Create S3 client
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                config=Config(signature_version='s3v4'),
-                region_name=settings.AWS_S3_REGION_NAME
-            )
-            
-            # Generate presigned URL (expires in 1 hour)
-            presigned_url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                    'Key': file_key
-                },
-                ExpiresIn=3600  # 1 hour
-            )
-            
-            return Response({'url': presigned_url})
-            
+            url, expires_at = presigned_get_url(object_key(video.file_url))
+            return Response({
+                'url': url,
+                'expires_in': int(expires_at - time.time()),
+                'manifest_url': manifest_url(request, video.pk, video.hls_manifest),
+            })
+
         except Exception as e:
             return Response(
                 {"detail": "Unable to get video URL", "error": str(e)},
                 status=500,
             )
 
-            
+    @action(detail=False, methods=["get"], url_path="play-batch", permission_classes=[IsAuthenticated],
+            authentication_classes=[JWTStatelessUserAuthentication])
+    def play_batch(self, request):
+        """
+        play for many videos at once (?ids=3,5,8): {"videos": {id: play URLs
+        and thumbnail_url}, "missing": [ids that don't exist]}. One query,
+        and the URLs are signed together (api/playback.py).
+        """
+        ids, error = playback.parse_ids(request.query_params.get("ids"))
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+        videos = list(self.get_queryset().filter(pk__in=ids))
+        return Response(playback.batch_response(request, ids, videos), status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"], url_path="search")
     def search(self, request):
+        """
+        Keyword search. ?mode=passages returns matching transcript passages
+        with their timestamps instead of whole videos.
+        """
         raw_q = (request.query_params.get("q") or "").strip()
         course_id = request.query_params.get("course_id")
         level = request.query_params.get("level")
+        mode = request.query_params.get("mode", "videos")
 
-        # Normalize: remove punctuation like ? ! , . etc
-        cleaned = re.sub(r"[^\w\s]", " ", raw_q)
-        tokens = [t for t in cleaned.split() if t]
-
-        qs = Video.objects.all()
+        if mode not in ("videos", "passages"):
+            return Response(
+                {"detail": "mode must be 'videos' or 'passages'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if course_id:
-            qs = qs.filter(course_id=course_id)
+        tokens = normalize_query(raw_q)
+        if mode == "passages":
+            passages, total = passage_search(tokens, course_id, level)
+            record_search(request.user.pk, raw_q)
+            return Response(
+                {
+                    "query": raw_q, "normalized_tokens": tokens, "mode": mode, "total": total,
+                    "results": TranscriptPassageSerializer(passages, many=True).data,
+                },
+                status=status.HTTP_200_OK,
+            )
 
-        if level:
-            qs = qs.filter(difficulty_level=level)
+        videos, total = cached_search(tokens, course_id, level)
 
-        if tokens:
-            # AND across tokens, OR across fields
-            token_q = Q()
-            for token in tokens:
-                token_q &= (
-                    Q(title__icontains=token) |
-                    Q(description__icontains=token) |
-                    Q(transcript__icontains=token) |
-                    Q(difficulty_level__icontains=token)
-                )
-            qs = qs.filter(token_q)
+        serializer = self.get_serializer(videos, many=True)
+        record_search(request.user.pk, raw_q)
+        return Response(
+            {"query": raw_q, "normalized_tokens": tokens, "total": total, "results": serializer.data},
+            status=status.HTTP_200_OK
+        )
 
-        qs = qs.order_by("-uploaded_at")
+    @action(detail=False, methods=["get"], url_path="suggest")
+    def suggest(self, request):
+        """Typeahead: ?prefix=pyth&limit=10, heaviest terms first."""
+        prefix = request.query_params.get("prefix") or ""
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 20))
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(qs[:50], many=True)
+        results = suggestions.suggest(prefix, limit)
         return Response(
-            {"query": raw_q, "normalized_tokens": tokens, "total": qs.count(), "results": serializer.data},
-            status=status.HTTP_200_OK
-        )
\ No newline at end of file
+            {"prefix": prefix, "suggestions": [{"term": term, "weight": weight} for term, weight in results]},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], url_path="trending")
+    def trending(self, request):
+        """
+        Most active videos lately, by likes, bookmarks, comments, ratings and
+        views with older activity counting exponentially less
+        (?course_id=, ?limit= up to 50).
+        """
+        limit = _limit_param(request)
+        if limit is None:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        course_id = request.query_params.get("course_id")
+        if course_id and not course_id.isdigit():
+            return Response({"detail": "course_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = trending.top(trending.video_board(course_id and int(course_id)), limit)
+        videos = search_queryset().in_bulk([video_id for video_id, _ in ranked])
+        ranked = [(videos[video_id], score) for video_id, score in ranked if video_id in videos]
+
+        results = self.get_serializer([video for video, _ in ranked], many=True).data
+        for item, (_, score) in zip(results, ranked):
+            item["trending_score"] = score
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="recommended")
+    def recommended(self, request):
+        """
+        Videos for the current user from the precomputed neighbours of what
+        they liked, bookmarked, rated or watched (?limit=, at most 50).
+        Popular videos fill in when their history isn't enough; those have
+        score null.
+        """
+        limit = _limit_param(request, default=10)
+        if limit is None:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        picks = recommend(request.user.pk, limit)
+        videos = search_queryset().in_bulk([video_id for video_id, _ in picks])
+        # skip any video deleted between the two queries
+        picks = [(videos[video_id], score) for video_id, score in picks if video_id in videos]
+
+        results = self.get_serializer([video for video, _ in picks], many=True).data
+        for item, (_, score) in zip(results, picks):
+            item["score"] = score
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="analytics",
+            permission_classes=[IsAuthenticated, CanViewAnalytics])
+    def analytics(self, request, pk=None):
+        """
+        Viewers, completion, watched percentage, drop-off points and rating
+        distribution, for the uploader and the course's instructor.
+        """
+        return Response(video_report(self.get_object()), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="search/cache-stats",
+            permission_classes=[permissions.IsAdminUser])
+    def search_cache_stats(self, request):
+        """Hit/miss counters of this worker's search result cache."""
+        return Response(search_results.stats())
+
+    @action(detail=False, methods=["get"], url_path="semantic-search")
+    def semantic(self, request):
+        """
+        Nearest-neighbour search over video embeddings.
+        ?mode=hybrid fuses the result with the keyword search ranking.
+        Either way a higher score is a better match: cosine similarity, or
+        the fused rank score in hybrid mode.
+        """
+        raw_q = (request.query_params.get("q") or "").strip()
+        course_id = request.query_params.get("course_id")
+        level = request.query_params.get("level")
+        mode = request.query_params.get("mode", "semantic")
+
+        try:
+            k = max(1, min(int(request.query_params.get("k", 20)), 100))
+        except ValueError:
+            return Response({"detail": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if mode not in ("semantic", "hybrid"):
+            return Response(
+                {"detail": "mode must be 'semantic' or 'hybrid'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not raw_q:
+            return Response({"query": raw_q, "mode": mode, "results": []}, status=status.HTTP_200_OK)
+
+        if mode == "hybrid":
+            hits = hybrid_search(raw_q, k, course_id, level)
+        else:
+            # cosine distance to similarity
+            hits = [(video, 1 - distance) for video, distance in semantic_search(raw_q, k, course_id, level)]
+
+        results = self.get_serializer([video for video, _ in hits], many=True).data
+        for item, (_, score) in zip(results, hits):
+            item["score"] = score
+        return Response({"query": raw_q, "mode": mode, "results": results}, status=status.HTTP_200_OK)
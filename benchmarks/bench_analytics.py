@@ -0,0 +1,129 @@
+# benchmarks/bench_analytics.py
+#
+# Instructor dashboard for one large course: GET /api/courses/{id}/analytics/
+# from the rollups (api/analytics.py) versus computing the same numbers from
+# video_progress and ratings on every request. Also times a full refresh_analytics
+# and an incremental one after a slice of the students made progress.
+#
+#   python -m benchmarks.bench_analytics --students 100000 --videos 20
+import argparse
+import time
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_users, seed_videos, setup_django,
+    summarize, timed,
+)
+
+# what the endpoint would have to run without rollups
+LIVE_SQL = ["""
+SELECT v.video_id, count(p.id), count(p.id) FILTER (WHERE p.completed),
+       avg(least(p.watched_seconds::float / nullif(v.duration, 0), 1)),
+       (SELECT array_agg(n ORDER BY rating) FROM (
+           SELECT rating, count(*) AS n FROM ratings r WHERE r.video_id = v.video_id GROUP BY rating
+       ) AS rated)
+FROM videos v LEFT JOIN video_progress p ON p.video_id = v.video_id
+WHERE v.course_id = %(course)s
+GROUP BY v.video_id
+""", """
+SELECT count(*), count(*) FILTER (WHERE done = %(videos)s) FROM (
+    SELECT p.user_id, count(*) FILTER (WHERE p.completed) AS done
+    FROM videos v JOIN video_progress p ON p.video_id = v.video_id
+    WHERE v.course_id = %(course)s
+    GROUP BY p.user_id
+) AS students
+"""]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--active", type=float, default=0.01, help="share of students active between refreshes")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from api import analytics
+    from api.models import Course, PortalUser, Video
+
+    course = seed_courses(1)[0]
+    seed_videos(args.videos, transcript_words=20)
+    video_ids = list(
+        Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).values_list("pk", flat=True)[:args.videos]
+    )
+    Video.objects.filter(pk__in=video_ids).update(course=course, duration=600)
+    users = seed_users(args.students)
+    PortalUser.objects.filter(pk=users[0].pk).update(is_staff=True)
+    users[0].refresh_from_db()
+    user_ids = [user.pk for user in users]
+
+    with connection.cursor() as cursor:
+        # most students start most videos, stopping anywhere
+        cursor.execute(
+            """
+            INSERT INTO video_progress (user_id, video_id, watched_seconds, completed, updated_at)
+            SELECT u, v, s, s >= 570, now() - interval '1 day'
+            FROM unnest(%s::int[]) AS u, unnest(%s::int[]) AS v,
+                 LATERAL (SELECT (random() * 600)::int AS s) AS w
+            WHERE random() < 0.8
+            ON CONFLICT DO NOTHING
+            """,
+            [user_ids, video_ids],
+        )
+        progress_rows = cursor.rowcount
+        cursor.execute(
+            """
+            INSERT INTO ratings (user_id, video_id, rating, created_at)
+            SELECT u, v, 1 + (random() * 4)::int, now() - interval '1 day'
+            FROM unnest(%s::int[]) AS u, unnest(%s::int[]) AS v
+            WHERE random() < 0.2
+            ON CONFLICT DO NOTHING
+            """,
+            [user_ids, video_ids],
+        )
+        cursor.execute("ANALYZE video_progress; ANALYZE ratings")
+    print(f"{args.students} students, {args.videos} videos, {progress_rows} progress rows")
+
+    try:
+        def live():
+            with connection.cursor() as cursor:
+                for sql in LIVE_SQL:
+                    cursor.execute(sql, {"course": course.pk, "videos": len(video_ids)})
+                    cursor.fetchall()
+
+        print(summarize("aggregate per request", timed(live, 5)))
+
+        started = time.perf_counter()
+        result = analytics.refresh(full=True)
+        print(f"full refresh                {time.perf_counter() - started:8.2f}s  {result}")
+
+        client = APIClient()
+        client.force_authenticate(users[0])
+        url = f"/api/courses/{course.pk}/analytics/"
+        assert client.get(url).status_code == 200
+        print(summarize("GET analytics (rollups)", timed(lambda: client.get(url), args.requests)))
+
+        active = user_ids[:int(len(user_ids) * args.active)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE video_progress SET watched_seconds = 600, completed = true, updated_at = now() "
+                "WHERE user_id = ANY(%s)",
+                [active],
+            )
+        started = time.perf_counter()
+        result = analytics.refresh()
+        print(f"incremental refresh         {time.perf_counter() - started:8.2f}s  {result}")
+    finally:
+        if not args.keep:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM video_progress WHERE video_id = ANY(%s)", [video_ids])
+                cursor.execute("DELETE FROM ratings WHERE video_id = ANY(%s)", [video_ids])
+            delete_bench_data()
+            Course.objects.filter(pk=course.pk).delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_analytics_export.py
+#
+# Pulling a whole interaction table the old way, page by page through the
+# DRF list endpoint (GET /api/comments/?page_size=200 and its next links),
+# versus one streamed GET /api/exports/comments/ in NDJSON, CSV and Parquet.
+# Reports rows/s, bytes and the peak Python memory of each.
+#
+#   python -m benchmarks.bench_analytics_export --users 2000 --per-user 100
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_interactions, seed_users, seed_videos,
+    setup_django,
+)
+
+
+def measure(label, rows, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {rows:>8} rows {elapsed:7.2f}s {rows / elapsed:9.0f} rows/s "
+          f"{size / 1e6:7.1f} MB out, peak {peak / 1e6:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--per-user", type=int, default=100)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from api.models import Comment, PortalUser, Video
+
+    seed_courses(20)
+    seed_videos(args.videos, transcript_words=20)
+    videos = list(Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX))
+    users = seed_users(args.users)
+    seed_interactions(users, videos, args.per_user)
+    PortalUser.objects.filter(pk=users[0].pk).update(is_staff=True)
+    users[0].refresh_from_db()
+    client = APIClient()
+    client.force_authenticate(users[0])
+    total = Comment.objects.count()
+
+    def paged():
+        size, url = 0, "/api/comments/?page_size=200"
+        while url:
+            response = client.get(url)
+            size += len(response.content)
+            url = response.data["next"]
+        return size
+
+    def streamed(fmt):
+        response = client.get(f"/api/exports/comments/?format={fmt}")
+        assert response.status_code == 200, response.status_code
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    try:
+        measure("list endpoint, paged", total, paged)
+        # rows seeded just now are inside the default lag
+        with override_settings(ANALYTICS_EXPORT_LAG=0):
+            for fmt in ("ndjson", "csv", "parquet"):
+                measure(f"export {fmt}", total, lambda: streamed(fmt))
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# benchmarks/bench_asgi.py
+#
+# Concurrent load against a real server process, WSGI (sync gunicorn
+# workers, the DRF views) versus ASGI (uvicorn workers with ASYNC_API on, the
+# views in api/async_views.py), with the same number of worker processes.
+# For each endpoint and concurrency level it reports requests/s, latency
+# percentiles and the server's memory (RSS of all its processes) under load,
+# per open connection above idle.
+#
+# Against a local database these endpoints are CPU-bound and async only adds
+# overhead; --db-rtt puts the server behind a proxy that delays every packet
+# to and from Postgres, like a managed database a network hop away.
+#
+#   python -m benchmarks.bench_asgi --workers 2 --concurrency 1 16 64 --duration 10 --db-rtt 2
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+import psutil
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, WORDS, delete_bench_data, percentile, seed_users, seed_videos, setup_django,
+)
+
+ENDPOINTS = ("play", "search", "heartbeat")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_latency_proxy(port, db, delay, ready):
+    """Forward 127.0.0.1:port to the database, each chunk `delay` seconds late."""
+
+    async def pipe(reader, writer):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                await asyncio.sleep(due - loop.time())
+                if not data:
+                    writer.close()
+                    return
+                writer.write(data)
+                await writer.drain()
+
+        delivery = asyncio.create_task(deliver())
+        while data := await reader.read(65536):
+            queue.put_nowait((loop.time() + delay, data))
+        queue.put_nowait((loop.time() + delay, b""))
+        await delivery
+
+    async def handle(client_reader, client_writer):
+        host, db_port = db["HOST"] or "localhost", db["PORT"] or 5432
+        if host.startswith("/"):
+            db_reader, db_writer = await asyncio.open_unix_connection(f"{host}/.s.PGSQL.{db_port}")
+        else:
+            db_reader, db_writer = await asyncio.open_connection(host, db_port)
+        await asyncio.gather(pipe(client_reader, db_writer), pipe(db_reader, client_writer), return_exceptions=True)
+
+    async def serve():
+        async with await asyncio.start_server(handle, "127.0.0.1", port):
+            ready.set()
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+def start_server(mode, workers, port, database_url):
+    env = dict(os.environ, ASYNC_API="True" if mode == "asgi" else "False", WEB_CONCURRENCY=str(workers))
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server didn't start")
+
+
+def server_rss(server):
+    process = psutil.Process(server.pid)
+    return sum(p.memory_info().rss for p in [process, *process.children(recursive=True)])
+
+
+def make_request(endpoint, token, video_ids, rng):
+    headers = f"Host: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n"
+    if endpoint == "play":
+        return f"GET /api/videos/{rng.choice(video_ids)}/play/ HTTP/1.1\r\n{headers}\r\n".encode()
+    if endpoint == "search":
+        return f"GET /api/videos/search/?q={rng.choice(WORDS)} HTTP/1.1\r\n{headers}\r\n".encode()
+    body = f'{{"video": {rng.choice(video_ids)}, "watched_seconds": {rng.randint(0, 600)}}}'
+    return (
+        f"POST /api/progress/heartbeat/ HTTP/1.1\r\n{headers}Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n{body}"
+    ).encode()
+
+
+async def read_response(reader):
+    """The status code, and whether the server keeps the connection open."""
+    status_line = await reader.readline()
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"connection":
+            keep_alive = value.strip().lower() != b"close"
+    if length:
+        await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def client(port, endpoint, token, video_ids, until, latencies, errors, seed):
+    # keep-alive where the server allows it (sync gunicorn workers close
+    # every connection, which is part of their cost)
+    rng = random.Random(seed)
+    writer = None
+    try:
+        while time.perf_counter() < until:
+            started = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(make_request(endpoint, token, video_ids, rng))
+            status_code, keep_alive = await read_response(reader)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status_code >= 300:
+                errors.append(status_code)
+            if not keep_alive:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def load(port, endpoint, token, video_ids, concurrency, duration, server):
+    latencies, errors = [], []
+    until = time.perf_counter() + duration
+    tasks = [
+        asyncio.create_task(client(port, endpoint, token, video_ids, until, latencies, errors, i))
+        for i in range(concurrency)
+    ]
+    # sample memory halfway through, with every connection open
+    await asyncio.sleep(duration / 2)
+    rss = server_rss(server)
+    await asyncio.gather(*tasks)
+    return latencies, errors, rss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--db-rtt", type=float, default=0.0, help="ms added to each database round trip")
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework_simplejwt.tokens import AccessToken
+    from api.models import Video
+
+    seed_videos(args.videos, transcript_words=100)
+    video_ids = list(Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).values_list("pk", flat=True))
+    token = str(AccessToken.for_user(seed_users(1)[0]))
+
+    database_url, proxy = None, None
+    if args.db_rtt:
+        from django.conf import settings
+        db = settings.DATABASES["default"]
+        proxy_port, ready = free_port(), multiprocessing.Event()
+        proxy = multiprocessing.Process(
+            target=run_latency_proxy, args=(proxy_port, db, args.db_rtt / 2000, ready), daemon=True
+        )
+        proxy.start()
+        ready.wait(10)
+        database_url = (
+            f"postgres://{quote(db['USER'])}:{quote(str(db['PASSWORD'] or ''))}@127.0.0.1:{proxy_port}/{db['NAME']}"
+        )
+        print(f"database behind a proxy adding {args.db_rtt}ms per round trip")
+
+    try:
+        for mode in ("wsgi", "asgi"):
+            port = free_port()
+            server = start_server(mode, args.workers, port, database_url)
+            try:
+                # warm up every worker (imports, connections, caches)
+                asyncio.run(load(port, "play", token, video_ids, args.workers * 4, 2, server))
+                idle = server_rss(server)
+                print(f"{mode}: {args.workers} workers, {idle / 1e6:.0f} MB idle")
+                for endpoint in args.endpoints:
+                    for concurrency in args.concurrency:
+                        latencies, errors, rss = asyncio.run(
+                            load(port, endpoint, token, video_ids, concurrency, args.duration, server)
+                        )
+                        print(
+                            f"  {endpoint:<10} c={concurrency:<4} {len(latencies) / args.duration:8.0f} req/s"
+                            f"  p50={percentile(latencies, 50):7.1f}ms p99={percentile(latencies, 99):7.1f}ms"
+                            f"  {rss / 1e6:6.0f} MB ({(rss - idle) / concurrency / 1e3:6.0f} kB/conn)"
+                            + (f"  {len(errors)} errors, e.g. {errors[0]}" if errors else "")
+                        )
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+    finally:
+        if proxy is not None:
+            proxy.terminate()
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_auth.py
+#
+# Per-request cost of authenticating a Bearer token: simplejwt's
+# JWTAuthentication (a users query every time) versus CachedJWTAuthentication
+# (the user from the cache) and JWTStatelessUserAuthentication (no user, just
+# the token's claims), on a cached course detail, play and a progress
+# heartbeat. Real tokens go through the full view; reports queries and latency.
+#
+#   python -m benchmarks.bench_auth --requests 500
+import argparse
+import json
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_users, seed_videos, setup_django, summarize,
+    timed,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+    from api.authentication import CachedJWTAuthentication
+    from api.models import Video
+    from api.views import CourseViewSet, VideoProgressViewSet, VideoViewSet
+
+    course = seed_courses(1)[0]
+    seed_videos(10, transcript_words=20)
+    video = Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).first()
+    token = str(AccessToken.for_user(seed_users(1)[0]))
+    factory = APIRequestFactory()
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    endpoints = [
+        ("course detail", CourseViewSet, {"get": "retrieve"},
+         lambda: factory.get(f"/api/courses/{course.pk}/", **auth), {"pk": course.pk}),
+        ("play", VideoViewSet, {"get": "play"},
+         lambda: factory.get(f"/api/videos/{video.pk}/play/", **auth), {"pk": video.pk}),
+        ("heartbeat", VideoProgressViewSet, {"post": "heartbeat"},
+         lambda: factory.post("/api/progress/heartbeat/", json.dumps({"video": video.pk, "watched_seconds": 30}),
+                              content_type="application/json", **auth), {}),
+    ]
+    backends = [JWTAuthentication, CachedJWTAuthentication, JWTStatelessUserAuthentication]
+
+    try:
+        for name, viewset, actions, make_request, kwargs in endpoints:
+            for backend in backends:
+                view = viewset.as_view(actions, authentication_classes=[backend])
+                response = view(make_request(), **kwargs)  # warm
+                assert response.status_code < 300, (name, backend.__name__, response.status_code)
+                with CaptureQueriesContext(connection) as ctx:
+                    view(make_request(), **kwargs)
+                queries = len(ctx.captured_queries)
+                samples = timed(lambda: view(make_request(), **kwargs), args.requests)
+                print(summarize(f"{name}: {backend.__name__[:14]}", samples), f"queries={queries}")
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
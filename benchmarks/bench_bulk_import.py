@@ -0,0 +1,129 @@
+# benchmarks/bench_bulk_import.py
+#
+# Catalog import/export throughput (api/bulk.py):
+#
+#   one by one   a serializer and a transaction per video, as with one POST
+#                per video today (minus the HTTP and upload parts)
+#   bulk         import_records() over the same records as NDJSON and CSV,
+#                and through POST /api/videos/import/
+#   export       GET /api/videos/export/ as NDJSON and CSV, with the peak
+#                Python memory while streaming
+#
+#   python -m benchmarks.bench_bulk_import --rows 20000 --single-rows 1000
+import argparse
+import csv
+import io
+import json
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, WORDS, delete_bench_data, seed_courses, seed_users, setup_django,
+    synthetic_text,
+)
+
+
+def make_records(n, course_ids, seed=42, offset=0):
+    rng = random.Random(seed + offset)
+    return [
+        {
+            "title": synthetic_text(rng, 6).title(),
+            "description": synthetic_text(rng, 40),
+            "file_url": f"{BENCH_URL_PREFIX}import-{offset + i}.mp4",
+            "course": rng.choice(course_ids),
+            "duration": rng.randint(60, 7200),
+            "difficulty_level": rng.choice(["basic", "intermediate", "advanced"]),
+            "tags": rng.sample(WORDS, 3),
+            "transcript": synthetic_text(rng, 200),
+        }
+        for i in range(n)
+    ]
+
+
+def as_ndjson(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+def as_csv(records):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(records[0]))
+    writer.writeheader()
+    for record in records:
+        writer.writerow(dict(record, tags=json.dumps(record["tags"])))
+    return out.getvalue().encode()
+
+
+def report(label, rows, elapsed, extra=""):
+    print(f"{label:<28} {rows:>7} rows {elapsed:8.2f}s {rows / elapsed:10.0f} rows/s {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single-rows", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--keep", action="store_true", help="don't delete imported rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import transaction
+    from rest_framework.test import APIClient
+    from api.bulk import import_records
+    from api.models import PortalUser, Video
+    from api.serializers import VideoImportSerializer
+    from api.streaming import CSV, NDJSON, read_records
+
+    course_ids = [course.pk for course in seed_courses(args.courses)]
+    user = seed_users(1)[0]
+    PortalUser.objects.filter(pk=user.pk).update(is_staff=True)
+    user.refresh_from_db()
+
+    try:
+        records = make_records(args.single_rows, course_ids, offset=0)
+        started = time.perf_counter()
+        for record in records:
+            with transaction.atomic():
+                serializer = VideoImportSerializer(data=record)
+                serializer.is_valid(raise_exception=True)
+                Video.objects.create(uploaded_by=user, **serializer.validated_data)
+        report("one by one", len(records), time.perf_counter() - started)
+
+        offset = args.single_rows
+        for label, encode, fmt in [("bulk ndjson", as_ndjson, NDJSON), ("bulk csv", as_csv, CSV)]:
+            payload = encode(make_records(args.rows, course_ids, offset=offset))
+            offset += args.rows
+            started = time.perf_counter()
+            result = import_records(
+                "videos", read_records(io.BytesIO(payload), fmt), user=user, batch_size=args.batch_size,
+            )
+            assert not result.failed, result.errors[:3]
+            report(label, result.created["videos"], time.perf_counter() - started)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = as_ndjson(make_records(args.rows, course_ids, offset=offset))
+        started = time.perf_counter()
+        response = client.generic("POST", "/api/videos/import/", payload, content_type="application/x-ndjson")
+        assert response.status_code == 200, response.content[:500]
+        report("POST videos/import/", response.data["created"]["videos"], time.perf_counter() - started)
+
+        total = Video.objects.count()
+        for fmt in (NDJSON, CSV):
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(f"/api/videos/export/?format={fmt}")
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report(f"GET videos/export/ {fmt}", total, elapsed,
+                   f"{size / 1e6:.1f} MB out, peak {peak / 1e6:.1f} MB")
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
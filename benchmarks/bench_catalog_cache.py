@@ -0,0 +1,68 @@
+# benchmarks/bench_catalog_cache.py
+#
+# Catalog read latency and query counts with the response cache off, on a
+# cache hit, and on an If-None-Match revalidation (304). Uses whatever CACHES
+# is configured, so set REDIS_URL to measure the Redis backend.
+#
+#   python -m benchmarks.bench_catalog_cache --videos 2000 --requests 300
+import argparse
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_videos, setup_django, summarize, timed,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from api.models import Video
+    from benchmarks.common import seed_users
+
+    seed_courses(args.courses)
+    seed_videos(args.videos)
+    video = Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).first()
+    user = seed_users(1)[0]
+    client = APIClient()
+    client.force_authenticate(user)
+
+    endpoints = [
+        ("video list", "/api/videos/?page_size=50"),
+        ("video detail", f"/api/videos/{video.pk}/"),
+        ("course list", "/api/courses/?page_size=50"),
+    ]
+    timeout = settings.CATALOG_CACHE_TIMEOUT or 60
+    print(f"cache backend: {settings.CACHES['default']['BACKEND']}")
+    try:
+        for name, url in endpoints:
+            cache.clear()
+            etag = client.get(url)["ETag"]
+            for label, cache_timeout, headers in [
+                ("no cache", 0, {}),
+                ("cache hit", timeout, {}),
+                ("304 revalidate", timeout, {"HTTP_IF_NONE_MATCH": etag}),
+            ]:
+                settings.CATALOG_CACHE_TIMEOUT = cache_timeout
+                client.get(url, **headers)  # warm
+                with CaptureQueriesContext(connection) as ctx:
+                    client.get(url, **headers)
+                queries = len(ctx.captured_queries)
+                samples = timed(lambda: client.get(url, **headers), args.requests)
+                print(summarize(f"{name}: {label}", samples), f"queries={queries}")
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
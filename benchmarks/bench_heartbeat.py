@@ -0,0 +1,118 @@
+# benchmarks/bench_heartbeat.py
+#
+# Load test for progress heartbeats: `--viewers` concurrent viewers each send
+# a heartbeat every `--interval` seconds for `--minutes` of (simulated)
+# playback. The same heartbeat stream is written once with an upsert per
+# heartbeat and once through the coalescing buffer, and the number of
+# statements, rows written and wall time are compared.
+#
+#   python -m benchmarks.bench_heartbeat --viewers 2000 --minutes 2
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import delete_bench_data, seed_users, seed_videos, setup_django
+
+
+def heartbeat_windows(users, videos, minutes, interval, flush_window, seed):
+    """
+    Return one list of (user_id, video_id, seconds) per flush window. Each
+    viewer watches one random video from a random position, starting at a
+    random offset inside the first heartbeat interval.
+    """
+    rng = random.Random(seed)
+    duration = minutes * 60
+    windows = [[] for _ in range(int(-(-duration // flush_window)))]
+    for user in users:
+        video = rng.choice(videos)
+        position = rng.randint(0, (video.duration or 600) // 2)
+        beat = rng.uniform(0, interval)
+        while beat < duration:
+            windows[int(beat // flush_window)].append((user.pk, video.pk, position + int(beat)))
+            beat += interval
+    for window in windows:
+        rng.shuffle(window)
+    return windows
+
+
+def run(windows, threads, send, flush):
+    from django.db import connection
+
+    def worker(chunk):
+        for heartbeat in chunk:
+            send(heartbeat)
+        connection.close()
+
+    heartbeats = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for window in windows:
+            heartbeats += len(window)
+            list(pool.map(worker, [window[i::threads] for i in range(threads)]))
+            flush()
+    elapsed = time.perf_counter() - start
+    return heartbeats, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, default=2000)
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--minutes", type=float, default=2)
+    parser.add_argument("--interval", type=float, default=5, help="seconds between heartbeats")
+    parser.add_argument("--flush-window", type=float, default=10, help="PROGRESS_FLUSH_INTERVAL")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from api.models import Video, VideoProgress
+    from api.progress import WRITE_BATCH_SIZE, progress_heartbeats, write_progress
+
+    users = seed_users(args.viewers)
+    seed_videos(args.videos, transcript_words=20)
+    videos = list(Video.objects.filter(file_url__startswith="bench://").only("video_id", "duration")[:args.videos])
+
+    # the background flusher stays out of the way; windows are flushed by hand
+    settings.PROGRESS_FLUSH_INTERVAL = 3600
+    settings.PROGRESS_FLUSH_SIZE = 10 ** 9
+
+    statements = {"n": 0}
+    lock = threading.Lock()
+
+    def direct(heartbeat):
+        write_progress([heartbeat])
+        with lock:
+            statements["n"] += 1
+
+    def coalesced_flush():
+        # one statement per WRITE_BATCH_SIZE pending pairs
+        statements["n"] += -(-progress_heartbeats.pending_count() // WRITE_BATCH_SIZE)
+        progress_heartbeats.flush()
+
+    try:
+        for label, send, flush in [
+            ("upsert per heartbeat", direct, lambda: None),
+            ("coalesced buffer", lambda hb: progress_heartbeats.add(hb), coalesced_flush),
+        ]:
+            VideoProgress.objects.filter(user__in=users).delete()
+            statements["n"] = 0
+            windows = heartbeat_windows(users, videos, args.minutes, args.interval, args.flush_window, seed=1)
+            heartbeats, elapsed = run(windows, args.threads, send, flush)
+            rows = VideoProgress.objects.filter(user__in=users).count()
+            print(
+                f"{label:<22} heartbeats={heartbeats:<7} write statements={statements['n']:<7} "
+                f"writes/min={statements['n'] / args.minutes:9.0f} "
+                f"wall={elapsed:6.2f}s progress rows={rows}"
+            )
+    finally:
+        VideoProgress.objects.filter(user__in=users).delete()
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_hls.py
+#
+# HLS packaging and delivery (api/hls.py), against the bucket in settings
+# (a MinIO, or any S3 stand-in, for local runs):
+#
+#   packaging  with --source (a local video file) and ffmpeg/ffprobe on PATH:
+#              uploads it, packages it like the package_hls job and reports
+#              the encode speed (seconds of video per second) and, per
+#              rendition, what a player downloads before it can start (the
+#              first segment) next to the whole original, which is what
+#              `play`'s plain URL makes it fetch
+#   playlists  a synthetic --segments long rendition: latency of the
+#              rendition playlist when it has to be presigned (cold) and
+#              when it's the shared cached copy (warm), and of the master
+#              playlist, through the real view
+#
+#   python -m benchmarks.bench_hls --source lecture.mp4 --segments 1200
+import argparse
+import os
+import shutil
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import setup_django, summarize, timed
+
+PREFIX = "bench/hls/"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="video file to package (needs ffmpeg and ffprobe)")
+    parser.add_argument("--segments", type=int, default=1200, help="segments of the synthetic rendition")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+    from api import hls
+    from api.processing import probe_duration
+    from api.storage import ensure_bucket, get_s3_client, public_url
+
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    client = get_s3_client()
+    ensure_bucket(bucket)
+    created = []
+
+    try:
+        if args.source:
+            ffmpeg, ffprobe = shutil.which(settings.FFMPEG_BINARY), shutil.which(settings.FFPROBE_BINARY)
+            if not (ffmpeg and ffprobe):
+                parser.error("--source needs ffmpeg and ffprobe on PATH")
+            key = PREFIX + "source" + os.path.splitext(args.source)[1]
+            client.upload_file(args.source, bucket, key)
+            created.append(key)
+            started = time.perf_counter()
+            manifest = hls.package(ffmpeg, ffprobe, public_url(key))
+            elapsed = time.perf_counter() - started
+            listing = client.list_objects_v2(Bucket=bucket, Prefix=manifest.rsplit("/", 1)[0] + "/")["Contents"]
+            created += [obj["Key"] for obj in listing]
+
+            duration = probe_duration(ffprobe, args.source)
+            print(f"packaged {duration:.0f}s of video in {elapsed:.1f}s ({duration / elapsed:.2f}x realtime) "
+                  f"on {os.cpu_count()} cores")
+            original = os.path.getsize(args.source)
+            first = sorted(
+                (obj["Key"].rsplit("/", 2)[-2], obj["Size"]) for obj in listing if obj["Key"].endswith("seg_00000.ts")
+            )
+            for rendition, size in first:
+                print(f"  {rendition:>6}: first segment {size / 1e6:6.2f} MB   original file {original / 1e6:7.2f} MB")
+
+        # a synthetic rendition: playlist cost doesn't depend on the media
+        segment = settings.HLS_SEGMENT_SECONDS
+        lines = ["#EXTM3U", "#EXT-X-VERSION:6", f"#EXT-X-TARGETDURATION:{segment}", "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for n in range(args.segments):
+            lines += [f"#EXTINF:{segment}.000000,", f"seg_{n:05d}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        synthetic = PREFIX + "synthetic/hls/"
+        client.put_object(Bucket=bucket, Key=synthetic + "720p/index.m3u8", Body="\n".join(lines).encode())
+        client.put_object(
+            Bucket=bucket, Key=synthetic + hls.MASTER_PLAYLIST,
+            Body=b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=3000000,RESOLUTION=1280x720\n720p/index.m3u8\n",
+        )
+        created += [synthetic + "720p/index.m3u8", synthetic + hls.MASTER_PLAYLIST]
+
+        token = urlencode({"token": hls.make_token(1, synthetic + hls.MASTER_PLAYLIST)})
+        browser = Client()
+
+        def get(name):
+            response = browser.get(f"/api/videos/1/hls/{name}?{token}")
+            assert response.status_code == 200, response.status_code
+
+        def cold():
+            cache.delete(hls._cache_key(synthetic, "720p/index.m3u8"))
+            get("720p/index.m3u8")
+
+        print(f"rendition playlist, {args.segments} segments ({args.segments * segment / 3600:.1f}h of video):")
+        print("  " + summarize("cold (presign every segment)", timed(cold, max(3, args.repeat // 10))))
+        print("  " + summarize("warm (shared cached copy)", timed(lambda: get("720p/index.m3u8"), args.repeat)))
+        print("  " + summarize("master playlist", timed(lambda: get(hls.MASTER_PLAYLIST), args.repeat)))
+    finally:
+        for key in created:
+            client.delete_object(Bucket=bucket, Key=key)
+        cache.delete_many([
+            hls._cache_key(PREFIX + "synthetic/hls/", name) for name in ("720p/index.m3u8", hls.MASTER_PLAYLIST)
+        ])
+
+
+if __name__ == "__main__":
+    main()
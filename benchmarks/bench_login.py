@@ -0,0 +1,119 @@
+# benchmarks/bench_login.py
+#
+# Login storm: --concurrency threads POST /api/token/ for every seeded user at
+# once, while another thread keeps reading a course to show what the storm
+# does to everything else. Three rounds:
+#
+#   pbkdf2          Django's default hashers, PBKDF2 hashes (before)
+#   pbkdf2->argon2  PASSWORD_HASHERS from settings, first login of PBKDF2
+#                   users: verify, rehash to Argon2, save
+#   argon2          the same users logging in again
+#
+# A 503 (hashing pool busy) is retried after its Retry-After, like a client
+# would. Reports logins/s, CPU seconds per login (so logins/s per core),
+# login latency including retries, and the 503s. The process's CPU time
+# includes the hashing pool's threads, and the reader's.
+#
+#   python -m benchmarks.bench_login --users 60 --concurrency 8
+import argparse
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import delete_bench_data, percentile, seed_courses, seed_users, setup_django
+
+PASSWORD = "correct horse battery staple"
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import global_settings
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from api.models import PortalUser
+
+    users = seed_users(args.users + 1)
+    reader, users = users[0], users[1:]
+    course = seed_courses(1)[0]
+    token = str(AccessToken.for_user(reader))
+
+    def reset_to_pbkdf2():
+        encoded = PBKDF2PasswordHasher().encode(PASSWORD, "benchsalt")
+        PortalUser.objects.filter(pk__in=[user.pk for user in users]).update(password=encoded)
+
+    def login(email):
+        client = APIClient()
+        started, busy = time.perf_counter(), 0
+        while True:
+            response = client.post("/api/token/", {"email": email, "password": PASSWORD}, format="json")
+            if response.status_code != 503:
+                break
+            busy += 1
+            time.sleep(int(response["Retry-After"]))
+        elapsed = (time.perf_counter() - started) * 1000
+        connection.close()
+        return response.status_code, elapsed, busy
+
+    def storm(label):
+        probe_latencies, done = [], threading.Event()
+
+        def probe():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            while not done.is_set():
+                started = time.perf_counter()
+                client.get(f"/api/courses/{course.pk}/")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+            connection.close()
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        cpu, started = cpu_seconds(), time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(login, [user.email for user in users]))
+        wall, cpu = time.perf_counter() - started, cpu_seconds() - cpu
+        done.set()
+        prober.join()
+
+        failed = sorted({code for code, _, _ in results} - {200})
+        latencies = [ms for code, ms, _ in results if code == 200]
+        ok = len(latencies)
+        print(
+            f"{label:<15} {ok}/{len(results)} ok  {ok / wall:5.1f} logins/s  "
+            f"{cpu / ok * 1000:5.0f}ms CPU/login ({ok / cpu:5.1f}/s per core)  "
+            f"login p50={percentile(latencies, 50):6.0f}ms p99={percentile(latencies, 99):6.0f}ms  "
+            f"{sum(busy for _, _, busy in results)} x 503  "
+            f"course read p50={percentile(probe_latencies, 50):5.1f}ms p99={percentile(probe_latencies, 99):5.1f}ms"
+            + (f"  failed: {failed}" if failed else "")
+        )
+
+    try:
+        reset_to_pbkdf2()
+        with override_settings(PASSWORD_HASHERS=global_settings.PASSWORD_HASHERS):
+            storm("pbkdf2")
+        storm("pbkdf2->argon2")
+        upgraded = PortalUser.objects.filter(pk__in=[user.pk for user in users], password__startswith="argon2$")
+        print(f"{upgraded.count()}/{len(users)} hashes upgraded to argon2")
+        storm("argon2")
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_pagination.py
+#
+# Page latency deep into a large table: keyset cursor pagination (the API
+# default) vs LIMIT/OFFSET. Seeds search_logs with generate_series.
+#
+#   python -m benchmarks.bench_pagination --rows 1000000
+import argparse
+
+from benchmarks.common import setup_django, summarize, timed
+
+SEED_PREFIX = "bench:"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--depths", default="0,1000,10000,100000,500000,900000")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from rest_framework.pagination import Cursor
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from api.models import SearchLog
+    from api.pagination import KeysetCursorPagination
+    from api.views import SearchLogViewSet
+
+    qs = SearchLog.objects.filter(query__startswith=SEED_PREFIX)
+    existing = qs.count()
+    if existing < args.rows:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO search_logs (query, searched_at) "
+                "SELECT %s || g, now() - g * interval '1 second' "
+                "FROM generate_series(%s, %s) AS g",
+                [SEED_PREFIX, existing + 1, args.rows],
+            )
+            cursor.execute("ANALYZE search_logs")
+
+    factory = APIRequestFactory()
+    view = SearchLogViewSet()
+    ordering = view.pagination_ordering
+
+    try:
+        for depth in [int(d) for d in args.depths.split(",")]:
+            if depth >= args.rows:
+                continue
+            # the row just before the page, as a client following `next` links would hold it
+            paginator = KeysetCursorPagination()
+            paginator.page_size = args.page_size
+            paginator.ordering = ordering
+            if depth:
+                anchor = qs.order_by(*ordering)[depth - 1]
+                position = paginator._get_position_from_instance(anchor, ordering)
+                paginator.base_url = "http://testserver/api/searchlogs/"
+                cursor_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+            else:
+                cursor_url = "/api/searchlogs/"
+            request = Request(factory.get(cursor_url, {"page_size": args.page_size}))
+
+            def keyset_page():
+                KeysetCursorPagination().paginate_queryset(qs, request, view)
+
+            def offset_page():
+                list(qs.order_by(*ordering)[depth:depth + args.page_size])
+
+            print(f"--- depth {depth}")
+            print(summarize("keyset cursor", timed(keyset_page, args.repeat)))
+            print(summarize("LIMIT/OFFSET", timed(offset_page, args.repeat)))
+    finally:
+        if not args.keep:
+            print(f"removed {qs.delete()[0]} benchmark rows")
+
+
+if __name__ == "__main__":
+    main()
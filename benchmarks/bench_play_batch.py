@@ -0,0 +1,74 @@
+# benchmarks/bench_play_batch.py
+#
+# A course page with --videos videos: one GET /api/videos/{id}/play/ per
+# video versus one GET /api/videos/play-batch/?ids=... and one
+# GET /api/courses/{id}/play-urls/ (api/playback.py), through the full
+# request path (middleware, JWT, view). Both with an empty presigned URL
+# cache (cold: every URL is signed) and a full one (warm). Reports the time
+# for the whole page and the queries it takes. Signing is local; nothing is
+# sent to the bucket.
+#
+#   python -m benchmarks.bench_play_batch --videos 40 --repeat 30
+import argparse
+
+from benchmarks.common import BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_users, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from api import storage
+    from api.models import Video
+    from api.storage import public_url
+
+    course = seed_courses(1)[0]
+    videos = Video.objects.bulk_create([
+        Video(
+            title=f"Lecture {n}", course=course, file_url=f"{BENCH_URL_PREFIX}page/{n}.mp4",
+            thumbnail_url=public_url(f"media/thumbnails/bench-{n}.jpg"),
+        )
+        for n in range(args.videos)
+    ])
+    ids = ",".join(str(video.pk) for video in videos)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(seed_users(1)[0])}")
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+
+    pages = [
+        ("one play per video", lambda: [get(f"/api/videos/{video.pk}/play/") for video in videos]),
+        ("play-batch", lambda: get(f"/api/videos/play-batch/?ids={ids}")),
+        ("course play-urls", lambda: get(f"/api/courses/{course.pk}/play-urls/")),
+    ]
+    try:
+        print(f"a page of {args.videos} videos:")
+        for label, page in pages:
+            with CaptureQueriesContext(connection) as queries:
+                page()
+
+            def cold():
+                storage.presigned_urls.clear()
+                page()
+
+            print(f"  {label} ({len(queries)} queries)")
+            print("    " + summarize("cold URL cache", timed(cold, args.repeat)))
+            print("    " + summarize("warm URL cache", timed(page, args.repeat)))
+    finally:
+        if not args.keep:
+            Video.objects.filter(pk__in=[video.pk for video in videos]).delete()
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
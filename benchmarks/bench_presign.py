@@ -0,0 +1,88 @@
+# benchmarks/bench_presign.py
+#
+# Per-request cost of producing a play URL: a new boto3 client per request
+# (the old VideoViewSet.play) vs the shared client, with and without the
+# presigned URL cache. A tiny local HTTP server stands in for the S3
+# endpoint so nothing leaves the machine.
+#
+#   python -m benchmarks.bench_presign --requests 2000 --videos 200
+import argparse
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.common import setup_django, summarize, timed
+
+
+class StandInS3(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+
+    do_HEAD = do_PUT = do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--videos", type=int, default=200, help="distinct object keys")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInS3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["AWS_S3_ENDPOINT_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench-secret")
+    os.environ.setdefault("AWS_STORAGE_BUCKET_NAME", "bench-bucket")
+    setup_django()
+
+    import boto3
+    from botocore.config import Config
+    from django.conf import settings
+    from api import storage
+
+    rng = random.Random(3)
+    keys = [f"media/videos/{i}.mp4" for i in range(args.videos)]
+    requests = [rng.choice(keys) for _ in range(args.requests)]
+
+    def per_request_client(key):
+        client = boto3.client(
+            "s3",
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            config=Config(signature_version="s3v4"),
+            region_name=settings.AWS_S3_REGION_NAME,
+        )
+        return client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": key},
+            ExpiresIn=3600,
+        )
+
+    def shared_client_no_cache(key):
+        storage.presigned_urls.clear()
+        return storage.presigned_get_url(key)
+
+    n = len(requests)
+    for label, fn in [
+        ("new client per request", per_request_client),
+        ("shared client, no cache", shared_client_no_cache),
+        ("shared client + URL cache", storage.presigned_get_url),
+    ]:
+        storage.presigned_urls.clear()
+        it = iter(requests)
+        # the old path is slow; sample it less
+        repeat = n // 10 if fn is per_request_client else n
+        print(summarize(label, timed(lambda: fn(next(it)), repeat)))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/bench_recommendations.py
+#
+# Two parts:
+#
+#   build   item_neighbors() over synthetic interactions (no database): time
+#           and peak numpy memory for each --interactions size, at a couple
+#           of RECOMMENDATION_MAX_PAIRS block sizes. Users mostly engage
+#           with one topic and videos are Zipf-popular, so neighbours are
+#           meaningful and the pair counts realistic.
+#   serve   seeds users, videos and likes in the database, runs the real
+#           build, then times recommend() and GET /api/videos/recommended/.
+#
+#   python -m benchmarks.bench_recommendations --interactions 1000000,5000000
+#   python -m benchmarks.bench_recommendations --skip-build --videos 2000 --users 500
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.common import (
+    delete_bench_data, seed_users, seed_videos, setup_django, summarize, timed,
+)
+
+
+def synthetic_interactions(n_interactions, n_users, n_videos, topics=50, seed=42):
+    """(users, videos, weights) with a favourite topic per user."""
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, n_users, n_interactions, dtype=np.int32)
+    topic = users % topics
+    # 80% of a user's videos come from their topic, Zipf-popular within it
+    per_topic = n_videos // topics
+    rank = np.minimum(rng.zipf(1.3, n_interactions) - 1, per_topic - 1)
+    own = topic * per_topic + rank
+    other = rng.integers(0, n_videos, n_interactions)
+    videos = np.where(rng.random(n_interactions) < 0.8, own, other).astype(np.int32)
+    weights = rng.choice(np.array([0.5, 1.0, 1.5, 2.0], dtype=np.float32), n_interactions)
+    # one row per (user, video), as load_interactions returns
+    key = np.unique(users.astype(np.int64) * n_videos + videos, return_index=True)[1]
+    return users[key], videos[key], weights[key]
+
+
+def bench_build(sizes, users_per, videos, neighbors, max_user_items, block_sizes):
+    from api.recommendations import item_neighbors
+
+    for n in sizes:
+        n_users = max(1, n // users_per)
+        users, items, weights = synthetic_interactions(n, n_users, videos)
+        # the per-user cap the SQL applies
+        order = np.lexsort((-weights, users))
+        users, items, weights = users[order], items[order], weights[order]
+        starts = np.searchsorted(users, users)
+        keep = np.arange(len(users)) - starts < max_user_items
+        users, items, weights = users[keep], items[keep], weights[keep]
+
+        for max_pairs in block_sizes:
+            tracemalloc.start()
+            started = time.perf_counter()
+            rows = blocks = 0
+            for sources, _, _, _ in item_neighbors(
+                users, items, weights, videos, k=neighbors, min_common=2, max_pairs=max_pairs,
+            ):
+                rows += len(sources)
+                blocks += 1
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"build {len(users):>9} interactions {n_users:>7} users {videos:>6} videos "
+                f"max_pairs={max_pairs:<9} {elapsed:7.2f}s {blocks:>4} blocks "
+                f"{rows:>8} neighbours  peak {peak / 1e6:7.1f} MB"
+            )
+
+
+def seed_likes(users, videos, per_user, topics=20, seed=42):
+    """Topic-clustered likes, so the real build has structure to find."""
+    from api.models import Like
+
+    rng = np.random.default_rng(seed)
+    per_topic = max(1, len(videos) // topics)
+    likes = []
+    for n, user in enumerate(users):
+        topic = n % topics
+        own = topic * per_topic + np.minimum(rng.zipf(1.3, per_user) - 1, per_topic - 1)
+        other = rng.integers(0, len(videos), per_user)
+        picks = np.where(rng.random(per_user) < 0.8, own, other)
+        likes.extend(Like(user=user, video=videos[int(i)]) for i in set(picks.tolist()))
+    Like.objects.bulk_create(likes, batch_size=2000, ignore_conflicts=True)
+    return len(likes)
+
+
+def bench_serve(args):
+    from rest_framework.test import APIClient
+    from api import recommendations
+    from api.models import Video
+    from benchmarks.common import BENCH_URL_PREFIX
+
+    seed_videos(args.videos, transcript_words=50)
+    videos = list(Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).order_by("pk"))
+    users = seed_users(args.users)
+    likes = seed_likes(users, videos, args.likes_per_user)
+
+    result = recommendations.build()
+    print(
+        f"build (database) {likes} likes: {result['neighbors']} neighbours for "
+        f"{result['videos_with_neighbors']} videos in {result['total_seconds']:.2f}s "
+        f"({result['load_seconds']:.2f}s reading)"
+    )
+
+    user = users[0]
+    client = APIClient()
+    client.force_authenticate(user)
+    print(summarize("recommend()", timed(lambda: recommendations.recommend(user.pk, 10), args.requests)))
+    url = "/api/videos/recommended/?limit=10"
+    response = client.get(url)
+    assert response.status_code == 200, response.content
+    personalized = sum(item["score"] is not None for item in response.data["results"])
+    print(summarize("GET recommended", timed(lambda: client.get(url), args.requests)),
+          f"personalized={personalized}/{len(response.data['results'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interactions", default="1000000,5000000",
+                        help="comma separated synthetic interaction counts")
+    parser.add_argument("--users-per", type=int, default=20,
+                        help="interactions per user (synthetic build)")
+    parser.add_argument("--catalog", type=int, default=50000, help="videos (synthetic build)")
+    parser.add_argument("--max-pairs", default="1000000,2000000,5000000")
+    parser.add_argument("--skip-build", action="store_true")
+    parser.add_argument("--skip-serve", action="store_true")
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--likes-per-user", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    if not args.skip_build:
+        bench_build(
+            [int(n) for n in args.interactions.split(",")],
+            args.users_per,
+            args.catalog,
+            settings.RECOMMENDATION_NEIGHBORS,
+            settings.RECOMMENDATION_MAX_USER_ITEMS,
+            [int(n) for n in args.max_pairs.split(",")],
+        )
+    if not args.skip_serve:
+        try:
+            bench_serve(args)
+        finally:
+            if not args.keep:
+                delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
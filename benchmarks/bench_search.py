@@ -0,0 +1,65 @@
+# benchmarks/bench_search.py
+#
+# Compare VideoViewSet.search latency: full-text (tsvector + GIN) vs the old
+# icontains path, at growing catalog sizes. Then replay a skewed (Zipf-like)
+# query stream, as real student traffic is, with the result cache off and on.
+#
+#   python -m benchmarks.bench_search --sizes 10000,100000,1000000
+import argparse
+import random
+
+from benchmarks.common import WORDS, delete_bench_videos, seed_videos, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--skewed", type=int, default=500, help="requests in the skewed replay")
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.conf import settings
+    from api.search import cached_search, fulltext_search, icontains_search, search_results
+
+    rng = random.Random(7)
+    queries = [rng.sample(WORDS, rng.randint(1, 3)) for _ in range(args.queries)]
+    # query i is drawn with weight 1 / (i + 1)
+    skewed = rng.choices(queries, weights=[1 / (i + 1) for i in range(len(queries))], k=args.skewed)
+
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            seed_videos(size)
+            call_command("backfill_search_vector", verbosity=0)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE videos")
+
+            it = iter(queries * 2)
+            fts = timed(lambda: fulltext_search(next(it)), len(queries))
+            it = iter(queries * 2)
+            ilike = timed(lambda: icontains_search(next(it)), len(queries))
+
+            print(f"--- {size} videos")
+            print(summarize("fulltext (tsvector/GIN)", fts))
+            print(summarize("icontains (ILIKE)", ilike))
+
+            for backend in ("fulltext", "icontains"):
+                settings.VIDEO_SEARCH_BACKEND = backend
+                for label, ttl in [("no cache", 0), ("result cache", 60)]:
+                    settings.SEARCH_CACHE_TTL = ttl
+                    search_results.clear()
+                    search_results.hits = search_results.misses = 0
+                    it = iter(skewed)
+                    samples = timed(lambda: cached_search(next(it)), len(skewed))
+                    extra = f" hit rate={search_results.stats()['hit_rate']}" if ttl else ""
+                    print(summarize(f"skewed {backend}, {label}", samples) + extra)
+    finally:
+        if not args.keep:
+            print(f"removed {delete_bench_videos()} benchmark rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_search_logging.py
+#
+# Load test for search logging: search latency with logging off, with the
+# old one-INSERT-per-request behaviour, and with the buffered writer.
+#
+#   python -m benchmarks.bench_search_logging --threads 16 --requests 200
+import argparse
+import random
+import threading
+
+from benchmarks.common import (
+    WORDS, delete_bench_data, seed_users, seed_videos, setup_django, summarize, timed,
+)
+
+
+def run_load(users, threads, per_thread, seed):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    samples = []
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        client = APIClient()
+        client.force_authenticate(users[n % len(users)])
+        mine = timed(
+            lambda: client.get("/api/videos/search/", {"q": " ".join(rng.sample(WORDS, 2))}),
+            per_thread,
+        )
+        connection.close()
+        with lock:
+            samples.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="per thread")
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from api.models import SearchLog
+    from api.search_log import search_logs
+
+    users = seed_users(args.threads)
+    seed_videos(args.videos)
+    try:
+        for label, enabled, interval in [
+            ("logging off", False, 5.0),
+            ("INSERT per request", True, 0),
+            ("buffered bulk_create", True, 1.0),
+        ]:
+            settings.SEARCH_LOG_ENABLED = enabled
+            settings.SEARCH_LOG_FLUSH_INTERVAL = interval
+            before = SearchLog.objects.count()
+            samples = run_load(users, args.threads, args.requests, seed=1)
+            search_logs.flush()
+            logged = SearchLog.objects.count() - before
+            print(summarize(label, samples), f"rows logged={logged}")
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+
+if __name__ == "__main__":
+    main()
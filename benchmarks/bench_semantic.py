@@ -0,0 +1,79 @@
+# benchmarks/bench_semantic.py
+#
+# Recall@k and latency of the HNSW index behind /api/videos/semantic-search/,
+# measured against an exact (sequential scan) nearest-neighbour search.
+#
+#   python -m benchmarks.bench_semantic --size 100000 --k 10
+import argparse
+import random
+
+from benchmarks.common import (
+    WORDS, delete_bench_videos, percentile, seed_videos, setup_django, summarize, timed,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--ef-search", default="40,100,400", help="hnsw.ef_search values to try")
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from pgvector.django import CosineDistance
+    from api.embeddings import get_embedder
+    from api.models import Video
+    from api.search import semantic_search
+
+    rng = random.Random(11)
+    queries = [" ".join(rng.sample(WORDS, rng.randint(2, 5))) for _ in range(args.queries)]
+
+    def exact(text):
+        vector = get_embedder().embed([text])[0]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_indexscan = off")
+            return list(
+                Video.objects.filter(embedding_vector__isnull=False)
+                .annotate(distance=CosineDistance("embedding_vector", vector))
+                .order_by("distance")
+                .values_list("pk", flat=True)[:args.k]
+            )
+
+    try:
+        seed_videos(args.size)
+        call_command("embed_videos", verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE videos")
+
+        truth = {text: set(exact(text)) for text in queries}
+        it = iter(queries)
+        brute = timed(lambda: exact(next(it)), len(queries))
+        print(f"--- {args.size} videos, k={args.k}")
+        print(summarize("exact (seq scan)", brute))
+
+        for ef_search in [int(v) for v in args.ef_search.split(",")]:
+            settings.VIDEO_HNSW_EF_SEARCH = ef_search
+            recalls = []
+            for text in queries:
+                approx = {video.pk for video, _ in semantic_search(text, args.k)}
+                if truth[text]:
+                    recalls.append(len(approx & truth[text]) / len(truth[text]))
+
+            it = iter(queries)
+            ann = timed(lambda: semantic_search(next(it), args.k), len(queries))
+            print(summarize(f"HNSW ef_search={ef_search}", ann))
+            print(f"{'':<28} recall@{args.k}: mean={sum(recalls) / len(recalls):.3f} "
+                  f"p5={percentile(recalls, 5):.3f}")
+    finally:
+        if not args.keep:
+            print(f"removed {delete_bench_videos()} benchmark rows")
+
+
+if __name__ == "__main__":
+    main()
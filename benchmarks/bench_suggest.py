@@ -0,0 +1,106 @@
+# benchmarks/bench_suggest.py
+#
+# Memory footprint and lookup latency of the typeahead index (api/suggest.py)
+# at 1M synthetic terms, next to a dict-of-dicts trie holding a sample of the
+# same terms. Runs entirely in memory; no database rows are touched.
+#
+#   python -m benchmarks.bench_suggest --terms 1000000
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import WORDS, setup_django, summarize, timed
+
+
+def synthetic_terms(n, seed):
+    """n distinct 1-4 word phrases with Zipf-like weights."""
+    rng = random.Random(seed)
+    terms = {}
+    while len(terms) < n:
+        words = rng.sample(WORDS, rng.randint(1, 4))
+        if rng.random() < 0.5:
+            # widen the vocabulary beyond WORDS
+            words[-1] += str(rng.randint(0, 999))
+        terms.setdefault(" ".join(words), max(1, int(n / (len(terms) + 1))))
+    return terms
+
+
+def dict_trie(terms):
+    root = {}
+    for term, weight in terms.items():
+        node = root
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[None] = weight
+    return root
+
+
+def measure(fn):
+    """(result, bytes allocated and still held, seconds)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--terms", type=int, default=1_000_000)
+    parser.add_argument("--trie-sample", type=int, default=100_000,
+                        help="terms put in the dict trie for comparison")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--pending", type=int, default=5000, help="overlay size for the last run")
+    args = parser.parse_args()
+
+    setup_django()
+    from api.suggest import PrefixIndex, SuggestionIndex
+
+    terms = synthetic_terms(args.terms, seed=1)
+    mb = 1024 * 1024
+
+    index, held, elapsed = measure(lambda: PrefixIndex(terms))
+    print(f"prefix index: {len(index)} terms, arrays {index.nbytes() / mb:.1f} MB, "
+          f"held {held / mb:.1f} MB, built in {elapsed:.1f}s")
+
+    sample = dict(list(terms.items())[:args.trie_sample])
+    _, held, elapsed = measure(lambda: dict_trie(sample))
+    print(f"dict trie:    {len(sample)} terms, held {held / mb:.1f} MB "
+          f"(~{held / mb * len(terms) / len(sample):.0f} MB at {len(terms)}), built in {elapsed:.1f}s")
+
+    rng = random.Random(2)
+    names = list(terms)
+    prefixes = [
+        name[:rng.randint(1, min(6, len(name)))] for name in rng.choices(names, k=args.lookups)
+    ]
+
+    it = iter(prefixes)
+    print(summarize("index.top", timed(lambda: index.top(next(it), 10), len(prefixes))))
+
+    unmemoized = SuggestionIndex(max_memo=0)
+    unmemoized.load(terms)
+    it = iter(prefixes)
+    print(summarize("suggest, no memo", timed(lambda: unmemoized.suggest(next(it), 10), len(prefixes))))
+    del unmemoized
+
+    suggestions = SuggestionIndex()
+    suggestions.load(terms)
+    for label in ("suggest, filling memo", "suggest, warm memo"):
+        it = iter(prefixes)
+        print(summarize(label, timed(lambda: suggestions.suggest(next(it), 10), len(prefixes))))
+
+    # an overlay of recent changes that every lookup has to merge in
+    suggestions.adjust({name: 5 for name in rng.sample(names, args.pending)})
+    it = iter(prefixes)
+    samples = timed(lambda: suggestions.suggest(next(it), 10), len(prefixes))
+    print(summarize(f"suggest, {args.pending} pending", samples))
+
+    it = iter(rng.sample(names, 1000))
+    print(summarize("adjust (one term)", timed(lambda: suggestions.adjust({next(it): 1}), 1000)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_task_queue.py
+#
+# Throughput of the Postgres job queue (api/tasks.py) with a job that does
+# nothing, so the numbers are the queue's own overhead:
+#
+#   enqueue    --single enqueue() calls, one INSERT and commit each (what a
+#              request does), then a --backlog of jobs with enqueue_many()
+#   dequeue    --jobs jobs drained by every combination of --workers
+#              processes and --batch-sizes (jobs claimed per round trip),
+#              each worker running tasks.work(burst=True) like
+#              `run_task_worker --burst`, behind the --backlog still queued
+#              for later (run_at in an hour), so the due index is the one a
+#              busy queue has
+#
+# Every job carries a sequence number and the workers report the ones they
+# ran, so a job run twice or lost shows up as a failed check. Run it against
+# a database with no real jobs queued: the workers would claim those too.
+#
+#   python -m benchmarks.bench_task_queue --jobs 20000 --backlog 100000
+import argparse
+import multiprocessing
+import time
+from datetime import timedelta
+
+from benchmarks.common import setup_django
+
+TASK = "bench.noop"
+
+
+def _drain(stop, batch_size, results):
+    from api import tasks
+
+    ran = []
+    tasks.task(TASK)(lambda n: ran.append(n))
+    tasks.work(stop, batch_size=batch_size, burst=True)
+    results.put(ran)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--single", type=int, default=2000)
+    parser.add_argument("--backlog", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, connections
+    from django.utils import timezone
+    from api import tasks
+    from api.models import Task
+
+    def delete_jobs():
+        return Task.objects.filter(task=TASK).delete()[0]
+
+    context = multiprocessing.get_context("fork")
+    try:
+        delete_jobs()
+        started = time.perf_counter()
+        for n in range(args.single):
+            tasks.enqueue(TASK, n=n)
+        elapsed = time.perf_counter() - started
+        print(f"enqueue()       {args.single / elapsed:8.0f} jobs/s  ({elapsed / args.single * 1000:.2f}ms each)")
+        delete_jobs()
+
+        started = time.perf_counter()
+        tasks.enqueue_many(TASK, ({"n": n} for n in range(args.backlog)))
+        elapsed = time.perf_counter() - started
+        print(f"enqueue_many()  {args.backlog / elapsed:8.0f} jobs/s  ({args.backlog} jobs)")
+        # the backlog stays, out of the way, while the dequeue runs
+        Task.objects.filter(task=TASK).update(run_at=timezone.now() + timedelta(hours=1))
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE task_queue")
+
+        for workers in args.workers:
+            for batch_size in args.batch_sizes:
+                tasks.enqueue_many(TASK, ({"n": n} for n in range(args.jobs)))
+                connections.close_all()
+                stop, results = context.Event(), context.Queue()
+                started = time.perf_counter()
+                processes = [
+                    context.Process(target=_drain, args=(stop, batch_size, results)) for _ in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                ran = [n for _ in processes for n in results.get()]
+                elapsed = time.perf_counter() - started
+                for process in processes:
+                    process.join()
+
+                check = "ok" if len(ran) == len(set(ran)) == args.jobs else (
+                    f"FAILED: {len(ran)} runs of {len(set(ran))} distinct jobs, {args.jobs} queued"
+                )
+                print(
+                    f"dequeue workers={workers} batch={batch_size:<4} "
+                    f"{args.jobs / elapsed:8.0f} jobs/s  {check}"
+                )
+    finally:
+        delete_jobs()
+
+
+if __name__ == "__main__":
+    main()
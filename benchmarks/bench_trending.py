@@ -0,0 +1,91 @@
+# benchmarks/bench_trending.py
+#
+# "Trending this week" from the trending_scores leaderboard versus the
+# aggregate it replaces: a scan of likes, bookmarks, comments, ratings and
+# video_progress since a week ago, grouped per video. Also times the flush
+# upsert (write_events) for a batch of events.
+#
+#   python -m benchmarks.bench_trending --videos 5000 --users 500 --per-user 40
+import argparse
+import random
+
+from benchmarks.common import (
+    BENCH_URL_PREFIX, delete_bench_data, seed_courses, seed_interactions, seed_users, seed_videos,
+    setup_django, summarize, timed,
+)
+
+SCAN_SQL = """
+SELECT video_id, sum(weight) AS score FROM (
+    SELECT video_id, 3 AS weight FROM likes WHERE created_at >= now() - interval '7 days'
+    UNION ALL
+    SELECT video_id, 3 FROM bookmarks WHERE created_at >= now() - interval '7 days'
+    UNION ALL
+    SELECT video_id, 2 FROM comments WHERE created_at >= now() - interval '7 days'
+    UNION ALL
+    SELECT video_id, 2 FROM ratings WHERE created_at >= now() - interval '7 days'
+    UNION ALL
+    SELECT video_id, 1 FROM video_progress WHERE updated_at >= now() - interval '7 days'
+) AS events
+GROUP BY video_id
+ORDER BY score DESC
+LIMIT %s
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--per-user", type=int, default=40)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=200, help="videos per write_events call")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, transaction
+    from api import trending
+    from api.models import Video
+
+    seed_courses(args.courses)
+    seed_videos(args.videos, transcript_words=50)
+    videos = list(Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX))
+    users = seed_users(args.users)
+    seed_interactions(users, videos, args.per_user)
+    try:
+        with transaction.atomic():
+            entries = trending.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM likes")
+            likes = cursor.fetchone()[0]
+        print(f"{likes} likes (x5 interaction tables), {entries} leaderboard entries")
+
+        def scan():
+            with connection.cursor() as cursor:
+                cursor.execute(SCAN_SQL, [args.limit])
+                cursor.fetchall()
+
+        print(summarize("scan interaction tables", timed(scan, args.requests)))
+        print(summarize("leaderboard top()", timed(lambda: trending.top("videos", args.limit), args.requests)))
+        course_board = trending.video_board(videos[0].course_id)
+        print(summarize("leaderboard top(course)", timed(lambda: trending.top(course_board, args.limit), args.requests)))
+
+        rng = random.Random(1)
+        ids = [video.pk for video in videos]
+        samples = timed(
+            lambda: trending.write_events({rng.choice(ids): 3.0 for _ in range(args.batch)}),
+            args.requests,
+        )
+        print(summarize(f"write_events({args.batch} videos)", samples))
+    finally:
+        if not args.keep:
+            delete_bench_data()
+            # drop the benchmark's entries
+            with transaction.atomic():
+                trending.rebuild()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/check_query_counts.py
+#
+# Guards against N+1 queries: every list endpoint must run the same number of
+# SQL queries no matter how many rows exist or what page size is asked for. Exits non-zero and prints
+# the offending endpoints if any count grows with the data. The same check
+# runs in the test suite (api/tests.py, `python manage.py test`); this one
+# runs it against a real database with more data.
+#
+#   python -m benchmarks.check_query_counts
+import argparse
+import sys
+
+from benchmarks.common import (
+    delete_bench_data, seed_courses, seed_interactions, seed_users, seed_videos, setup_django,
+)
+
+LIST_ENDPOINTS = [
+    "/api/users/",
+    "/api/courses/",
+    "/api/videos/",
+    "/api/progress/",
+    "/api/likes/",
+    "/api/comments/",
+    "/api/bookmarks/",
+    "/api/ratings/",
+    "/api/searchlogs/",
+]
+
+
+def count_queries(client, url):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    return len(ctx.captured_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded rows")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from rest_framework.test import APIClient
+    from api.models import Video
+    from benchmarks.common import BENCH_URL_PREFIX
+
+    # measure the queries themselves, not the catalog cache
+    settings.CATALOG_CACHE_TIMEOUT = 0
+
+    counts = {}
+    try:
+        # two rounds with different amounts of data
+        for users, videos, per_user in [(3, 10, 2), (20, 60, 8)]:
+            people = seed_users(users)
+            courses = seed_courses(5)
+            seed_videos(videos)
+            catalog = list(Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX))
+            for i, video in enumerate(catalog):
+                video.course = courses[i % len(courses)]
+            Video.objects.bulk_update(catalog, ["course"])
+            seed_interactions(people, catalog, per_user)
+
+            client = APIClient()
+            client.force_authenticate(people[0])
+            for url in LIST_ENDPOINTS:
+                for page_size in (5, 50):
+                    counts.setdefault(url, []).append(
+                        count_queries(client, f"{url}?page_size={page_size}")
+                    )
+    finally:
+        if not args.keep:
+            delete_bench_data()
+
+    failed = False
+    for url, seen in counts.items():
+        ok = len(set(seen)) == 1
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {url:<22} queries per request: {seen}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/common.py
+#
+# Shared helpers for the scripts in this folder. Run them from the repo root,
+# e.g.  python -m benchmarks.bench_search --sizes 10000,100000
+#
+# Scripts that touch the database use whatever DATABASE_URL points at, so
+# point it at a scratch database: they insert (and by default remove) rows.
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# rows created by benchmarks are tagged with this file_url prefix
+BENCH_URL_PREFIX = "bench://"
+
+WORDS = (
+    "python loops recursion variables functions classes objects lists "
+    "dictionaries tuples sets strings algorithms sorting searching graphs "
+    "trees arrays pointers memory stack queue heap hashing database sql "
+    "joins indexes networking http sockets threads processes async await "
+    "testing debugging git branches merge calculus algebra vectors matrix "
+    "probability statistics regression physics energy momentum chemistry "
+    "atoms bonds biology cells genetics history essay grammar introduction"
+).split()
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portal.settings")
+    # APIClient / APIRequestFactory requests use the "testserver" host
+    os.environ.setdefault("ALLOWED_HOSTS", "testserver,localhost,127.0.0.1")
+    import django
+    django.setup()
+
+
+def synthetic_text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def timed(fn, repeat: int) -> list:
+    """Call fn() `repeat` times and return the latencies in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def summarize(label: str, samples) -> str:
+    return (
+        f"{label:<28} n={len(samples):<5} "
+        f"mean={statistics.fmean(samples):8.2f}ms "
+        f"p50={percentile(samples, 50):8.2f}ms "
+        f"p95={percentile(samples, 95):8.2f}ms "
+        f"p99={percentile(samples, 99):8.2f}ms"
+    )
+
+
+def seed_videos(target: int, transcript_words: int = 400, seed: int = 42, batch_size: int = 2000):
+    """
+    Make sure at least `target` benchmark videos exist. Returns how many
+    were inserted.
+    """
+    from api.models import Video
+
+    existing = Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).count()
+    rng = random.Random(seed + existing)
+    inserted = 0
+    while existing + inserted < target:
+        n = min(batch_size, target - existing - inserted)
+        batch = [
+            Video(
+                title=synthetic_text(rng, 6).title(),
+                description=synthetic_text(rng, 40),
+                transcript=synthetic_text(rng, transcript_words),
+                difficulty_level=rng.choice(["basic", "intermediate", "advanced"]),
+                duration=rng.randint(60, 7200),
+                file_url=f"{BENCH_URL_PREFIX}{existing + inserted + i}.mp4",
+                tags=rng.sample(WORDS, 3),
+            )
+            for i in range(n)
+        ]
+        Video.objects.bulk_create(batch)
+        inserted += n
+    return inserted
+
+
+def delete_bench_videos():
+    from api.models import Video
+    return Video.objects.filter(file_url__startswith=BENCH_URL_PREFIX).delete()[0]
+
+
+BENCH_EMAIL_DOMAIN = "bench.invalid"
+
+
+def seed_users(n: int):
+    """Make sure `n` benchmark users exist and return them."""
+    from api.models import PortalUser
+
+    PortalUser.objects.bulk_create(
+        [
+            PortalUser(name=f"bench {i}", email=f"bench-{i}@{BENCH_EMAIL_DOMAIN}", password="!")
+            for i in range(n)
+        ],
+        ignore_conflicts=True,
+    )
+    return list(
+        PortalUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").order_by("pk")[:n]
+    )
+
+
+def seed_courses(n: int, seed: int = 42):
+    from api.models import Course
+
+    rng = random.Random(seed)
+    existing = list(Course.objects.filter(description__startswith=BENCH_URL_PREFIX))
+    Course.objects.bulk_create(
+        [
+            Course(
+                title=synthetic_text(rng, 3).title(),
+                description=f"{BENCH_URL_PREFIX}{synthetic_text(rng, 20)}",
+                category=rng.choice(["programming", "math", "science", "writing"]),
+                level=rng.choice(["basic", "intermediate", "advanced"]),
+            )
+            for _ in range(max(0, n - len(existing)))
+        ]
+    )
+    return list(Course.objects.filter(description__startswith=BENCH_URL_PREFIX).order_by("pk")[:n])
+
+
+def seed_interactions(users, videos, per_user: int, seed: int = 42):
+    """
+    Give every user `per_user` likes, bookmarks, ratings, progress rows and
+    comments on random videos, plus a few search log entries.
+    """
+    from api.models import Bookmark, Comment, Like, Rating, SearchLog, VideoProgress
+
+    rng = random.Random(seed)
+    likes, bookmarks, ratings, progress, comments, searches = [], [], [], [], [], []
+    for user in users:
+        for video in rng.sample(videos, min(per_user, len(videos))):
+            likes.append(Like(user=user, video=video))
+            bookmarks.append(Bookmark(user=user, video=video))
+            ratings.append(Rating(user=user, video=video, rating=rng.randint(1, 5)))
+            progress.append(VideoProgress(
+                user=user, video=video,
+                watched_seconds=rng.randint(0, video.duration or 600),
+            ))
+            comments.append(Comment(user=user, video=video, text=synthetic_text(rng, 12)))
+        searches.append(SearchLog(user=user, query=synthetic_text(rng, 2)))
+
+    for model, rows in [
+        (Like, likes), (Bookmark, bookmarks), (Rating, ratings),
+        (VideoProgress, progress), (Comment, comments), (SearchLog, searches),
+    ]:
+        model.objects.bulk_create(rows, batch_size=2000, ignore_conflicts=True)
+
+
+def delete_bench_data():
+    """Remove everything created by the seed_* helpers."""
+    from api.models import Course, PortalUser, SearchLog
+
+    deleted = delete_bench_videos()
+    # search logs would otherwise survive with user set to NULL
+    deleted += SearchLog.objects.filter(user__email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()[0]
+    deleted += Course.objects.filter(description__startswith=BENCH_URL_PREFIX).delete()[0]
+    deleted += PortalUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()[0]
+    return deleted
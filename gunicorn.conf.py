@@ -0,0 +1,15 @@
+# gunicorn.conf.py
+#
+# Read by `gunicorn` from the project root (see Procfile). With ASYNC_API on,
+# the ASGI app runs on uvicorn workers, each serving many requests at once;
+# otherwise the WSGI app runs on sync workers, one request per process.
+# Worker count comes from WEB_CONCURRENCY as usual.
+
+# not `from decouple import config`: gunicorn would read `config` as a setting
+import decouple
+
+if decouple.config("ASYNC_API", default=False, cast=bool):
+    wsgi_app = "portal.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "portal.wsgi:application"
@@ -19,6 +19,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api.views import *
+from api.exports import ExportViewSet
+from api import async_views, hls
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
 from django.conf.urls.static import static
@@ -34,9 +36,12 @@ router.register(r'comments', CommentViewSet)
 router.register(r'bookmarks', BookmarkViewSet)
 router.register(r'ratings', RatingViewSet)
 router.register(r'searchlogs', SearchLogViewSet)
+router.register(r'exports', ExportViewSet, basename='export')
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    # HLS playlists, authorized by the token in the URL rather than a JWT
+    path("api/videos/<int:pk>/hls/<path:name>", hls.playlist, name="hls_playlist"),
     path("api/", include(router.urls)),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -45,6 +50,17 @@ urlpatterns = [
     path("api/auth/login/", TokenObtainPairView.as_view(), name="api_login"),
 ]
 
+if settings.ASYNC_API:
+    # async versions of the I/O-bound endpoints (api/async_views.py); listed
+    # first so they take over from the router's routes
+    urlpatterns = [
+        path("api/videos/<int:pk>/play/", async_views.play),
+        path("api/videos/play-batch/", async_views.play_batch),
+        path("api/courses/<int:pk>/play-urls/", async_views.course_play_urls),
+        path("api/videos/search/", async_views.search),
+        path("api/progress/heartbeat/", async_views.heartbeat),
+    ] + urlpatterns
+
 # Serve media files in development and production
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)